@@ -0,0 +1,44 @@
+"""add product row version
+
+Revision ID: 0b7e3d9a4c61
+Revises: f2a6c8d13e59
+Create Date: 2026-10-19 22:14:05.731902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7e3d9a4c61'
+down_revision = 'f2a6c8d13e59'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing rows start at 0, so a terminal's first sync (since=0) gets them all
+    op.add_column('products', sa.Column('row_version', sa.BigInteger(), server_default=sa.text('0'), nullable=False))
+    op.create_index('ix_products_depot_id_row_version', 'products', ['depot_id', 'row_version'], unique=False)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION products_bump_row_version() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND NEW IS NOT DISTINCT FROM OLD THEN
+                RETURN NEW;
+            END IF;
+            NEW.row_version := pg_current_xact_id()::text::bigint;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER products_row_version BEFORE INSERT OR UPDATE ON products
+        FOR EACH ROW EXECUTE FUNCTION products_bump_row_version()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER products_row_version ON products")
+    op.execute("DROP FUNCTION products_bump_row_version()")
+    op.drop_index('ix_products_depot_id_row_version', table_name='products')
+    op.drop_column('products', 'row_version')
@@ -0,0 +1,38 @@
+"""add stock alerts
+
+Revision ID: 3c9e4b71d2a8
+Revises: a5f3031d5491
+Create Date: 2026-10-19 09:12:41.503117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e4b71d2a8'
+down_revision = 'a5f3031d5491'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('stock_alerts',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('product_id', sa.UUID(), nullable=False),
+    sa.Column('transaction_id', sa.UUID(), nullable=True),
+    sa.Column('kind', sa.Enum('low_stock', 'out_of_stock', name='stockalertkind'), nullable=False),
+    sa.Column('stock_quantity', sa.Integer(), nullable=False),
+    sa.Column('low_stock_threshold', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_stock_alerts_created_at', 'stock_alerts', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_stock_alerts_created_at', table_name='stock_alerts')
+    op.drop_table('stock_alerts')
+    op.execute("DROP TYPE stockalertkind")
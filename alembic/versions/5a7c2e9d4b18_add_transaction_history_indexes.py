@@ -0,0 +1,30 @@
+"""add transaction history indexes
+
+Revision ID: 5a7c2e9d4b18
+Revises: b2e8d4f7a613
+Create Date: 2026-10-19 16:21:07.381542
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a7c2e9d4b18'
+down_revision = 'b2e8d4f7a613'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_transactions_created_at_id', 'transactions', ['created_at', 'id'], unique=False)
+    op.create_index('ix_transactions_user_id_created_at_id', 'transactions', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_transaction_items_transaction_id', 'transaction_items', ['transaction_id'], unique=False)
+    op.create_index('ix_transaction_items_product_id_transaction_id', 'transaction_items', ['product_id', 'transaction_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transaction_items_product_id_transaction_id', table_name='transaction_items')
+    op.drop_index('ix_transaction_items_transaction_id', table_name='transaction_items')
+    op.drop_index('ix_transactions_user_id_created_at_id', table_name='transactions')
+    op.drop_index('ix_transactions_created_at_id', table_name='transactions')
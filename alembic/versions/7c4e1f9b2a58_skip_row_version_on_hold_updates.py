@@ -0,0 +1,51 @@
+"""skip row version on hold updates
+
+Revision ID: 7c4e1f9b2a58
+Revises: 0b7e3d9a4c61
+Create Date: 2026-10-19 23:41:17.208415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4e1f9b2a58'
+down_revision = '0b7e3d9a4c61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Holds only move reserved_quantity, which terminals don't sync
+    op.execute("""
+        CREATE OR REPLACE FUNCTION products_bump_row_version() RETURNS trigger AS $$
+        DECLARE
+            unchanged products;
+        BEGIN
+            IF TG_OP = 'UPDATE' THEN
+                unchanged := OLD;
+                unchanged.reserved_quantity := NEW.reserved_quantity;
+                IF NEW IS NOT DISTINCT FROM unchanged THEN
+                    RETURN NEW;
+                END IF;
+            END IF;
+            NEW.row_version := pg_current_xact_id()::text::bigint;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION products_bump_row_version() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND NEW IS NOT DISTINCT FROM OLD THEN
+                RETURN NEW;
+            END IF;
+            NEW.row_version := pg_current_xact_id()::text::bigint;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
@@ -0,0 +1,40 @@
+"""add stock holds
+
+Revision ID: 7d1f0a6c5e93
+Revises: 3c9e4b71d2a8
+Create Date: 2026-10-19 11:40:18.227904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d1f0a6c5e93'
+down_revision = '3c9e4b71d2a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('reserved_quantity', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('stock_holds',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('cart_id', sa.UUID(), nullable=False),
+    sa.Column('product_id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('cart_id', 'product_id', name='uq_stock_holds_cart_product')
+    )
+    op.create_index('ix_stock_holds_expires_at', 'stock_holds', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_stock_holds_expires_at', table_name='stock_holds')
+    op.drop_table('stock_holds')
+    op.drop_column('products', 'reserved_quantity')
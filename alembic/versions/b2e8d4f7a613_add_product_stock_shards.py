@@ -0,0 +1,38 @@
+"""add product stock shards
+
+Revision ID: b2e8d4f7a613
+Revises: 7d1f0a6c5e93
+Create Date: 2026-10-19 14:02:51.604318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e8d4f7a613'
+down_revision = '7d1f0a6c5e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('stock_shards', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('product_stock_shards',
+    sa.Column('product_id', sa.UUID(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'shard')
+    )
+
+
+def downgrade() -> None:
+    # Fold sharded stock back into the product rows first
+    op.execute(
+        "UPDATE products SET stock_quantity = s.total FROM "
+        "(SELECT product_id, sum(quantity) AS total FROM product_stock_shards GROUP BY product_id) s "
+        "WHERE products.id = s.product_id"
+    )
+    op.drop_table('product_stock_shards')
+    op.drop_column('products', 'stock_shards')
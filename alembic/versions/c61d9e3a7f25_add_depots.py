@@ -0,0 +1,58 @@
+"""add depots
+
+Revision ID: c61d9e3a7f25
+Revises: 5a7c2e9d4b18
+Create Date: 2026-10-19 18:02:44.910215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c61d9e3a7f25'
+down_revision = '5a7c2e9d4b18'
+branch_labels = None
+depends_on = None
+
+DEFAULT_DEPOT_ID = '00000000-0000-0000-0000-000000000001'
+
+
+def upgrade() -> None:
+    op.create_table('depots',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('code', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_depots_code'), 'depots', ['code'], unique=True)
+    op.execute(f"INSERT INTO depots (id, name, code, created_at) VALUES ('{DEFAULT_DEPOT_ID}', 'Main depot', 'main', now())")
+
+    # Existing rows all belong to the default depot
+    for table in ('users', 'products', 'transactions'):
+        op.add_column(table, sa.Column('depot_id', postgresql.UUID(as_uuid=True), nullable=False,
+                                       server_default=sa.text(f"'{DEFAULT_DEPOT_ID}'")))
+        op.create_foreign_key(f'{table}_depot_id_fkey', table, 'depots', ['depot_id'], ['id'])
+
+    op.create_index('ix_users_depot_id_role', 'users', ['depot_id', 'role'], unique=False)
+    op.drop_index('ix_products_sku', table_name='products')
+    op.drop_index('ix_products_category', table_name='products')
+    op.create_index('ix_products_depot_id_sku', 'products', ['depot_id', 'sku'], unique=True)
+    op.create_index('ix_products_depot_id_category', 'products', ['depot_id', 'category'], unique=False)
+    op.create_index('ix_transactions_depot_id_created_at_id', 'transactions', ['depot_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_depot_id_created_at_id', table_name='transactions')
+    op.drop_index('ix_products_depot_id_category', table_name='products')
+    op.drop_index('ix_products_depot_id_sku', table_name='products')
+    op.create_index('ix_products_category', 'products', ['category'], unique=False)
+    op.create_index('ix_products_sku', 'products', ['sku'], unique=True)
+    op.drop_index('ix_users_depot_id_role', table_name='users')
+    for table in ('transactions', 'products', 'users'):
+        op.drop_constraint(f'{table}_depot_id_fkey', table, type_='foreignkey')
+        op.drop_column(table, 'depot_id')
+    op.drop_index(op.f('ix_depots_code'), table_name='depots')
+    op.drop_table('depots')
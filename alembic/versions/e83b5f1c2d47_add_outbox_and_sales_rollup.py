@@ -0,0 +1,56 @@
+"""add outbox and sales rollup
+
+Revision ID: e83b5f1c2d47
+Revises: c61d9e3a7f25
+Create Date: 2026-10-19 19:11:05.227914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e83b5f1c2d47'
+down_revision = 'c61d9e3a7f25'
+branch_labels = None
+depends_on = None
+
+DEFAULT_DEPOT_ID = '00000000-0000-0000-0000-000000000001'
+
+
+def upgrade() -> None:
+    op.create_table('outbox_events',
+    sa.Column('id', sa.BigInteger(), sa.Identity(always=False), nullable=False),
+    sa.Column('depot_id', postgresql.UUID(as_uuid=True), server_default=sa.text(f"'{DEFAULT_DEPOT_ID}'"), nullable=False),
+    sa.Column('topic', sa.String(), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('available_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['depot_id'], ['depots.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('product_daily_sales',
+    sa.Column('depot_id', postgresql.UUID(as_uuid=True), server_default=sa.text(f"'{DEFAULT_DEPOT_ID}'"), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['depot_id'], ['depots.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('depot_id', 'day', 'product_id')
+    )
+    # Sales from before the outbox; later ones arrive as events
+    op.execute(
+        "INSERT INTO product_daily_sales (depot_id, day, product_id, quantity, revenue) "
+        "SELECT t.depot_id, CAST(t.created_at AS DATE), i.product_id, sum(i.quantity), sum(i.quantity * i.price_at_sale) "
+        "FROM transaction_items i JOIN transactions t ON t.id = i.transaction_id "
+        "GROUP BY t.depot_id, CAST(t.created_at AS DATE), i.product_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('product_daily_sales')
+    op.drop_table('outbox_events')
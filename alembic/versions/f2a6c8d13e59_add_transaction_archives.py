@@ -0,0 +1,42 @@
+"""add transaction archives
+
+Revision ID: f2a6c8d13e59
+Revises: e83b5f1c2d47
+Create Date: 2026-10-19 21:02:41.508317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6c8d13e59'
+down_revision = 'e83b5f1c2d47'
+branch_labels = None
+depends_on = None
+
+DEFAULT_DEPOT_ID = '00000000-0000-0000-0000-000000000001'
+
+
+def upgrade() -> None:
+    op.create_table('transaction_archives',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('depot_id', postgresql.UUID(as_uuid=True), server_default=sa.text(f"'{DEFAULT_DEPOT_ID}'"), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('month_end', sa.DateTime(), nullable=False),
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('transaction_count', sa.Integer(), nullable=False),
+    sa.Column('item_count', sa.Integer(), nullable=False),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('purged_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['depot_id'], ['depots.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('depot_id', 'month', name='uq_transaction_archives_depot_id_month')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('transaction_archives')
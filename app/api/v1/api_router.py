@@ -1,9 +1,10 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import users, products, transactions, analytics
+from app.api.v1.endpoints import users, products, transactions, analytics, admin
 
 api_router = APIRouter()
 
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(products.router, prefix="/products", tags=["products"])
 api_router.include_router(transactions.router, prefix="/transactions", tags=["transactions"])
-api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
\ No newline at end of file
+api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
\ No newline at end of file
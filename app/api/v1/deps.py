@@ -1,11 +1,20 @@
-from typing import Generator
+from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
 from app.core.config import settings
-from app.core import security
-from app.db.session import SessionLocal
+from app.core import security, tracing
+from app.db.depot_routing import scope_to_depot
+from app.db.session import (
+    AnalyticsSessionLocal,
+    PrimaryAnalyticsSessionLocal,
+    ReadSessionLocal,
+    SessionLocal,
+    read_engine,
+    engine,
+    recent_writes,
+)
 from app.models.user import User
 from app.schemas.token import TokenPayload
 
@@ -18,9 +27,17 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> User:
+def _token_subject(token: str) -> Optional[str]:
+    # Only used to route reads; get_current_user still validates the token
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+def _wrote_recently(token: str) -> bool:
+    return read_engine is not engine and recent_writes.recent(_token_subject(token))
+
+def _authenticate(db: Session, token: str) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -38,8 +55,52 @@ def get_current_user(
     user = db.query(User).filter(User.username == token_data.sub).first()
     if user is None:
         raise credentials_exception
+    # Lets commits on this session count as the user's writes (read-your-writes)
+    db.info["username"] = user.username
+    db.info["user"] = user
+    scope_to_depot(db, user.depot_id)
     return user
 
+@tracing.traced("auth.get_current_user")
+def get_current_user(
+    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
+) -> User:
+    return _authenticate(db, token)
+
+def get_read_db(token: str = Depends(oauth2_scheme)) -> Generator:
+    """
+    Session for read-only endpoints (listings). Uses the replica when one is
+    configured, except right after this user wrote, so they see their own
+    writes. The user is looked up on the same session (take it from
+    ``get_read_user``), so these requests never touch the primary pool.
+    Scoped to the user's depot.
+    """
+    db = SessionLocal() if _wrote_recently(token) else ReadSessionLocal()
+    try:
+        _authenticate(db, token)
+        yield db
+    finally:
+        db.close()
+
+def get_analytics_db(token: str = Depends(oauth2_scheme)) -> Generator:
+    """Like ``get_read_db`` but every transaction is a read-only snapshot."""
+    db = PrimaryAnalyticsSessionLocal() if _wrote_recently(token) else AnalyticsSessionLocal()
+    try:
+        _authenticate(db, token)
+        yield db
+    finally:
+        db.close()
+
+@tracing.traced("auth.get_read_user")
+def get_read_user(db: Session = Depends(get_read_db)) -> User:
+    """The caller, as looked up by ``get_read_db``."""
+    return db.info["user"]
+
+@tracing.traced("auth.get_analytics_user")
+def get_analytics_user(db: Session = Depends(get_analytics_db)) -> User:
+    """The caller, as looked up by ``get_analytics_db``."""
+    return db.info["user"]
+
 def get_current_active_superuser(
     current_user: User = Depends(get_current_user),
 ) -> User:
@@ -0,0 +1,41 @@
+from typing import Any, List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.api.v1 import deps
+from app.api.v1.routing import InstrumentedRoute
+from app.core import profiling
+from app.models.user import User
+from app.schemas.admin import ProfileSummary
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+@router.get("/profiles", response_model=List[ProfileSummary])
+def list_profiles(
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Recently captured request profiles (newest first). Send a request with
+    `X-Profile: 1` or `?profile=1` as an owner to capture one.
+    """
+    if getattr(current_user, "role", None) != "owner":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return [ProfileSummary(**p.summary()) for p in profiling.recent_profiles()]
+
+@router.get("/profiles/{profile_id}")
+def read_profile(
+    profile_id: str,
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed)$"),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Download a profile as speedscope JSON or as collapsed stacks
+    (for flamegraph.pl / speedscope import).
+    """
+    if getattr(current_user, "role", None) != "owner":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    profile = profiling.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    return profile.speedscope()
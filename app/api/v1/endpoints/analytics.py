@@ -1,96 +1,244 @@
+import json
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import APIRouter, Depends, Query
+from uuid import UUID
+from fastapi import APIRouter, Depends, Header, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.api.v1 import deps
+from app.api.v1.routing import InstrumentedRoute
+from app.core.broadcast import SSE_HEADERS, SSE_PING, broadcaster, sse
+from app.core.serialization import dump_model, model_response
+from app.db.depot_routing import scope_to_depot
+from app.db.session import SessionLocal
 from app.models.user import User
 from app.services.analytics_service import AnalyticsService
 from app.schemas.analytics import (
     SalesMetrics,
+    SalesMetricsComparison,
     DailySalesMetrics,
     ProductSalesResponse,
+    ProductSalesComparison,
     EmployeeSalesResponse,
+    EmployeeSalesComparison,
     InventoryAnalytics,
     DashboardAnalytics,
+    ReorderForecast,
+    StockAlertResponse,
 )
+from app.services import dashboard_stream
+from app.services.forecast_service import ForecastService
+from app.services.inventory_service import STOCK_ALERTS_CHANNEL, InventoryService
 from app.services.report_service import ReportService
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
+
+SSE_PING_SECONDS = 15.0
 
 @router.get("/sales-metrics", response_model=SalesMetrics)
 def get_sales_metrics(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_analytics_user),
     days: int = Query(30, ge=1, le=365, description="Number of days to analyze"),
 ) -> SalesMetrics:
     """Get sales metrics for a specified period (default last 30 days)"""
     start_date = datetime.utcnow() - timedelta(days=days)
     end_date = datetime.utcnow()
-    return AnalyticsService.get_sales_metrics(db, start_date, end_date)
+    return AnalyticsService.get_sales_metrics(db, start_date, end_date, current_user.depot_id)
+
+@router.get("/sales-metrics/compare", response_model=SalesMetricsComparison)
+def compare_sales_metrics(
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_analytics_user),
+    days: int = Query(7, ge=1, le=365, description="Length of each period"),
+) -> SalesMetricsComparison:
+    """Sales metrics for the last N days against the N days before"""
+    end_date = datetime.utcnow()
+    return AnalyticsService.compare_sales_metrics(
+        db, end_date - timedelta(days=days), end_date, current_user.depot_id
+    )
 
 @router.get("/daily-sales", response_model=list[DailySalesMetrics])
 def get_daily_sales(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_analytics_user),
     days: int = Query(30, ge=1, le=365, description="Number of days to analyze"),
 ) -> list[DailySalesMetrics]:
     """Get daily sales breakdown for the last N days"""
-    return AnalyticsService.get_daily_sales(db, days)
+    return AnalyticsService.get_daily_sales(db, days, current_user.depot_id)
 
 @router.get("/product-sales", response_model=ProductSalesResponse)
 def get_product_sales(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_analytics_user),
     days: int = Query(30, ge=1, le=365, description="Number of days to analyze"),
-) -> ProductSalesResponse:
+):
     """Get sales analytics by product"""
     start_date = datetime.utcnow() - timedelta(days=days)
     end_date = datetime.utcnow()
-    return AnalyticsService.get_product_sales(db, start_date, end_date)
+    return model_response(
+        ProductSalesResponse, AnalyticsService.get_product_sales(db, start_date, end_date, current_user.depot_id)
+    )
+
+@router.get("/product-sales/compare", response_model=ProductSalesComparison)
+def compare_product_sales(
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_analytics_user),
+    days: int = Query(7, ge=1, le=365, description="Length of each period"),
+) -> ProductSalesComparison:
+    """Product sales for the last N days against the N days before"""
+    end_date = datetime.utcnow()
+    return AnalyticsService.compare_product_sales(
+        db, end_date - timedelta(days=days), end_date, current_user.depot_id
+    )
 
 @router.get("/employee-sales", response_model=EmployeeSalesResponse)
 def get_employee_sales(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_analytics_user),
     days: int = Query(30, ge=1, le=365, description="Number of days to analyze"),
 ) -> EmployeeSalesResponse:
     """Get sales analytics by employee"""
     start_date = datetime.utcnow() - timedelta(days=days)
     end_date = datetime.utcnow()
-    return AnalyticsService.get_employee_sales(db, start_date, end_date)
+    return AnalyticsService.get_employee_sales(db, start_date, end_date, current_user.depot_id)
+
+@router.get("/employee-sales/compare", response_model=EmployeeSalesComparison)
+def compare_employee_sales(
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_analytics_user),
+    days: int = Query(7, ge=1, le=365, description="Length of each period"),
+) -> EmployeeSalesComparison:
+    """Employee sales for the last N days against the N days before"""
+    end_date = datetime.utcnow()
+    return AnalyticsService.compare_employee_sales(
+        db, end_date - timedelta(days=days), end_date, current_user.depot_id
+    )
 
 @router.get("/inventory", response_model=InventoryAnalytics)
 def get_inventory_analytics(
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_analytics_user),
+):
+    """Get current inventory status and low stock alerts"""
+    return model_response(InventoryAnalytics, AnalyticsService.get_inventory_analytics(db, current_user.depot_id))
+
+@router.get("/reorder-forecast", response_model=ReorderForecast)
+def get_reorder_forecast(
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_analytics_user),
+    days: int = Query(28, ge=7, le=365, description="Days of sales history to fit"),
+    lead_time_days: int = Query(7, ge=0, le=90, description="Days from ordering to restock"),
+    cover_days: int = Query(30, ge=1, le=365, description="Days of demand a reorder should cover"),
+    limit: int = Query(50, ge=1, le=1000),
+) -> ReorderForecast:
+    """Days of stock left per product and what to reorder, most urgent first"""
+    return ForecastService.reorder_forecast(
+        db, days, lead_time_days, cover_days, limit, current_user.depot_id
+    )
+
+@router.get("/stock-alerts", response_model=list[StockAlertResponse])
+def get_stock_alerts(
+    db: Session = Depends(deps.get_read_db),
+    current_user: User = Depends(deps.get_read_user),
+    since: Optional[datetime] = Query(None, description="Only alerts raised at or after this time"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Low/out-of-stock alerts raised by sales, newest first"""
+    return model_response(StockAlertResponse, InventoryService.recent_alerts(db, since, limit, current_user.depot_id))
+
+def _alerts_after(alert_id: str, depot_id: UUID) -> list:
+    db = scope_to_depot(SessionLocal(), depot_id)
+    try:
+        return InventoryService.alerts_after(db, alert_id, depot_id=depot_id)
+    finally:
+        db.close()
+
+async def _stock_alert_events(resume_after: Optional[str], depot_id: UUID):
+    async with broadcaster.subscribe(STOCK_ALERTS_CHANNEL) as subscription:
+        # Subscribed before replaying, so nothing committed in between is lost
+        replayed = set()
+        if resume_after is not None:
+            for row in await run_in_threadpool(_alerts_after, resume_after, depot_id):
+                replayed.add(str(row.id))
+                yield sse(dump_model(StockAlertResponse, row).decode(), "stock_alert", str(row.id))
+        while True:
+            message = await subscription.get(SSE_PING_SECONDS)
+            if message is None:
+                yield SSE_PING
+                continue
+            alert = json.loads(message)
+            alert_id = alert["id"]
+            if alert.get("depot_id") == str(depot_id) and alert_id not in replayed:
+                yield sse(message, "stock_alert", alert_id)
+
+@router.get("/stock-alerts/stream", response_class=StreamingResponse)
+def stream_stock_alerts(
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
-) -> InventoryAnalytics:
-    """Get current inventory status and low stock alerts"""
-    return AnalyticsService.get_inventory_analytics(db)
+    last_event_id: Optional[str] = Header(None),
+):
+    """Push stock alerts as Server-Sent Events; reconnecting with Last-Event-ID replays missed ones"""
+    # Authenticated already; don't hold a pooled connection for the life of the stream
+    db.close()
+    try:
+        resume_after = str(UUID(last_event_id)) if last_event_id else None
+    except ValueError:
+        resume_after = None
+    return StreamingResponse(
+        _stock_alert_events(resume_after, current_user.depot_id), media_type="text/event-stream", headers=SSE_HEADERS
+    )
 
 @router.get("/dashboard", response_model=DashboardAnalytics)
 def get_dashboard_analytics(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_analytics_user),
     days: int = Query(30, ge=1, le=365, description="Number of days to analyze"),
 ) -> DashboardAnalytics:
     """Get comprehensive dashboard analytics including sales, top products, and inventory"""
     start_date = datetime.utcnow() - timedelta(days=days)
     end_date = datetime.utcnow()
-    return AnalyticsService.get_dashboard_analytics(db, start_date, end_date)
+    return AnalyticsService.get_dashboard_analytics(db, start_date, end_date, current_user.depot_id)
 
-@router.get("/export/sales", response_class=StreamingResponse)
-def export_sales_report(
+async def _dashboard_events(days: int, depot_id: UUID):
+    async with dashboard_stream.watch(days, depot_id) as (feed, subscription):
+        yield feed.snapshot_event()
+        while True:
+            event = await subscription.get(SSE_PING_SECONDS)
+            if event is None:
+                yield SSE_PING
+            elif subscription.dropped:
+                # Fell behind and missed deltas; start over from the current state
+                subscription.dropped = 0
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                yield feed.snapshot_event()
+            else:
+                yield event
+
+@router.get("/dashboard/stream", response_class=StreamingResponse)
+def stream_dashboard_analytics(
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
+    days: int = Query(30, ge=1, le=365, description="Number of days to analyze"),
+):
+    """Dashboard analytics as Server-Sent Events: a snapshot, then a delta per committed sale"""
+    db.close()
+    return StreamingResponse(_dashboard_events(days, current_user.depot_id), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/export/sales", response_class=StreamingResponse)
+def export_sales_report(
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_analytics_user),
     days: int = Query(30, ge=1, le=365),
     format: str = Query("csv", regex="^(csv)$")
 ):
     """Export sales metrics as CSV"""
     start_date = datetime.utcnow() - timedelta(days=days)
     end_date = datetime.utcnow()
-    metrics = AnalyticsService.get_sales_metrics(db, start_date, end_date)
+    metrics = AnalyticsService.get_sales_metrics(db, start_date, end_date, current_user.depot_id)
     
     if format == "csv":
         csv_file = ReportService.generate_sales_csv(metrics)
@@ -102,12 +250,12 @@ def export_sales_report(
 
 @router.get("/export/inventory", response_class=StreamingResponse)
 def export_inventory_report(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_analytics_user),
     format: str = Query("csv", regex="^(csv)$")
 ):
     """Export inventory status as CSV"""
-    analytics = AnalyticsService.get_inventory_analytics(db)
+    analytics = AnalyticsService.get_inventory_analytics(db, current_user.depot_id)
     
     if format == "csv":
         csv_file = ReportService.generate_inventory_csv(analytics)
@@ -119,15 +267,15 @@ def export_inventory_report(
 
 @router.get("/export/dashboard", response_class=StreamingResponse)
 def export_dashboard_report(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_analytics_user),
     days: int = Query(30, ge=1, le=365),
     format: str = Query("pdf", regex="^(pdf)$")
 ):
     """Export dashboard analytics as PDF"""
     start_date = datetime.utcnow() - timedelta(days=days)
     end_date = datetime.utcnow()
-    analytics = AnalyticsService.get_dashboard_analytics(db, start_date, end_date)
+    analytics = AnalyticsService.get_dashboard_analytics(db, start_date, end_date, current_user.depot_id)
     
     if format == "pdf":
         pdf_file = ReportService.generate_dashboard_pdf(analytics)
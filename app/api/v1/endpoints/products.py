@@ -2,26 +2,42 @@ from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
 import os
 from uuid import uuid4
+from sqlalchemy import String, cast, func, select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from app.api.v1 import deps
+from app.api.v1.routing import InstrumentedRoute
 from app.models.user import User
 from app.models.product import Product
-from app.schemas.product import ProductCreate, ProductResponse
-from app.services.storage_service import StorageService
+from app.core.serialization import model_response
+from app.schemas.product import CatalogProduct, ProductChanges, ProductCreate, ProductResponse, StockShardsUpdate
+from app.services.inventory_service import parse_product_id
+from app.services.stock_shard_service import StockShardService
+from app.services.storage_service import get_storage_service
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
+
+# Listings load just the response columns as plain rows (no ORM identity map);
+# stock is the live figure, summed over the shards for sharded products
+def _columns(schema) -> list:
+    return [
+        Product.current_stock.label(name) if name == "stock_quantity" else getattr(Product, name)
+        for name in schema.model_fields
+    ]
+
+LIST_COLUMNS = _columns(ProductResponse)
+CATALOG_COLUMNS = _columns(CatalogProduct)
 
 @router.get("/", response_model=List[ProductResponse])
 def read_products(
-    db: Session = Depends(deps.get_db),
+    db: Session = Depends(deps.get_read_db),
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
     category: Optional[str] = None,
-    current_user: User = Depends(deps.get_current_user)
+    current_user: User = Depends(deps.get_read_user)
 ) -> Any:
-    query = db.query(Product).filter(Product.is_active == True)
+    query = db.query(*LIST_COLUMNS).filter(Product.depot_id == current_user.depot_id, Product.is_active == True)
     if search:
         # Search by name or SKU
         query = query.filter((Product.name.ilike(f"%{search}%")) | (Product.sku.ilike(f"%{search}%")))
@@ -29,19 +45,38 @@ def read_products(
         query = query.filter(Product.category == category)
         
     products = query.offset(skip).limit(limit).all()
-    return [ProductResponse(
-        id=str(p.id),
-        name=p.name,
-        sku=p.sku,
-        category=p.category,
-        wholesale_price=p.wholesale_price,
-        retail_price=p.retail_price,
-        stock_quantity=p.stock_quantity,
-        low_stock_threshold=p.low_stock_threshold,
-        is_active=p.is_active,
-        image_url=p.image_url,
-        created_at=p.created_at
-    ) for p in products]
+    return model_response(ProductResponse, products)
+
+@router.get("/changes", response_model=ProductChanges)
+def read_product_changes(
+    db: Session = Depends(deps.get_read_db),
+    since: int = Query(0, ge=0),
+    current_user: User = Depends(deps.get_read_user)
+) -> Any:
+    """
+    Products changed since the ``version`` of an earlier call (0: all of
+    them), for terminals keeping a local catalog.
+
+    Row versions are the ids of the transactions that wrote the rows, which
+    can commit out of order. The returned version is the oldest transaction
+    still running when the call began, so a row committed later is in the
+    next batch however low its version. The flip side: while any
+    transaction stays open (a long report, an idle session), the version
+    can't move past it, and every call re-sends the rows changed since
+    until it ends.
+
+    Holds move ``reserved_quantity`` all day, so it doesn't bump the row
+    version and isn't part of the payload; ``GET /products/`` has it live.
+    """
+    version = int(db.execute(select(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), String))).scalar())
+    rows = db.query(*CATALOG_COLUMNS).filter(
+        Product.depot_id == current_user.depot_id, Product.row_version >= since
+    ).order_by(Product.row_version).all()
+    return model_response(ProductChanges, {
+        "version": max(version, since),
+        "products": [row for row in rows if row.is_active],
+        "deactivated": [str(row.id) for row in rows if not row.is_active],
+    })
 
 @router.post("/", response_model=ProductResponse)
 def create_product(
@@ -67,7 +102,7 @@ def create_product(
 
         ext = os.path.splitext(image.filename)[1]
         filename = f"{uuid4().hex}{ext}"
-        storage_service = StorageService()
+        storage_service = get_storage_service()
         image_url = storage_service.upload_image(image, filename)
 
     if sku == "":
@@ -76,6 +111,7 @@ def create_product(
         category = None
 
     product = Product(
+        depot_id=current_user.depot_id,
         name=name,
         sku=sku,
         category=category,
@@ -92,22 +128,26 @@ def create_product(
         db.refresh(product)
     except IntegrityError as e:
         db.rollback()
-        if "ix_products_sku" in str(e.orig):
+        if "ix_products_depot_id_sku" in str(e.orig):
             raise HTTPException(status_code=400, detail="Product with this SKU already exists")
         raise HTTPException(status_code=400, detail=str(e))
-    return ProductResponse(
-        id=str(product.id),
-        name=product.name,
-        sku=product.sku,
-        category=product.category,
-        wholesale_price=product.wholesale_price,
-        retail_price=product.retail_price,
-        stock_quantity=product.stock_quantity,
-        low_stock_threshold=product.low_stock_threshold,
-        is_active=product.is_active,
-        image_url=product.image_url,
-        created_at=product.created_at
+    return model_response(ProductResponse, product)
+
+@router.put("/{product_id}/shards", response_model=ProductResponse)
+def set_stock_shards(
+    *,
+    db: Session = Depends(deps.get_db),
+    product_id: str,
+    shards_in: StockShardsUpdate,
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """Spread a hot product's stock over several counters so concurrent sales don't queue on one row."""
+    if current_user.role != "owner": # pyright: ignore[reportGeneralTypeIssues]
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    product = StockShardService.configure(
+        db, parse_product_id(product_id), shards_in.shards, depot_id=current_user.depot_id
     )
+    return model_response(ProductResponse, product)
 
 @router.delete("/{product_id}", response_model=ProductResponse)
 def delete_product(
@@ -118,7 +158,7 @@ def delete_product(
 ) -> Any:
     if current_user.role != "owner": # pyright: ignore[reportGeneralTypeIssues]
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = db.query(Product).filter(Product.id == product_id, Product.depot_id == current_user.depot_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
@@ -127,16 +167,4 @@ def delete_product(
     # or you can choose to delete it if you want to save space.
     product.is_active = False
     db.commit()
-    return ProductResponse(
-        id=str(product.id),
-        name=product.name,
-        sku=product.sku,
-        category=product.category,
-        wholesale_price=product.wholesale_price,
-        retail_price=product.retail_price,
-        stock_quantity=product.stock_quantity,
-        low_stock_threshold=product.low_stock_threshold,
-        is_active=product.is_active,
-        image_url=product.image_url,
-        created_at=product.created_at
-    )
\ No newline at end of file
+    return model_response(ProductResponse, product)
\ No newline at end of file
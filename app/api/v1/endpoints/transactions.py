@@ -1,15 +1,55 @@
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Any, Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.api.v1 import deps
+from app.api.v1.routing import InstrumentedRoute
+from app.core import tracing
+from app.core.config import settings
 from app.models.user import User
-from app.models.transaction import Transaction, TransactionItem
+from app.models.transaction import SaleType, Transaction, TransactionItem
 from app.models.product import Product
-from app.schemas.transaction import TransactionCreate, TransactionResponse, TransactionItemResponse, TopProduct
+from app.core.serialization import JSONBytesResponse, model_response
+from app.schemas.transaction import (
+    StockHoldCreate,
+    StockHoldResponse,
+    TopProduct,
+    TransactionCreate,
+    TransactionDetailResponse,
+    TransactionPage,
+    TransactionResponse,
+)
+from app.services.archive_service import ArchiveService
+from app.services.hold_service import HoldService
+from app.services.sale_batcher import sale_batcher
 from app.services.sale_service import SaleService
+from app.services.transaction_service import TransactionService
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
+
+@router.get("/", response_model=TransactionPage)
+def read_transactions(
+    db: Session = Depends(deps.get_read_db),
+    current_user: User = Depends(deps.get_read_user),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    user_id: Optional[UUID] = Query(None, description="Cashier; staff only see their own sales"),
+    sale_type: Optional[SaleType] = None,
+    product_id: Optional[UUID] = Query(None, description="Only transactions that include this product"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=500),
+) -> Any:
+    """Past transactions with their items, newest first"""
+    if getattr(current_user, "role", None) != "owner":
+        if user_id is not None and user_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not enough permissions")
+        user_id = current_user.id
+    transactions, next_cursor = TransactionService.history(
+        db, start_date, end_date, user_id, sale_type, product_id, cursor, limit, depot_id=current_user.depot_id
+    )
+    return model_response(TransactionPage, {"transactions": transactions, "next_cursor": next_cursor})
 
 @router.post("/", response_model=TransactionResponse)
 def create_transaction(
@@ -19,38 +59,63 @@ def create_transaction(
     current_user: User = Depends(deps.get_current_user)
 ) -> Any:
     # Both staff and owner can create transactions
-    transaction = SaleService.process_sale(
-        db=db,
-        user=current_user,
-        items=transaction_in.items,
-        sale_type=transaction_in.sale_type
-    )
+    if settings.SALE_BATCH_ENABLED:
+        # The writer has its own connection; don't hold this one while queued
+        db.close()
+        transaction = sale_batcher.submit(
+            current_user, transaction_in.items, transaction_in.sale_type, transaction_in.cart_id
+        )
+    else:
+        transaction = SaleService.process_sale(
+            db=db,
+            user=current_user,
+            items=transaction_in.items,
+            sale_type=transaction_in.sale_type,
+            cart_id=transaction_in.cart_id,
+        )
     
-    return TransactionResponse(
-        id=str(transaction.id),
-        total_amount=transaction.total_amount,
-        sale_type=transaction.sale_type,
-        created_at=transaction.created_at,
-        items=[
-            TransactionItemResponse(
-                product_id=str(item.product_id),
-                quantity=item.quantity,
-                price_at_sale=item.price_at_sale,
-                sale_type=item.sale_type
-            ) for item in transaction.items
-        ]
-    )
+    with tracing.span("transactions.build_response"):
+        return model_response(TransactionResponse, transaction)
 
-@router.get("/stats")
-def get_stats(
+@router.post("/holds", response_model=StockHoldResponse)
+def place_stock_holds(
+    *,
     db: Session = Depends(deps.get_db),
+    hold_in: StockHoldCreate,
     current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """Reserve stock for a cart (409 if it isn't available); pass cart_id at checkout"""
+    cart_id, expires_at, holds = HoldService.place_holds(db, current_user, hold_in.items, hold_in.cart_id)
+    return StockHoldResponse(cart_id=cart_id, expires_at=expires_at, items=holds)
+
+@router.delete("/holds/{cart_id}", response_model=StockHoldResponse)
+def release_stock_holds(
+    *,
+    db: Session = Depends(deps.get_db),
+    cart_id: UUID,
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """Release an abandoned cart's holds"""
+    released = HoldService.release_cart(db, cart_id, current_user)
+    db.commit()
+    if not released:
+        raise HTTPException(status_code=404, detail=f"Cart {cart_id} not found")
+    items = [{"product_id": product_id, "quantity": quantity} for product_id, quantity in released.items()]
+    return StockHoldResponse(cart_id=cart_id, expires_at=datetime.utcnow(), items=items)
+
+@router.get("/stats")
+def get_stats(
+    db: Session = Depends(deps.get_analytics_db),
+    current_user: User = Depends(deps.get_analytics_user)
 ) -> Any:
     # Compare value, not SQLAlchemy column object
     if getattr(current_user, "role", None) != "owner":
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    total_sales = db.query(func.sum(Transaction.total_amount)).scalar() or 0.0
-    count = db.query(Transaction).count()
+    in_depot = Transaction.depot_id == current_user.depot_id
+    # All time: archived months come from their files, the rest from the tables
+    live, archived = ArchiveService.split(db, None, None, current_user.depot_id)
+    total_sales = db.query(func.sum(Transaction.total_amount)).filter(in_depot, live).scalar() or 0.0
+    count = db.query(Transaction).filter(in_depot, live).count()
     
     # Get top selling products
     top_products_query = db.query(
@@ -58,11 +123,46 @@ def get_stats(
         Product.name,
         func.sum(TransactionItem.quantity).label("total_quantity")
     ).join(Product, TransactionItem.product_id == Product.id)\
+     .filter(Product.depot_id == current_user.depot_id)\
      .group_by(TransactionItem.product_id, Product.name)\
-     .order_by(func.sum(TransactionItem.quantity).desc())\
-     .limit(5).all()
+     .order_by(func.sum(TransactionItem.quantity).desc())
+    if archived is None:
+        top_products_query = top_products_query.limit(5).all()
+    else:
+        top_products_query = top_products_query.join(
+            Transaction, TransactionItem.transaction_id == Transaction.id
+        ).filter(live).all()
 
     # Convert UUID to string explicitly to avoid Pydantic validation error
     top_products = [TopProduct(product_id=str(row.product_id), name=row.name, quantity=row.total_quantity) for row in top_products_query]
+    if archived is not None:
+        archived_total, archived_count, _, _ = archived.totals()
+        total_sales = float(total_sales) + archived_total
+        count += archived_count
+        by_id = {product.product_id: product for product in top_products}
+        archived_products = archived.by_product()
+        missing = [product_id for product_id in archived_products if str(product_id) not in by_id]
+        names = dict(db.query(Product.id, Product.name).filter(Product.id.in_(missing)).all()) if missing else {}
+        for product_id, (quantity, _, _, _) in archived_products.items():
+            product = by_id.get(str(product_id))
+            if product is None:
+                product = by_id[str(product_id)] = TopProduct(
+                    product_id=str(product_id), name=names.get(product_id, ""), quantity=0
+                )
+            product.quantity += int(quantity)
+        top_products = sorted(by_id.values(), key=lambda product: product.quantity, reverse=True)[:5]
+
+    return JSONBytesResponse({"total_revenue": total_sales, "transaction_count": count, "top_products": top_products})
 
-    return {"total_revenue": total_sales, "transaction_count": count, "top_products": top_products}
\ No newline at end of file
+# After the fixed paths (/stats, /holds) so they aren't taken for an id
+@router.get("/{transaction_id}", response_model=TransactionDetailResponse)
+def read_transaction(
+    *,
+    db: Session = Depends(deps.get_read_db),
+    transaction_id: UUID,
+    current_user: User = Depends(deps.get_read_user)
+) -> Any:
+    """One transaction with its items, e.g. to reprint a receipt. Staff only see their own sales."""
+    user_id = None if getattr(current_user, "role", None) == "owner" else current_user.id
+    transaction = TransactionService.get(db, transaction_id, depot_id=current_user.depot_id, user_id=user_id)
+    return model_response(TransactionDetailResponse, transaction)
@@ -5,13 +5,15 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
 from app.api.v1 import deps
+from app.api.v1.routing import InstrumentedRoute
 from app.core import security
 from app.core.config import settings
 from app.models.user import User, UserRole
+from app.core.serialization import model_response
 from app.schemas.user import UserCreate, UserResponse, UserUpdate
 from app.schemas.token import Token
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 @router.post("/login", response_model=Token)
 def login_access_token(
@@ -34,15 +36,7 @@ def read_user_me(
     """
     Get current user.
     """
-    return UserResponse(
-        id=str(current_user.id),
-        username=current_user.username,
-        full_name=current_user.full_name,
-        phone=current_user.phone,
-        role=current_user.role,
-        is_active=current_user.is_active,
-        created_at=current_user.created_at
-    )
+    return model_response(UserResponse, current_user)
 
 @router.put("/me", response_model=UserResponse)
 def update_user_me(
@@ -64,15 +58,7 @@ def update_user_me(
     db.add(current_user)
     db.commit()
     db.refresh(current_user)
-    return UserResponse(
-        id=str(current_user.id),
-        username=current_user.username,
-        full_name=current_user.full_name,
-        phone=current_user.phone,
-        role=current_user.role,
-        is_active=current_user.is_active,
-        created_at=current_user.created_at
-    )
+    return model_response(UserResponse, current_user)
 
 @router.post("/", response_model=UserResponse)
 def create_user(
@@ -99,6 +85,7 @@ def create_user(
         phone = None
 
     user = User(
+        depot_id=current_user.depot_id,
         username=username,
         full_name=full_name,
         hashed_password=security.get_password_hash(password),
@@ -108,36 +95,18 @@ def create_user(
     db.add(user)
     db.commit()
     db.refresh(user)
-    return UserResponse(
-        id=str(user.id),
-        username=user.username,
-        full_name=user.full_name,
-        phone=user.phone,
-        role=user.role,
-        is_active=user.is_active,
-        created_at=user.created_at
-    )
+    return model_response(UserResponse, user)
 
 @router.get("/", response_model=List[UserResponse])
 def list_staff(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_read_db),
+    current_user: User = Depends(deps.get_read_user),
 ) -> Any:
     # Only owner can see all staff
     if (getattr(current_user, "role", None) != UserRole.OWNER and getattr(current_user, "role", None) != "owner"):
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    staff = db.query(User).filter(User.role == UserRole.STAFF).all()
-    return [
-        UserResponse(
-            id=str(user.id),
-            username=user.username,
-            full_name=user.full_name,
-            phone=user.phone,
-            role=user.role,
-            is_active=user.is_active,
-            created_at=user.created_at
-        ) for user in staff
-    ]
+    staff = db.query(User).filter(User.depot_id == current_user.depot_id, User.role == UserRole.STAFF).all()
+    return model_response(UserResponse, staff)
 
 @router.put("/{user_id}", response_model=UserResponse)
 def update_user(
@@ -156,7 +125,7 @@ def update_user(
     if str(current_user.id) == user_id:
         raise HTTPException(status_code=400, detail="Cannot update own account via this endpoint")
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.query(User).filter(User.id == user_id, User.depot_id == current_user.depot_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -170,15 +139,7 @@ def update_user(
     db.add(user)
     db.commit()
     db.refresh(user)
-    return UserResponse(
-        id=str(user.id),
-        username=user.username,
-        full_name=user.full_name,
-        phone=user.phone,
-        role=user.role,
-        is_active=user.is_active,
-        created_at=user.created_at
-    )
+    return model_response(UserResponse, user)
 
 @router.delete("/{user_id}", response_model=UserResponse)
 def delete_staff(
@@ -190,20 +151,14 @@ def delete_staff(
     # Only owner can delete staff
     if (getattr(current_user, "role", None) != UserRole.OWNER and getattr(current_user, "role", None) != "owner"):
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    user = db.query(User).filter(User.id == user_id, User.role == UserRole.STAFF).first()
+    user = db.query(User).filter(
+        User.id == user_id, User.depot_id == current_user.depot_id, User.role == UserRole.STAFF
+    ).first()
     if not user:
         raise HTTPException(status_code=404, detail="Staff user not found")
     db.delete(user)
     db.commit()
-    return UserResponse(
-        id=str(user.id),
-        username=user.username,
-        full_name=user.full_name,
-        phone=user.phone,
-        role=user.role,
-        is_active=user.is_active,
-        created_at=user.created_at
-    )
+    return model_response(UserResponse, user)
 
 @router.patch("/{user_id}/status", response_model=UserResponse)
 def toggle_user_status(
@@ -222,19 +177,11 @@ def toggle_user_status(
     if str(current_user.id) == user_id:
         raise HTTPException(status_code=400, detail="Cannot change own status")
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.query(User).filter(User.id == user_id, User.depot_id == current_user.depot_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     user.is_active = active
     db.commit()
     db.refresh(user)
-    return UserResponse(
-        id=str(user.id),
-        username=user.username,
-        full_name=user.full_name,
-        phone=user.phone,
-        role=user.role,
-        is_active=user.is_active,
-        created_at=user.created_at
-    )
\ No newline at end of file
+    return model_response(UserResponse, user)
\ No newline at end of file
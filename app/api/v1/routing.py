@@ -0,0 +1,12 @@
+from typing import Any, Callable
+from fastapi.routing import APIRoute
+from app.core import profiling
+
+class InstrumentedRoute(APIRoute):
+    """
+    APIRoute whose endpoint can be profiled on demand (see app.core.profiling).
+    Every endpoint router uses this as its route_class.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, profiling.wrap_endpoint(endpoint), **kwargs)
@@ -0,0 +1,72 @@
+"""
+Long-range analytics on Postgres versus the Parquet snapshot in DuckDB.
+
+Exports the depot's sales to a snapshot (in a temporary directory unless
+``--dir`` is given), then times the product, employee and sales-metrics
+reports over ``--days`` with snapshot routing off and on. Needs duckdb and
+pyarrow, and a database with sales (``python -m app.seed_data``).
+
+    python -m app.benchmarks.columnar_analytics --days 365 --repeat 5
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta
+from uuid import UUID
+
+import app.db.base  # noqa: F401  (registers every model)
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.depot import DEFAULT_DEPOT_ID
+from app.services.analytics_service import AnalyticsService
+from app.services.snapshot_service import SnapshotService
+
+REPORTS = {
+    "product_sales": AnalyticsService.get_product_sales,
+    "employee_sales": AnalyticsService.get_employee_sales,
+    "sales_metrics": AnalyticsService.get_sales_metrics,
+}
+
+
+def best_of(repeat: int, fn) -> float:
+    fn()  # warm up
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--depot", type=UUID, default=DEFAULT_DEPOT_ID)
+    parser.add_argument("--dir", help="snapshot directory (default: a temporary one)")
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="snapshot-")
+    settings.ANALYTICS_SNAPSHOT_DIR = directory
+    settings.ANALYTICS_SNAPSHOT_LAG_SECONDS = 0
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        exported = SnapshotService.export_depot(db, args.depot)
+        print(f"exported {exported} transactions to {directory} in {time.perf_counter() - start:.2f} s")
+
+        end = datetime.utcnow()
+        begin = end - timedelta(days=args.days)
+        for name, report in REPORTS.items():
+            settings.ANALYTICS_SNAPSHOT_DIR = None
+            postgres = best_of(args.repeat, lambda: report(db, begin, end, args.depot))
+            settings.ANALYTICS_SNAPSHOT_DIR = directory
+            columnar = best_of(args.repeat, lambda: report(db, begin, end, args.depot))
+            print(f"{name:>15} over {args.days} days: postgres {postgres * 1000:7.1f} ms, "
+                  f"duckdb {columnar * 1000:7.1f} ms ({postgres / columnar:.1f}x)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Payload size and latency of large responses over a slow link, per encoding.
+
+Starts a local uvicorn (like ``load_test``) behind an in-process TCP proxy
+that holds each chunk for half of ``--rtt-ms`` each way and caps the link at
+``--kbps``, then fetches the big listing routes as an owner of ``--depot``
+with every combination of JSON/MessagePack and identity/gzip/brotli.
+Latency is from sending the request to having the decoded document, so it
+includes server-side compression and client-side decompression.
+
+    python -m app.benchmarks.content_negotiation --kbps 1000 --rtt-ms 100 --repeat 3
+
+MessagePack and brotli rows need the ``msgpack`` and ``brotli`` packages.
+"""
+import argparse
+import asyncio
+import gzip
+import http.client
+import json
+import os
+import statistics
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from app.benchmarks.load_test import start_server
+from app.core.security import create_access_token
+from app.db.session import SessionLocal
+from app.models.depot import DEFAULT_DEPOT_ID
+from app.models.user import User, UserRole
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+ROUTES = [
+    "/api/v1/products/?limit=1000",
+    "/api/v1/analytics/inventory",
+    "/api/v1/analytics/product-sales?days=30",
+]
+
+
+class ThrottledLink:
+    """TCP proxy on ``port`` to ``target``, with a one-way delay and a bandwidth cap per direction."""
+
+    def __init__(self, port: int, target: Tuple[str, int], kbps: float, rtt_ms: float) -> None:
+        self.port = port
+        self.target = target
+        self.bytes_per_second = kbps * 1000 / 8
+        self.delay = rtt_ms / 2000
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, daemon=True).start()
+        self.ready.wait()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(asyncio.start_server(self._connect, "127.0.0.1", self.port))
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def _connect(self, client_reader, client_writer) -> None:
+        server_reader, server_writer = await asyncio.open_connection(*self.target)
+        await asyncio.gather(
+            self._pipe(client_reader, server_writer), self._pipe(server_reader, client_writer),
+            return_exceptions=True,
+        )
+
+    async def _pipe(self, reader, writer) -> None:
+        queue: asyncio.Queue = asyncio.Queue()
+        link_free_at = 0.0
+
+        async def deliver() -> None:
+            while True:
+                deliver_at, chunk = await queue.get()
+                await asyncio.sleep(max(deliver_at - self.loop.time(), 0))
+                if not chunk:
+                    writer.close()
+                    return
+                writer.write(chunk)
+                await writer.drain()
+
+        delivery = asyncio.ensure_future(deliver())
+        while True:
+            chunk = await reader.read(16384)
+            # Each chunk waits for the link to be free, takes its transfer time, then the propagation delay
+            link_free_at = max(link_free_at, self.loop.time()) + len(chunk) / self.bytes_per_second
+            queue.put_nowait((link_free_at + self.delay, chunk))
+            if not chunk:
+                break
+        await delivery
+
+
+def _decoders() -> Dict[str, Callable[[bytes], bytes]]:
+    decoders = {"identity": lambda body: body, "gzip": gzip.decompress}
+    if brotli is not None:
+        decoders["br"] = brotli.decompress
+    return decoders
+
+
+def _formats() -> Dict[str, Tuple[str, Callable[[bytes], object]]]:
+    formats = {"json": ("application/json", json.loads)}
+    if msgpack is not None:
+        formats["msgpack"] = ("application/msgpack", msgpack.unpackb)
+    return formats
+
+
+def fetch(conn: http.client.HTTPConnection, path: str, token: str, accept: str, encoding: str,
+          decode: Callable[[bytes], bytes], parse: Callable[[bytes], object]) -> Tuple[float, int]:
+    start = time.perf_counter()
+    conn.request("GET", path, headers={
+        "Authorization": f"Bearer {token}", "Accept": accept, "Accept-Encoding": encoding,
+    })
+    response = conn.getresponse()
+    body = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"{path}: {response.status} {body[:200]!r}")
+    if response.getheader("Content-Encoding", "identity") != encoding and len(body) >= 1024:
+        raise RuntimeError(f"{path}: asked for {encoding}, got {response.getheader('Content-Encoding')}")
+    parse(decode(body) if response.getheader("Content-Encoding") else body)
+    return time.perf_counter() - start, len(body)
+
+
+def owner_token(depot_id: UUID) -> str:
+    db = SessionLocal()
+    try:
+        owner = db.query(User).filter(User.depot_id == depot_id, User.role == UserRole.OWNER).first()
+        if owner is None:
+            raise RuntimeError(f"no owner in depot {depot_id}; run python -m app.seed_data")
+        return create_access_token(owner.username)
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kbps", type=float, default=1000.0, help="link bandwidth per direction")
+    parser.add_argument("--rtt-ms", type=float, default=100.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--depot", type=UUID, default=DEFAULT_DEPOT_ID)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--proxy-port", type=int, default=8766)
+    args = parser.parse_args()
+
+    token = owner_token(args.depot)
+    os.environ.setdefault("HOT_WINDOW_DAYS", "0")  # no background load skewing the timings
+    server = start_server(args.host, args.port, 1)
+    try:
+        ThrottledLink(args.proxy_port, (args.host, args.port), args.kbps, args.rtt_ms).start()
+        print(f"link: {args.kbps:g} kbit/s, {args.rtt_ms:g} ms RTT")
+        for path in ROUTES:
+            conn = http.client.HTTPConnection("127.0.0.1", args.proxy_port, timeout=120)
+            baseline: Optional[Tuple[float, int]] = None
+            print(path)
+            for name, (accept, parse) in _formats().items():
+                for encoding, decode in _decoders().items():
+                    fetch(conn, path, token, accept, encoding, decode, parse)  # warm up
+                    runs: List[Tuple[float, int]] = [
+                        fetch(conn, path, token, accept, encoding, decode, parse) for _ in range(args.repeat)
+                    ]
+                    latency = statistics.median(seconds for seconds, _ in runs)
+                    size = runs[-1][1]
+                    baseline = baseline or (latency, size)
+                    print(f"  {name:>7} {encoding:>8}: {size / 1024:8.1f} KiB ({size / baseline[1]:4.0%}), "
+                          f"{latency * 1000:7.0f} ms ({latency / baseline[0]:4.0%})")
+            conn.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Cost of the reorder forecast's NumPy step for a large catalog.
+
+Builds a synthetic products x days sales matrix (Poisson daily sales with a
+skewed popularity and a mild trend) and times ``compute_reorder`` on it.
+No database is needed; the SQL side is two grouped queries whose cost
+depends on the sales volume in the window, not on this step.
+
+    python -m app.benchmarks.forecast --products 50000 --days 28 --repeat 20
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.forecast_service import compute_reorder
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=28)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    base = 50.0 / (np.arange(args.products) + 1) ** 0.8
+    growth = 1 + rng.uniform(-0.5, 0.5, args.products)[:, None] * np.linspace(0, 1, args.days)
+    sales = rng.poisson(base[:, None] * growth).astype(np.float64)
+    available = rng.integers(0, 500, args.products).astype(np.float64)
+
+    compute_reorder(sales, available, 7, 30)  # warm up
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        figures = compute_reorder(sales, available, 7, 30)
+        best = min(best, time.perf_counter() - start)
+    print(f"{args.products} products x {args.days} days: best of {args.repeat} {best * 1000:.1f} ms, "
+          f"{int(figures['reorder'].sum())} due for reorder")
+
+
+if __name__ == "__main__":
+    main()
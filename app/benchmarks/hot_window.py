@@ -0,0 +1,71 @@
+"""
+Recent-range analytics on Postgres versus the in-memory hot window.
+
+Loads the last ``--days`` of sales into the window (reporting load time,
+lines and memory), then times the product, employee, sales-metrics and
+dashboard reports over ``--range`` days with the window empty and loaded.
+Needs a database with sales (``python -m app.seed_data``).
+
+    python -m app.benchmarks.hot_window --days 90 --range 30 --repeat 5
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from uuid import UUID
+
+import app.db.base  # noqa: F401  (registers every model)
+from app.db.session import SessionLocal
+from app.models.depot import DEFAULT_DEPOT_ID
+from app.services.analytics_service import AnalyticsService
+from app.services.hot_window import hot_window
+
+REPORTS = {
+    "product_sales": AnalyticsService.get_product_sales,
+    "employee_sales": AnalyticsService.get_employee_sales,
+    "sales_metrics": AnalyticsService.get_sales_metrics,
+    "dashboard": AnalyticsService.get_dashboard_analytics,
+}
+
+
+def best_of(repeat: int, fn) -> float:
+    fn()  # warm up
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90, help="days of sales held in the window")
+    parser.add_argument("--range", type=int, default=30, help="days each report covers")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--depot", type=UUID, default=DEFAULT_DEPOT_ID)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        hot_window.load(db, args.days)
+        lines = hot_window.lines
+        print(f"loaded {lines} lines in {time.perf_counter() - start:.2f} s: "
+              f"{hot_window.nbytes / 2 ** 20:.1f} MiB, {hot_window.nbytes / max(lines, 1) * 1e6 / 2 ** 20:.0f} MiB "
+              f"per million lines")
+
+        end = datetime.utcnow()
+        begin = end - timedelta(days=args.range)
+        for name, report in REPORTS.items():
+            hot_window.ready = False
+            postgres = best_of(args.repeat, lambda: report(db, begin, end, args.depot))
+            hot_window.ready = True
+            memory = best_of(args.repeat, lambda: report(db, begin, end, args.depot))
+            print(f"{name:>15} over {args.range} days: postgres {postgres * 1000:7.1f} ms, "
+                  f"window {memory * 1000:7.1f} ms ({postgres / memory:.1f}x)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
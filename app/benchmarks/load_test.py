@@ -0,0 +1,548 @@
+"""
+HTTP load test with a realistic POS traffic mix.
+
+Starts a local uvicorn (local storage backend, request logging sampled out)
+against the configured Postgres and drives it with virtual users on plain
+threads using keep-alive ``http.client`` connections:
+
+* cashiers scan products (``GET /products?search=``) and sell 1-5 line carts
+  (``POST /transactions``);
+* terminals poll the product list;
+* owners refresh ``/analytics/dashboard`` and occasionally export reports or
+  add a product with an image.
+
+The report has throughput, p50/p95/p99 and error rate per route plus DB pool
+saturation scraped from ``/metrics`` (pool gauges are per worker, so run
+with one worker when you care about them). Results are written as JSON so a
+later run can be diffed against a saved baseline:
+
+    python -m app.benchmarks.load_test --duration 60 --output baseline.json
+    python -m app.benchmarks.load_test --duration 60 --compare baseline.json
+
+Runs are reproducible for a given ``--seed``: each virtual user draws its
+carts and think times from its own seeded RNG. Fixture users and products
+are prefixed ``loadtest-`` and are reset (not duplicated) on every run.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+FIXTURE_PASSWORD = "loadtest"
+# Pool gauges are labelled by engine; the write path lives on the primary
+PRIMARY_POOL = '{}{{engine="primary"}}'
+SEARCH_TERMS = ("refill", "gallon", "bottle", "cap", "seal", "round", "slim", "500ml")
+CATEGORIES = ("Water", "Containers", "Accessories")
+# 1x1 transparent PNG for the product upload path
+PNG_PIXEL = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Recorder:
+    """Collects latency and status per route from all virtual users."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, route: str, status: str, elapsed: float) -> None:
+        with self._lock:
+            self.latencies[route].append(elapsed)
+            self.statuses[route][status] += 1
+
+    def summary(self, duration: float) -> Dict[str, Dict[str, Any]]:
+        routes = {}
+        with self._lock:
+            for route, values in sorted(self.latencies.items()):
+                values = sorted(values)
+                statuses = self.statuses[route]
+                errors = sum(n for status, n in statuses.items() if not status.startswith(("2", "3")))
+                routes[route] = {
+                    "count": len(values),
+                    "rps": round(len(values) / duration, 2),
+                    "p50_ms": round(percentile(values, 50) * 1000, 2),
+                    "p95_ms": round(percentile(values, 95) * 1000, 2),
+                    "p99_ms": round(percentile(values, 99) * 1000, 2),
+                    "max_ms": round(values[-1] * 1000, 2),
+                    "errors": errors,
+                    "error_rate": round(errors / len(values), 4),
+                    "statuses": dict(statuses),
+                }
+        return routes
+
+
+class Client:
+    """One keep-alive connection; every call is timed into the recorder."""
+
+    def __init__(self, host: str, port: int, recorder: Recorder, token: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.recorder = recorder
+        self.token = token
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+
+    def request(self, route: str, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        headers = dict(headers or {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        start = time.perf_counter()
+        try:
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed an idle keep-alive connection; reconnect once
+                self.conn.close()
+                start = time.perf_counter()
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self.recorder.record(route, type(e).__name__, time.perf_counter() - start)
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            return 0, b""
+        self.recorder.record(route, str(response.status), time.perf_counter() - start)
+        return response.status, payload
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _multipart(fields: Dict[str, str], file_field: str, file_name: str, content: bytes,
+               content_type: str) -> Tuple[bytes, str]:
+    boundary = f"loadtest{random.getrandbits(64):016x}"
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{file_name}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n".encode() + content + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, name: str, client: Client, rng: random.Random, stop: threading.Event,
+                 think_scale: float, product_ids: List[str]):
+        super().__init__(name=name, daemon=True)
+        self.client = client
+        self.rng = rng
+        self.stop_event = stop
+        self.think_scale = think_scale
+        self.product_ids = product_ids
+
+    def think(self, low: float, high: float) -> None:
+        if self.think_scale > 0:
+            self.stop_event.wait(self.rng.uniform(low, high) * self.think_scale)
+
+    def run(self) -> None:
+        try:
+            while not self.stop_event.is_set():
+                self.step()
+        finally:
+            self.client.close()
+
+    def step(self) -> None:
+        raise NotImplementedError
+
+
+class Cashier(VirtualUser):
+    """Scans a few products, then rings up a 1-5 line cart."""
+
+    def step(self) -> None:
+        for _ in range(self.rng.randint(1, 3)):
+            query = urllib.parse.urlencode({"search": self.rng.choice(SEARCH_TERMS), "limit": 20})
+            self.client.request("GET /products/", "GET", f"/api/v1/products/?{query}")
+            self.think(0.2, 1.0)
+        lines = self.rng.sample(self.product_ids, self.rng.randint(1, min(5, len(self.product_ids))))
+        cart = {
+            "sale_type": "mixed",
+            "items": [
+                {
+                    "product_id": product_id,
+                    "quantity": self.rng.randint(1, 4),
+                    "sale_type": self.rng.choice(("retail", "retail", "wholesale")),
+                }
+                for product_id in lines
+            ],
+        }
+        self.client.request(
+            "POST /transactions/", "POST", "/api/v1/transactions/",
+            body=json.dumps(cart).encode(), headers={"Content-Type": "application/json"},
+        )
+        self.think(1.0, 4.0)
+
+
+class Terminal(VirtualUser):
+    """Customer-facing terminal refreshing the full product list."""
+
+    def step(self) -> None:
+        self.client.request("GET /products/", "GET", "/api/v1/products/?limit=100")
+        self.think(1.5, 2.5)
+
+
+class Owner(VirtualUser):
+    """Watches the dashboard; now and then exports a report or adds a product."""
+
+    def step(self) -> None:
+        self.client.request("GET /analytics/dashboard", "GET", "/api/v1/analytics/dashboard?days=30")
+        roll = self.rng.random()
+        if roll < 0.05:
+            self.client.request("GET /analytics/export/sales", "GET", "/api/v1/analytics/export/sales?days=30")
+        elif roll < 0.08:
+            self.client.request("GET /analytics/export/dashboard", "GET", "/api/v1/analytics/export/dashboard?days=30")
+        elif roll < 0.10:
+            body, content_type = _multipart(
+                {
+                    "name": f"loadtest-new-{self.rng.getrandbits(32):08x}",
+                    "category": self.rng.choice(CATEGORIES),
+                    "wholesale_price": "10",
+                    "retail_price": "15",
+                    "stock_quantity": "100",
+                },
+                "image", "pixel.png", PNG_PIXEL, "image/png",
+            )
+            self.client.request("POST /products/", "POST", "/api/v1/products/", body=body,
+                                headers={"Content-Type": content_type})
+        self.think(3.0, 8.0)
+
+
+class PoolSampler(threading.Thread):
+    """Scrapes /metrics for DB pool gauges and checkout wait while the test runs."""
+
+    def __init__(self, host: str, port: int, stop: threading.Event, interval: float = 0.5):
+        super().__init__(name="pool-sampler", daemon=True)
+        self.host = host
+        self.port = port
+        self.stop_event = stop
+        self.interval = interval
+        self.samples: List[Dict[str, float]] = []
+        self.first: Optional[Dict[str, float]] = None
+        self.last: Optional[Dict[str, float]] = None
+
+    def scrape(self) -> Optional[Dict[str, float]]:
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=5)
+        try:
+            conn.request("GET", "/metrics")
+            text = conn.getresponse().read().decode()
+        except (OSError, http.client.HTTPException):
+            return None
+        finally:
+            conn.close()
+        return parse_metrics(text)
+
+    def run(self) -> None:
+        self.first = self.scrape()
+        while not self.stop_event.wait(self.interval):
+            sample = self.scrape()
+            if sample is not None:
+                self.samples.append(sample)
+        self.last = self.scrape()
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.samples:
+            return {}
+        size = max(s.get(PRIMARY_POOL.format("db_pool_size"), 0.0) for s in self.samples)
+        checked_out = [s.get(PRIMARY_POOL.format("db_pool_checked_out"), 0.0) for s in self.samples]
+        overflow = [s.get(PRIMARY_POOL.format("db_pool_overflow"), 0.0) for s in self.samples]
+        result: Dict[str, Any] = {
+            "pool_size": size,
+            "max_checked_out": max(checked_out),
+            "mean_checked_out": round(sum(checked_out) / len(checked_out), 2),
+            "max_overflow": max(overflow),
+            # Share of samples where every pooled connection was in use
+            "saturated_fraction": round(sum(1 for c in checked_out if size and c >= size) / len(checked_out), 4),
+        }
+        if self.first and self.last:
+            result.update(_checkout_wait(self.first, self.last))
+        return result
+
+
+def parse_metrics(text: str) -> Dict[str, float]:
+    """Flatten the unlabelled/``le``-labelled samples of a Prometheus text page."""
+    values: Dict[str, float] = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name, _, value = line.rpartition(" ")
+        try:
+            values[name] = float(value)
+        except ValueError:
+            continue
+    return values
+
+
+def _checkout_wait(first: Dict[str, float], last: Dict[str, float]) -> Dict[str, Any]:
+    """Checkout count and approximate p95 wait from the histogram delta."""
+    prefix = 'db_pool_checkout_seconds_bucket{engine="primary",le="'
+    buckets = []
+    for name, value in last.items():
+        if name.startswith(prefix):
+            bound = name[len(prefix):-2]
+            buckets.append((float("inf") if bound == "+Inf" else float(bound), value - first.get(name, 0.0)))
+    buckets.sort()
+    total = buckets[-1][1] if buckets else 0.0
+    p95 = None
+    for bound, cumulative in buckets:
+        if total and cumulative >= 0.95 * total:
+            p95 = bound
+            break
+    return {
+        "checkouts": int(total),
+        "checkout_wait_p95_le_ms": None if p95 is None or p95 == float("inf") else p95 * 1000,
+    }
+
+
+def prepare_fixtures(cashiers: int, owners: int, products: int, seed: int) -> Tuple[Dict[str, List[str]], List[str]]:
+    """Create (or reset) the load-test users and products directly in the database."""
+    from app.core.security import get_password_hash
+    from app.db.session import SessionLocal
+    from app.models.product import Product
+    from app.models.user import User, UserRole
+
+    rng = random.Random(seed)
+    usernames: Dict[str, List[str]] = {"staff": [], "owner": []}
+    db = SessionLocal()
+    try:
+        password_hash = get_password_hash(FIXTURE_PASSWORD)
+        wanted = [(f"loadtest-cashier-{i}@waterdepot.local", UserRole.STAFF) for i in range(cashiers)]
+        wanted += [(f"loadtest-owner-{i}@waterdepot.local", UserRole.OWNER) for i in range(owners)]
+        existing = {u.username: u for u in db.query(User).filter(User.username.like("loadtest-%")).all()}
+        for username, role in wanted:
+            user = existing.get(username)
+            if user is None:
+                user = User(username=username, full_name=username.split("@")[0], role=role)
+                db.add(user)
+            user.hashed_password = password_hash
+            user.is_active = True
+            usernames[role.value].append(username)
+
+        existing_products = {p.sku: p for p in db.query(Product).filter(Product.sku.like("LOADTEST-%")).all()}
+        product_rows = []
+        for i in range(products):
+            sku = f"LOADTEST-{i:04d}"
+            product = existing_products.get(sku)
+            if product is None:
+                retail = round(rng.uniform(5, 250), 2)
+                product = Product(
+                    name=f"loadtest {rng.choice(SEARCH_TERMS)} {i}",
+                    sku=sku,
+                    category=rng.choice(CATEGORIES),
+                    retail_price=retail,
+                    wholesale_price=round(retail * 0.8, 2),
+                )
+                db.add(product)
+            # Enough stock that sales never fail on quantity during a run
+            product.stock_quantity = 1_000_000
+            product.is_active = True
+            product_rows.append(product)
+        db.commit()
+        product_ids = [str(p.id) for p in product_rows]
+    finally:
+        db.close()
+    return usernames, product_ids
+
+
+def login(host: str, port: int, username: str) -> str:
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        body = urllib.parse.urlencode({"username": username, "password": FIXTURE_PASSWORD})
+        conn.request("POST", "/api/v1/users/login", body=body,
+                     headers={"Content-Type": "application/x-www-form-urlencoded"})
+        response = conn.getresponse()
+        payload = response.read()
+        if response.status != 200:
+            raise RuntimeError(f"login failed for {username}: {response.status} {payload[:200]!r}")
+        return json.loads(payload)["access_token"]
+    finally:
+        conn.close()
+
+
+def start_server(host: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.setdefault("STORAGE_BACKEND", "local")
+    env.setdefault("LOG_REQUEST_DEFAULT_SAMPLE_RATE", "0.0")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", host, "--port", str(port),
+         "--workers", str(workers), "--no-access-log"],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            conn.close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start within 30s")
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    usernames, product_ids = prepare_fixtures(args.cashiers, args.owners, args.products, args.seed)
+    server = None if args.external else start_server(args.host, args.port, args.workers)
+    try:
+        tokens = {name: login(args.host, args.port, name) for names in usernames.values() for name in names}
+        recorder = Recorder()
+        stop = threading.Event()
+        users: List[VirtualUser] = []
+        index = 0
+
+        def spawn(cls, token):
+            nonlocal index
+            client = Client(args.host, args.port, recorder, token)
+            users.append(cls(f"{cls.__name__.lower()}-{index}", client, random.Random(args.seed + index),
+                             stop, args.think_scale, product_ids))
+            index += 1
+
+        for name in usernames["staff"]:
+            spawn(Cashier, tokens[name])
+        for i in range(args.terminals):
+            spawn(Terminal, tokens[usernames["staff"][i % len(usernames["staff"])]])
+        for name in usernames["owner"]:
+            spawn(Owner, tokens[name])
+
+        sampler = PoolSampler(args.host, args.port, stop)
+        sampler.start()
+        start = time.perf_counter()
+        for user in users:
+            user.start()
+        stop.wait(args.duration)
+        stop.set()
+        for user in users:
+            user.join(timeout=35)
+        duration = time.perf_counter() - start
+        sampler.join(timeout=10)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=15)
+
+    routes = recorder.summary(duration)
+    total = sum(r["count"] for r in routes.values())
+    errors = sum(r["errors"] for r in routes.values())
+    return {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "seed": args.seed,
+            "duration_s": round(duration, 2),
+            "cashiers": args.cashiers,
+            "terminals": args.terminals,
+            "owners": args.owners,
+            "products": args.products,
+            "workers": args.workers,
+            "think_scale": args.think_scale,
+        },
+        "throughput_rps": round(total / duration, 2),
+        "requests": total,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "routes": routes,
+        "pool": sampler.summary(),
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print per-route deltas against a baseline and return the regressions."""
+    regressions = []
+    print(f"\n{'route':<34}{'p95 base':>10}{'p95 now':>10}{'delta':>9}{'err base':>10}{'err now':>9}")
+    for route, now in current["routes"].items():
+        base = baseline.get("routes", {}).get(route)
+        if base is None:
+            print(f"{route:<34}{'-':>10}{now['p95_ms']:>10.1f}{'new':>9}")
+            continue
+        delta = (now["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        print(f"{route:<34}{base['p95_ms']:>10.1f}{now['p95_ms']:>10.1f}{delta:>+9.1%}"
+              f"{base['error_rate']:>10.2%}{now['error_rate']:>9.2%}")
+        if delta > tolerance:
+            regressions.append(f"{route}: p95 {base['p95_ms']}ms -> {now['p95_ms']}ms ({delta:+.0%})")
+        if now["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{route}: error rate {base['error_rate']:.2%} -> {now['error_rate']:.2%}")
+    if baseline.get("throughput_rps"):
+        delta = (current["throughput_rps"] - baseline["throughput_rps"]) / baseline["throughput_rps"]
+        print(f"throughput: {baseline['throughput_rps']} -> {current['throughput_rps']} req/s ({delta:+.1%})")
+        if delta < -tolerance:
+            regressions.append(f"throughput {baseline['throughput_rps']} -> {current['throughput_rps']} req/s")
+    return regressions
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    meta = result["meta"]
+    print(f"{result['requests']} requests in {meta['duration_s']}s: {result['throughput_rps']} req/s, "
+          f"error rate {result['error_rate']:.2%}")
+    print(f"{'route':<34}{'count':>7}{'rps':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}{'errors':>8}")
+    for route, r in result["routes"].items():
+        print(f"{route:<34}{r['count']:>7}{r['rps']:>8.1f}{r['p50_ms']:>8.1f}{r['p95_ms']:>8.1f}"
+              f"{r['p99_ms']:>8.1f}{r['max_ms']:>8.1f}{r['errors']:>8}")
+    pool = result["pool"]
+    if pool:
+        print(f"pool: size {pool['pool_size']:.0f}, checked out max {pool['max_checked_out']:.0f} "
+              f"(mean {pool['mean_checked_out']}), overflow max {pool['max_overflow']:.0f}, "
+              f"saturated {pool['saturated_fraction']:.1%} of samples, "
+              f"checkout p95 <= {pool.get('checkout_wait_p95_le_ms')} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of load")
+    parser.add_argument("--cashiers", type=int, default=8)
+    parser.add_argument("--terminals", type=int, default=4)
+    parser.add_argument("--owners", type=int, default=1)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--think-scale", type=float, default=1.0, help="multiplier on think times; 0 = closed loop")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--external", action="store_true", help="use a server already listening on --host/--port")
+    parser.add_argument("--output", help="write the JSON result here")
+    parser.add_argument("--compare", help="baseline JSON to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95/throughput regression (0.2 = 20%%)")
+    args = parser.parse_args()
+    if args.cashiers < 1:
+        parser.error("--cashiers must be at least 1")
+
+    result = run(args)
+    print_report(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+        print(f"saved {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), result, args.tolerance)
+        if regressions:
+            print("\nregressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
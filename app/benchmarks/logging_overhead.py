@@ -0,0 +1,108 @@
+"""
+Micro-benchmark for the request logging middleware.
+
+Compares the previous ``log_requests`` implementation (two eager f-strings
+with the full URL, synchronous stream handler) with the sampled, queue-backed
+``observe_requests`` middleware in ``app.main`` (which also records metrics).
+Log output goes to /dev/null, so the numbers are the cost paid on the event
+loop per request.
+
+    python -m app.benchmarks.logging_overhead --requests 20000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from fastapi import Request
+from starlette.responses import Response
+
+from app.core import logging_config
+
+
+def _make_scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"search=refill&category=Water",
+        "headers": [(b"host", b"localhost:8000"), (b"user-agent", b"pos-terminal/1.0")],
+        "server": ("localhost", 8000),
+        "client": ("127.0.0.1", 50000),
+    }
+
+
+async def _call_next(request: Request) -> Response:
+    return Response(b"[]", media_type="application/json")
+
+
+def _legacy_middleware(devnull):
+    logger = logging.getLogger("bench.legacy")
+    logger.propagate = False
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(logging.Formatter(logging_config.LOG_FORMAT))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    async def log_requests(request: Request, call_next):
+        logger.info(f"Request: {request.method} {request.url}")
+        response = await call_next(request)
+        logger.info(f"Response: {response.status_code} {request.method} {request.url}")
+        return response
+
+    return log_requests
+
+
+async def _run(middleware, path: str, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        await middleware(Request(_make_scope(path)), _call_next)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, "w")
+    from app.main import observe_requests
+
+    # Point the queue listener at /dev/null as well
+    logging_config.configure_logging(stream=devnull)
+    legacy = _legacy_middleware(devnull)
+
+    async def bench():
+        baseline = await _run(_call_next_only, "/api/v1/products/", args.requests)
+        results = {
+            "no middleware": baseline,
+            "legacy /api/v1/products/": await _run(legacy, "/api/v1/products/", args.requests),
+            "structured /api/v1/products/": await _run(observe_requests, "/api/v1/products/", args.requests),
+            "structured / (sampled out)": await _run(observe_requests, "/", args.requests),
+        }
+        return results
+
+    async def _call_next_only(request, call_next):
+        return await call_next(request)
+
+    results = asyncio.run(bench())
+    drain_start = time.perf_counter()
+    logging_config.flush_logging()
+    drain = time.perf_counter() - drain_start
+
+    baseline = results["no middleware"]
+    print(f"{'variant':<32}{'us/request':>12}{'overhead us':>14}")
+    for name, elapsed in results.items():
+        per_request = elapsed / args.requests * 1e6
+        overhead = (elapsed - baseline) / args.requests * 1e6
+        print(f"{name:<32}{per_request:>12.2f}{overhead:>14.2f}")
+    print(f"background writer drain after run: {drain * 1000:.1f} ms (off the event loop)")
+
+
+if __name__ == "__main__":
+    main()
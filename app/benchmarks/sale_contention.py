@@ -0,0 +1,305 @@
+"""
+Contention stress harness for ``SaleService.process_sale``.
+
+Drives the sale engine in-process from many threads (optionally spread over
+several processes) with overlapping multi-product carts whose products are
+drawn with a skewed popularity, so a few hot SKUs (the refills) are in most
+carts. For each concurrency level it reports:
+
+* committed sales/s and sale latency p50/p99;
+* mean row-lock wait per sale (from ``sale_lock_wait_seconds``);
+* deadlocks, lock timeouts, out-of-stock rejections and retries;
+* invariant violations: negative stock, a stock delta that doesn't match the
+  quantities sold, or a transaction total that doesn't match its items.
+
+Run it at increasing concurrency to see where throughput stops scaling:
+
+    python -m app.benchmarks.sale_contention --concurrency 1,2,4,8,16,32 --duration 10
+    python -m app.benchmarks.sale_contention --concurrency 8 --processes 4 --lock-timeout-ms 500
+    python -m app.benchmarks.sale_contention --concurrency 1,4,8,16 --shards 8 --hot 3
+    python -m app.benchmarks.sale_contention --concurrency 1,8,32 --batch
+
+Deadlocked or timed-out sales are rolled back and retried (``--max-retries``)
+the way a terminal would resubmit them. Fixture products use the ``STRESS-``
+SKU prefix and their stock is reset before every level.
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from threading import Barrier, Thread
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.security import get_password_hash
+from app.models.product import Product
+from app.models.transaction import SaleType, Transaction, TransactionItem
+from app.models.user import User, UserRole
+from app.schemas.transaction import TransactionItemCreate
+from app.seed_data import popularity_weights
+from app.services.sale_batcher import SaleBatcher
+from app.services.sale_service import DEADLOCK_PGCODE, LOCK_WAIT_PGCODES, SaleService
+from app.services.stock_shard_service import StockShardService
+
+STRESS_SKU_PREFIX = "STRESS-"
+STRESS_USERNAME = "stress-cashier@waterdepot.local"
+
+
+def _session_factory(pool_size: int):
+    engine = create_engine(
+        settings.SQLALCHEMY_DATABASE_URI, pool_size=max(pool_size, 1), max_overflow=0, pool_pre_ping=True
+    )
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def prepare(db, products: int, stock: int, shards: int = 0, hot: int = 0) -> Dict[str, Any]:
+    """
+    Create or reset the stress products and cashier; returns their ids. The
+    ``hot`` most popular products get ``shards`` stock counters each.
+    """
+    user = db.query(User).filter(User.username == STRESS_USERNAME).first()
+    if user is None:
+        user = User(username=STRESS_USERNAME, hashed_password=get_password_hash("stress"), role=UserRole.STAFF)
+        db.add(user)
+    existing = {p.sku: p for p in db.query(Product).filter(Product.sku.like(f"{STRESS_SKU_PREFIX}%")).all()}
+    for product in existing.values():
+        if product.stock_shards:
+            StockShardService.configure(db, product.id, 0)
+    rows = []
+    for i in range(products):
+        sku = f"{STRESS_SKU_PREFIX}{i:04d}"
+        product = existing.get(sku)
+        if product is None:
+            product = Product(name=f"Stress product {i}", sku=sku, wholesale_price=25.0, retail_price=35.0)
+            db.add(product)
+        product.stock_quantity = stock
+        product.is_active = True
+        rows.append(product)
+    db.commit()
+    for product in rows[:hot] if shards else ():
+        StockShardService.configure(db, product.id, shards)
+    return {"user_id": user.id, "product_ids": [p.id for p in rows], "stock": stock}
+
+
+def _random_cart(rng: random.Random, product_ids: Sequence, cum_weights: Sequence[float],
+                 max_lines: int) -> List[TransactionItemCreate]:
+    chosen = set(rng.choices(range(len(product_ids)), cum_weights=cum_weights, k=rng.randint(1, max_lines)))
+    # Lines follow the draw order; process_sale must not lock in that order or carts deadlock
+    return [
+        TransactionItemCreate(
+            product_id=str(product_ids[index]),
+            quantity=rng.randint(1, 3),
+            sale_type=SaleType.WHOLESALE if rng.random() < 0.2 else SaleType.RETAIL,
+        )
+        for index in chosen
+    ]
+
+
+def _error_kind(exc: Exception) -> str:
+    pgcode = getattr(getattr(exc, "orig", None), "pgcode", None)
+    if pgcode == DEADLOCK_PGCODE:
+        return "deadlocks"
+    if pgcode in LOCK_WAIT_PGCODES:
+        return "lock_timeouts"
+    return "db_errors"
+
+
+def _cashier(session_factory, fixture: Dict[str, Any], seed: int, duration: float, max_lines: int,
+             max_retries: int, lock_timeout_ms: int, start: Barrier, result: Dict[str, Any],
+             batcher: Optional[SaleBatcher] = None) -> None:
+    rng = random.Random(seed)
+    product_ids = fixture["product_ids"]
+    weights = popularity_weights(len(product_ids))
+    cum_weights = [sum(weights[: i + 1]) for i in range(len(weights))]
+    db = session_factory()
+    try:
+        user = db.get(User, fixture["user_id"])
+        start.wait()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            items = _random_cart(rng, product_ids, cum_weights, max_lines)
+            began = time.perf_counter()
+            for attempt in range(max_retries + 1):
+                try:
+                    if lock_timeout_ms:
+                        db.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+                    if batcher is not None:
+                        batcher.submit(user, items, SaleType.MIXED)
+                    else:
+                        SaleService.process_sale(db, user, items, SaleType.MIXED)
+                    result["sales"] += 1
+                    result["latencies"].append(time.perf_counter() - began)
+                    break
+                except HTTPException:
+                    db.rollback()
+                    result["out_of_stock"] += 1
+                    break
+                except OperationalError as e:
+                    db.rollback()
+                    result[_error_kind(e)] += 1
+                    if attempt == max_retries:
+                        result["gave_up"] += 1
+                    else:
+                        result["retries"] += 1
+                        time.sleep(rng.uniform(0, 0.005 * (attempt + 1)))
+    finally:
+        db.close()
+
+
+def _new_result() -> Dict[str, Any]:
+    return {
+        "sales": 0, "out_of_stock": 0, "deadlocks": 0, "lock_timeouts": 0, "db_errors": 0,
+        "retries": 0, "gave_up": 0, "latencies": [], "lock_wait_sum": 0.0, "lock_wait_count": 0,
+    }
+
+
+def run_threads(fixture: Dict[str, Any], threads: int, seed: int, duration: float, max_lines: int,
+                max_retries: int, lock_timeout_ms: int, batch: bool = False) -> Dict[str, Any]:
+    """
+    Run ``threads`` cashiers in this process and merge their results. With
+    ``batch`` they go through one group-commit writer instead.
+    """
+    session_factory = _session_factory(threads + batch)
+    batcher = SaleBatcher(session_factory) if batch else None
+    lock_wait = metrics.SALE_LOCK_WAIT.labels()
+    lock_sum, lock_count = lock_wait.sum, sum(lock_wait.counts)
+    barrier = Barrier(threads)
+    results = [_new_result() for _ in range(threads)]
+    workers = [
+        Thread(target=_cashier, args=(session_factory, fixture, seed * 1000 + i, duration, max_lines,
+                                      max_retries, lock_timeout_ms, barrier, results[i], batcher))
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    session_factory.kw["bind"].dispose()
+
+    merged = _new_result()
+    for result in results:
+        for key, value in result.items():
+            merged[key] += value
+    merged["lock_wait_sum"] = lock_wait.sum - lock_sum
+    merged["lock_wait_count"] = sum(lock_wait.counts) - lock_count
+    return merged
+
+
+def check_invariants(db, fixture: Dict[str, Any], since: datetime) -> Dict[str, int]:
+    """Compare the stock delta with what was sold, and totals with their items."""
+    sold = dict(
+        db.query(TransactionItem.product_id, func.sum(TransactionItem.quantity))
+        .join(Transaction)
+        .filter(Transaction.user_id == fixture["user_id"], Transaction.created_at >= since)
+        .group_by(TransactionItem.product_id)
+        .all()
+    )
+    stock = dict(db.query(Product.id, Product.current_stock).filter(Product.id.in_(fixture["product_ids"])).all())
+    negative = sum(1 for quantity in stock.values() if quantity < 0)
+    mismatched = sum(
+        1 for product_id, quantity in stock.items() if fixture["stock"] - quantity != sold.get(product_id, 0)
+    )
+    item_totals = (
+        db.query(Transaction.id)
+        .join(TransactionItem)
+        .filter(Transaction.user_id == fixture["user_id"], Transaction.created_at >= since)
+        .group_by(Transaction.id, Transaction.total_amount)
+        .having(func.abs(Transaction.total_amount - func.sum(TransactionItem.quantity * TransactionItem.price_at_sale)) > 0.005)
+        .count()
+    )
+    return {"negative_stock": negative, "stock_mismatch": mismatched, "total_mismatch": item_totals}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(pct / 100 * len(values)), len(values) - 1)]
+
+
+def run_level(concurrency: int, processes: int, args: argparse.Namespace) -> Dict[str, Any]:
+    session_factory = _session_factory(1)
+    db = session_factory()
+    try:
+        fixture = prepare(db, args.products, args.stock, args.shards, args.hot)
+        since = db.execute(text("SELECT (now() AT TIME ZONE 'utc')::timestamp")).scalar()
+    finally:
+        db.close()
+
+    per_process = max(concurrency // processes, 1)
+    started = time.perf_counter()
+    if processes == 1:
+        merged = run_threads(fixture, per_process, args.seed, args.duration, args.max_lines,
+                             args.max_retries, args.lock_timeout_ms, args.batch)
+    else:
+        merged = _new_result()
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [
+                pool.submit(run_threads, fixture, per_process, args.seed * 100 + p, args.duration,
+                            args.max_lines, args.max_retries, args.lock_timeout_ms, args.batch)
+                for p in range(processes)
+            ]
+            for future in futures:
+                for key, value in future.result().items():
+                    merged[key] += value
+    elapsed = time.perf_counter() - started
+
+    db = session_factory()
+    try:
+        violations = check_invariants(db, fixture, since)
+    finally:
+        db.close()
+        session_factory.kw["bind"].dispose()
+
+    return {
+        "concurrency": per_process * processes,
+        "sales_per_s": merged["sales"] / elapsed,
+        "p50_ms": _percentile(merged["latencies"], 50) * 1000,
+        "p99_ms": _percentile(merged["latencies"], 99) * 1000,
+        "lock_wait_ms": (merged["lock_wait_sum"] / merged["sales"] * 1000) if merged["sales"] else 0.0,
+        **{key: merged[key] for key in ("sales", "deadlocks", "lock_timeouts", "db_errors", "retries",
+                                        "gave_up", "out_of_stock")},
+        **violations,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="comma-separated cashier counts")
+    parser.add_argument("--processes", type=int, default=1, help="spread each level's cashiers over N processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--stock", type=int, default=1_000_000, help="starting stock per product")
+    parser.add_argument("--max-lines", type=int, default=5)
+    parser.add_argument("--shards", type=int, default=0, help="stock counters per hot product (0 = unsharded)")
+    parser.add_argument("--hot", type=int, default=3, help="how many of the most popular products to shard")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--lock-timeout-ms", type=int, default=0, help="SET LOCAL lock_timeout per sale (0 = wait)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch", action="store_true", help="commit through the group-commit writer")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    header = (f"{'conc':>5}{'sales/s':>9}{'p50 ms':>8}{'p99 ms':>8}{'lock ms':>8}{'deadlk':>7}{'lock to':>8}"
+              f"{'retry':>6}{'gaveup':>7}{'oos':>5}{'violations':>11}{'scaling':>9}")
+    print(header)
+    previous: Optional[float] = None
+    for level in levels:
+        r = run_level(level, min(args.processes, level), args)
+        violations = r["negative_stock"] + r["stock_mismatch"] + r["total_mismatch"]
+        scaling = "" if previous is None else f"{r['sales_per_s'] / previous:.2f}x"
+        print(f"{r['concurrency']:>5}{r['sales_per_s']:>9.1f}{r['p50_ms']:>8.1f}{r['p99_ms']:>8.1f}"
+              f"{r['lock_wait_ms']:>8.2f}{r['deadlocks']:>7}{r['lock_timeouts']:>8}{r['retries']:>6}"
+              f"{r['gave_up']:>7}{r['out_of_stock']:>5}{violations:>11}{scaling:>9}")
+        previous = r["sales_per_s"]
+
+
+if __name__ == "__main__":
+    main()
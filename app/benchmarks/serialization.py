@@ -0,0 +1,120 @@
+"""
+Serialization cost per 1,000 products.
+
+Compares the old path (hand-built ``ProductResponse`` objects, re-validated
+against ``response_model`` and encoded with stdlib ``json``, as FastAPI did
+for these routes) with ``app.core.serialization`` reading ORM objects and
+Core rows through a cached ``TypeAdapter`` and writing JSON bytes directly.
+No database is needed: the ORM objects are transient ``Product`` instances
+and the Core rows are named tuples with the listing columns.
+
+    python -m app.benchmarks.serialization --products 1000 --repeat 50
+"""
+import argparse
+import json
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.core import serialization
+from app.models.product import Product
+from app.schemas.product import ProductResponse
+
+
+def _products(count: int) -> List[Product]:
+    created = datetime(2026, 1, 1)
+    return [
+        Product(
+            id=uuid.UUID(int=i + 1),
+            name=f"Product {i}",
+            sku=f"SKU-{i:05d}",
+            category=("Water", "Containers", "Accessories")[i % 3],
+            wholesale_price=10.0 + i % 50,
+            retail_price=15.0 + i % 50,
+            stock_quantity=100 + i,
+            low_stock_threshold=2,
+            reserved_quantity=0,
+            is_active=True,
+            image_url=None if i % 4 else f"https://cdn.example.com/{i}.png",
+            created_at=created + timedelta(minutes=i),
+        )
+        for i in range(count)
+    ]
+
+
+def _legacy(products: List[Product]) -> bytes:
+    models = [
+        ProductResponse(
+            id=str(p.id),
+            name=p.name,
+            sku=p.sku,
+            category=p.category,
+            wholesale_price=p.wholesale_price,
+            retail_price=p.retail_price,
+            stock_quantity=p.stock_quantity,
+            low_stock_threshold=p.low_stock_threshold,
+            reserved_quantity=p.reserved_quantity,
+            is_active=p.is_active,
+            image_url=p.image_url,
+            created_at=p.created_at,
+        )
+        for p in products
+    ]
+    # response_model validation, then jsonable_encoder + json.dumps in JSONResponse
+    validated = _LEGACY_ADAPTER.validate_python(models)
+    content = jsonable_encoder(_LEGACY_ADAPTER.dump_python(validated, mode="json"))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+_LEGACY_ADAPTER = TypeAdapter(List[ProductResponse])
+
+
+def _time(fn: Callable[[], bytes], repeat: int) -> float:
+    fn()  # warm caches (TypeAdapter build, attribute instrumentation)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    products = _products(args.products)
+    Row = namedtuple("Row", list(ProductResponse.model_fields))
+    rows = [Row(*(getattr(p, name) for name in Row._fields)) for p in products]
+    dicts = [
+        {**row._asdict(), "id": str(row.id), "created_at": row.created_at.isoformat()} for row in rows
+    ]
+
+    # Same documents either way
+    assert json.loads(_legacy(products)) == json.loads(serialization.dump_models(ProductResponse, rows))
+
+    variants = {
+        "hand-built + response_model + json": lambda: _legacy(products),
+        "TypeAdapter from ORM objects": lambda: serialization.dump_models(ProductResponse, products),
+        "TypeAdapter from Core rows": lambda: serialization.dump_models(ProductResponse, rows),
+        "dumps() of prebuilt dicts": lambda: serialization.dumps(dicts),
+    }
+    scale = 1000 / args.products
+    encoder = "orjson" if serialization.orjson is not None else "pydantic-core"
+    print(f"best of {args.repeat}, ms per 1,000 products (dumps() uses {encoder})")
+    baseline = None
+    for name, fn in variants.items():
+        elapsed = _time(fn, args.repeat) * 1000 * scale
+        baseline = baseline or elapsed
+        print(f"{name:<38}{elapsed:>8.2f} ms{baseline / elapsed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Push channels for server-sent events.
+
+``broadcaster`` fans JSON messages out to every subscriber in this process:
+each subscriber owns a bounded ``asyncio.Queue`` on its event loop, and
+``publish`` may be called from any thread (request handlers run in the
+threadpool). A slow subscriber loses its oldest messages rather than
+growing without bound.
+
+Writers don't publish directly. ``publish_on_commit(session, channel, msg)``
+ties the message to the session's transaction, so a rolled-back sale never
+announces anything:
+
+* ``BROADCAST_BACKEND="postgres"`` (default) runs ``pg_notify`` inside the
+  transaction. Postgres delivers it on commit to every worker LISTENing on
+  the channel, so all processes see the same stream. Each worker keeps one
+  LISTEN connection, opened on the first subscription. It needs a direct
+  connection to the primary; PgBouncer in transaction mode drops LISTENs.
+* ``BROADCAST_BACKEND="memory"`` keeps the message in ``session.info`` and
+  publishes it from ``after_commit``. Only subscribers of the worker that
+  made the sale see it; meant for single-process deployments and tests.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_DROPPED = metrics.registry.counter(
+    "broadcast_dropped_total", "Messages dropped because a subscriber fell behind.", ("channel",)
+)
+
+PENDING_KEY = "broadcast_pending"
+# NOTIFY payloads must be shorter than 8000 bytes
+NOTIFY_MAX_BYTES = 7999
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+SSE_PING = ": ping\n\n"
+
+
+def sse(data: str, event: Optional[str] = None, id: Optional[str] = None) -> str:
+    """One Server-Sent Events frame."""
+    lines = []
+    if id is not None:
+        lines.append(f"id: {id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    def __init__(self, channel: str, loop: asyncio.AbstractEventLoop, size: int) -> None:
+        self.channel = channel
+        self.loop = loop
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=size)
+        # Messages lost since the subscriber last reset this; lets it resync
+        self.dropped = 0
+
+    def _put(self, message: str) -> None:
+        # Runs on the subscriber's loop
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            BROADCAST_DROPPED.labels(self.channel).inc()
+        self.queue.put_nowait(message)
+
+    def deliver(self, message: str) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:  # loop already closed
+            pass
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Next message, or None if ``timeout`` seconds pass without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broadcaster:
+    def __init__(self, queue_size: int = 100) -> None:
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, message: str) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+    def subscriber_count(self, channel: str) -> int:
+        return len(self._subscribers.get(channel, ()))
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str, local: bool = False) -> AsyncIterator[Subscription]:
+        """
+        Receive messages on ``channel``. ``local`` channels are only published
+        from this process, so they skip LISTEN even with the postgres backend.
+        """
+        subscription = Subscription(channel, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        if settings.BROADCAST_BACKEND == "postgres" and not local:
+            listener.listen(channel)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(subscription)
+
+
+broadcaster = Broadcaster(settings.BROADCAST_QUEUE_SIZE)
+
+metrics.registry.gauge(
+    "broadcast_subscribers",
+    "Open push-channel subscriptions in this process.",
+    lambda: {(channel,): len(subs) for channel, subs in list(broadcaster._subscribers.items())},
+    ("channel",),
+)
+
+
+def _encode(message: Any) -> str:
+    return json.dumps(message, default=str, separators=(",", ":"))
+
+
+def publish_on_commit(session: Session, channel: str, message: Any, fallback: Any = None) -> None:
+    """
+    Publish ``message`` (JSON-encoded) on ``channel`` once ``session`` commits.
+    ``fallback`` is sent instead when ``message`` is too large for NOTIFY.
+    """
+    payload = _encode(message)
+    if settings.BROADCAST_BACKEND == "postgres":
+        if len(payload.encode("utf-8")) > NOTIFY_MAX_BYTES:
+            if fallback is None:
+                raise ValueError(f"{channel} message is too large for NOTIFY ({len(payload)} chars)")
+            payload = _encode(fallback)
+        session.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+    else:
+        session.info.setdefault(PENDING_KEY, []).append((channel, payload))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session) -> None:
+    pending = session.info.pop(PENDING_KEY, None)
+    for channel, payload in pending or ():
+        broadcaster.publish(channel, payload)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending(session: Session, transaction) -> None:
+    # Runs after after_commit, so anything left here was rolled back
+    if transaction.parent is None:
+        session.info.pop(PENDING_KEY, None)
+
+
+class NotifyListener:
+    """
+    One LISTEN connection per worker, polled by a daemon thread that hands
+    notifications to ``broadcaster``. Works with psycopg2 and psycopg 3.
+    """
+
+    POLL_SECONDS = 1.0
+    RECONNECT_SECONDS = 2.0
+
+    def __init__(self) -> None:
+        self._channels: Set[str] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def listen(self, channel: str) -> None:
+        with self._lock:
+            self._channels.add(channel)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="notify-listener", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, poolclass=NullPool)
+        while True:
+            try:
+                self._listen_loop(engine)
+            except Exception:
+                logger.exception("LISTEN connection lost; reconnecting")
+                threading.Event().wait(self.RECONNECT_SECONDS)
+
+    def _listen_loop(self, engine) -> None:
+        conn = engine.raw_connection()
+        try:
+            driver_conn = conn.driver_connection
+            driver_conn.autocommit = True
+            listening: Set[str] = set()
+            while True:
+                with self._lock:
+                    new_channels = self._channels - listening
+                for channel in new_channels:
+                    cursor = driver_conn.cursor()
+                    cursor.execute(f'LISTEN "{channel}"')
+                    cursor.close()
+                    listening.add(channel)
+                for channel, payload in self._wait(driver_conn):
+                    broadcaster.publish(channel, payload)
+        finally:
+            conn.invalidate()
+
+    def _wait(self, driver_conn) -> List[Tuple[str, str]]:
+        if hasattr(driver_conn, "poll"):  # psycopg2
+            if select.select([driver_conn], [], [], self.POLL_SECONDS)[0]:
+                driver_conn.poll()
+            received = [(n.channel, n.payload) for n in driver_conn.notifies]
+            del driver_conn.notifies[:]
+            return received
+        return [(n.channel, n.payload) for n in driver_conn.notifies(timeout=self.POLL_SECONDS)]
+
+
+listener = NotifyListener()
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings
 from pydantic import computed_field
 
@@ -12,8 +12,96 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "postgres"
     POSTGRES_DB: str = "water_depot"
     DATABASE_URL: Optional[str] = None
+    # Read replica for listings, analytics and exports; reads use the primary when unset
+    READ_DATABASE_URL: Optional[str] = None
+
+    # Connection pool (per engine, per worker process)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800  # seconds; -1 keeps connections forever
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # 0 keeps the server default
+    # Behind PgBouncer in transaction mode: no client-side pool, no session state
+    DB_PGBOUNCER: bool = False
+    # After a write, that user's reads go to the primary for this many seconds
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    # Depots moved off the main database: depot id -> "<url>", "<url>#<schema>"
+    # or "#<schema>" (see app/db/depot_routing.py)
+    DEPOT_PLACEMENTS: Dict[str, str] = {}
+
+    # Group commit: POST /transactions/ queues sales for one writer thread per
+    # worker, which runs whatever arrives within the window as one transaction
+    SALE_BATCH_ENABLED: bool = False
+    SALE_BATCH_WINDOW_MS: float = 2.0
+    SALE_BATCH_MAX_SIZE: int = 64
+
+    # Cart holds: reserved stock is released this long after the cart's last change
+    STOCK_HOLD_TTL_SECONDS: int = 600
+    STOCK_HOLD_SWEEP_SECONDS: float = 30.0  # 0 disables the background sweep
+    # Sharded products: how often the shard totals are copied to stock_quantity
+    # and drained shards refilled from the others (0 disables)
+    STOCK_SHARD_REBALANCE_SECONDS: float = 5.0
+
+    # Transactional outbox: events written with each sale, handed to consumers
+    # (sales rollups, webhook stand-ins) by a dispatcher in every worker.
+    # 0 disables the dispatcher, and the rollups the forecast reads fall behind.
+    OUTBOX_DISPATCH_SECONDS: float = 1.0
+    OUTBOX_BATCH_SIZE: int = 500
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_RETRY_SECONDS: float = 5.0  # doubled after each failed attempt
+    OUTBOX_WEBHOOK_FILE: Optional[str] = None  # append events here as JSON lines
+
+    # Cold-data archival: months older than ARCHIVE_AFTER_MONTHS closed months
+    # move to compressed files (see app/services/archive_service.py); analytics
+    # combine them with the live rows. 0 disables the archiver.
+    ARCHIVE_INTERVAL_SECONDS: float = 0.0
+    ARCHIVE_AFTER_MONTHS: int = 13
+    ARCHIVE_BACKEND: str = "local"  # "local" (ARCHIVE_DIR) or "s3" (the storage bucket, under ARCHIVE_S3_PREFIX)
+    ARCHIVE_DIR: str = "archive"
+    ARCHIVE_S3_PREFIX: str = "archive/"
+    ARCHIVE_DELETE_BATCH: int = 1000  # transactions deleted per commit when purging
+    # How long workers trust their copy of the manifest; archived rows are
+    # deleted twice this long after their month is archived
+    ARCHIVE_MANIFEST_CACHE_SECONDS: float = 60.0
+    ARCHIVE_CACHE_FILES: int = 24  # archive files kept in memory per worker
+
+    # Columnar analytics: sales exported to Parquet under ANALYTICS_SNAPSHOT_DIR
+    # (needs duckdb and pyarrow; unset disables both export and routing), and
+    # ranges of ANALYTICS_COLUMNAR_MIN_DAYS or more aggregated there by DuckDB
+    ANALYTICS_SNAPSHOT_DIR: Optional[str] = None
+    ANALYTICS_SNAPSHOT_SECONDS: float = 900.0
+    ANALYTICS_SNAPSHOT_LAG_SECONDS: float = 300.0  # sales younger than this wait for the next run
+    ANALYTICS_COLUMNAR_MIN_DAYS: int = 60
+    ANALYTICS_DUCKDB_THREADS: int = 2  # per worker
+    # Each worker keeps the last HOT_WINDOW_DAYS of sale lines in memory for
+    # analytics (0 disables), about 40 MB per million lines; past
+    # HOT_WINDOW_MAX_LINES the oldest are dropped and the window covers less.
+    # Needs BROADCAST_BACKEND "postgres" to hear other workers' sales.
+    HOT_WINDOW_DAYS: int = 90
+    HOT_WINDOW_MAX_LINES: int = 2_000_000
+    HOT_WINDOW_RESYNC_SECONDS: float = 900.0
+    # A sale is timestamped before it commits: announced sales stamped up to
+    # this long before a load are matched by id against what the load read
+    HOT_WINDOW_OVERLAP_SECONDS: float = 120.0
+
+    # Push channels (SSE): "postgres" uses LISTEN/NOTIFY so every worker sees
+    # every event; "memory" only reaches subscribers of the same process
+    BROADCAST_BACKEND: str = "postgres"
+    BROADCAST_QUEUE_SIZE: int = 100  # per subscriber; oldest messages are dropped beyond this
+    # Live dashboard feeds reload from the database this often (sales leave the window)
+    DASHBOARD_STREAM_RESYNC_SECONDS: float = 300.0
+
+    # Response compression: gzip, or brotli when installed and accepted, for
+    # text-like responses of COMPRESSION_MIN_BYTES or more (streamed ones too).
+    # Levels run 1-9 (brotli quality takes the same number), keyed by route path.
+    COMPRESSION_MIN_BYTES: int = 1024
+    COMPRESSION_LEVEL: int = 5
+    COMPRESSION_ROUTE_LEVELS: Dict[str, int] = {}
 
     # Storage Configuration
+    STORAGE_BACKEND: str = "s3"  # "s3" or "local" (writes under LOCAL_STORAGE_DIR, for dev/load tests)
+    LOCAL_STORAGE_DIR: str = "app/static/uploads"
+    LOCAL_STORAGE_URL_PREFIX: str = "/static/uploads"
     S3_ENDPOINT_URL: Optional[str] = None
     S3_REGION: str = "auto"
     S3_ACCESS_KEY_ID: Optional[str] = None
@@ -24,6 +112,31 @@ class Settings(BaseSettings):
     R2_SECRET_ACCESS_KEY: Optional[str] = None
     R2_PUBLIC_DOMAIN: Optional[str] = None
 
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # "text" or "json"
+    # Fraction of requests that get an access log line, keyed by route path.
+    # Server errors are always logged.
+    LOG_REQUEST_SAMPLE_RATES: Dict[str, float] = {"/": 0.0, "/metrics": 0.0}
+    LOG_REQUEST_DEFAULT_SAMPLE_RATE: float = 1.0
+
+    # SQL instrumentation
+    SQL_SLOW_QUERY_MS: float = 200.0
+    SQL_EXPLAIN_SLOW_QUERIES: bool = False  # EXPLAIN (ANALYZE, BUFFERS) slow SELECTs
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5  # identical statements per request before warning
+    # Max queries per request, keyed by route path; overruns are logged
+    SQL_QUERY_BUDGETS: Dict[str, int] = {}
+
+    # On-demand request profiling (owners only)
+    PROFILER_INTERVAL_MS: float = 5.0
+    PROFILER_RING_SIZE: int = 20
+
+    # Tracing: fraction of requests traced when the caller didn't already
+    # sample them via a traceparent header
+    TRACING_SAMPLE_RATE: float = 0.0
+    TRACING_EXPORTER: str = "console"  # "console", "file" or "none"
+    TRACING_FILE_PATH: str = "traces.jsonl"
+
     @computed_field
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
@@ -31,6 +144,13 @@ class Settings(BaseSettings):
             return self.DATABASE_URL.replace("postgres://", "postgresql://")
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}/{self.POSTGRES_DB}"
 
+    @computed_field
+    @property
+    def SQLALCHEMY_READ_DATABASE_URI(self) -> Optional[str]:
+        if self.READ_DATABASE_URL:
+            return self.READ_DATABASE_URL.replace("postgres://", "postgresql://")
+        return None
+
     class Config:
         case_sensitive = True
         env_file = ".env"
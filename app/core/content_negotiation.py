@@ -0,0 +1,173 @@
+"""
+Response compression and encoding negotiation, as one ASGI middleware.
+
+* ``Accept: application/msgpack`` sets ``msgpack_ctx`` for the request, so
+  ``model_response`` answers in MessagePack (see ``app.core.serialization``).
+* ``Accept-Encoding`` picks brotli (when the ``brotli`` package is
+  installed) or gzip for text-like responses (JSON, MessagePack, CSV, ...)
+  of ``COMPRESSION_MIN_BYTES`` or more.
+
+Whole bodies are compressed in one call and get a new Content-Length.
+Streamed bodies (``StreamingResponse``) are compressed chunk by chunk and
+flushed after each one, so the client gets every chunk as soon as the app
+sends it; the first chunks are held back only until they reach the size
+threshold. Server-sent events and bodies that already have a
+Content-Encoding pass through untouched.
+
+Each route's level is looked up once (``COMPRESSION_ROUTE_LEVELS`` by route
+path, else ``COMPRESSION_LEVEL``) and cached.
+"""
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.request_context import route_template
+from app.core.serialization import msgpack_ctx, wants_msgpack
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/msgpack", "application/javascript", "application/xml",
+    "image/svg+xml",
+)
+UNCOMPRESSED_TYPES = ("text/event-stream",)  # each event must reach the client as it is sent
+
+
+@lru_cache(maxsize=64)
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """``"br"``, ``"gzip"`` or None for an Accept-Encoding header."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, level: int) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=level)
+        else:
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress ``data`` and flush, so it can be decoded on arrival."""
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class ContentNegotiationMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._levels: Dict[Optional[str], int] = {}
+
+    def level(self, route: Optional[str]) -> int:
+        level = self._levels.get(route)
+        if level is None:
+            level = settings.COMPRESSION_ROUTE_LEVELS.get(route or "", settings.COMPRESSION_LEVEL)
+            self._levels[route] = level
+        return level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        token = msgpack_ctx.set(wants_msgpack(headers.get("accept", "")))
+        try:
+            encoding = choose_encoding(headers.get("accept-encoding", ""))
+            if encoding is None:
+                await self.app(scope, receive, send)
+            else:
+                await self.app(scope, receive, _Responder(self, scope, send, encoding).send)
+        finally:
+            msgpack_ctx.reset(token)
+
+
+class _Responder:
+    """Wraps ``send`` for one response, compressing its body if it qualifies."""
+
+    def __init__(self, middleware: ContentNegotiationMiddleware, scope: Scope, send: Send, encoding: str) -> None:
+        self.middleware = middleware
+        self.scope = scope
+        self._send = send
+        self.encoding = encoding
+        self.start: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+        self.held: List[bytes] = []  # streamed chunks waiting for the size threshold
+        self.held_size = 0
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+                or content_type.startswith(UNCOMPRESSED_TYPES)
+            )
+            if self.passthrough:
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is not None:
+            data = self.compressor.chunk(body) if more_body else self.compressor.finish(body)
+            await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        self.held.append(body)
+        self.held_size += len(body)
+        if more_body and self.held_size < settings.COMPRESSION_MIN_BYTES:
+            return  # too early to tell
+        body, self.held = b"".join(self.held), []
+        if self.held_size < settings.COMPRESSION_MIN_BYTES:
+            # The whole body, and it is small: send it as it is
+            MutableHeaders(raw=self.start["headers"]).add_vary_header("Accept-Encoding")
+            await self._send(self.start)
+            await self._send({"type": "http.response.body", "body": body, "more_body": False})
+            return
+
+        self.compressor = _Compressor(self.encoding, self.middleware.level(route_template(self.scope)))
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if more_body:
+            del headers["Content-Length"]
+            data = self.compressor.chunk(body)
+        else:
+            data = self.compressor.finish(body)
+            headers["Content-Length"] = str(len(data))
+        await self._send(self.start)
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -0,0 +1,131 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, TextIO
+
+from app.core.config import settings
+
+LOG_FORMAT = "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Plain-text formatter that appends ``record.fields`` as ``key=value`` pairs.
+    Runs on the writer thread, so request fields are only rendered there.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(LOG_FORMAT)
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line = f"{line} | " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with ``record.fields`` merged in at the top level."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that does not format on the calling thread.
+
+    The stock ``prepare()`` renders the message before enqueueing, which is the
+    cost we want off the event loop. Records never leave the process, so they
+    can be handed to the listener untouched.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(stream: Optional[TextIO] = None) -> None:
+    """
+    Route all logging through a queue to a background writer thread.
+    Calling it again replaces the previous writer (used by benchmarks/tests).
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JSONFormatter() if settings.LOG_FORMAT == "json" else StructuredFormatter())
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+    # Nothing we format uses caller/thread/process info; skipping it is the
+    # documented way to make LogRecord creation cheaper.
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(settings.LOG_LEVEL)
+
+
+def flush_logging() -> None:
+    """Stop the writer thread after draining everything queued so far."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(flush_logging)
+
+
+class RequestLogSampler:
+    """
+    Decides whether a finished request gets an access log line.
+
+    Rates are keyed by route template (e.g. ``/api/v1/products/``) so that
+    sampling is per endpoint, not per URL. Server errors are always logged.
+    """
+
+    def __init__(self, rates: Dict[str, float], default_rate: float = 1.0):
+        self.rates = dict(rates)
+        self.default_rate = default_rate
+
+    def should_log(self, route_path: str, status_code: int) -> bool:
+        if status_code >= 500:
+            return True
+        rate = self.rates.get(route_path, self.default_rate)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        return random.random() < rate
+
+
+request_sampler = RequestLogSampler(
+    settings.LOG_REQUEST_SAMPLE_RATES, settings.LOG_REQUEST_DEFAULT_SAMPLE_RATE
+)
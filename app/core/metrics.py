@@ -0,0 +1,305 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Counters and histograms keep one small child object per label combination,
+so recording a sample is a dict lookup plus an increment under an
+uncontended lock. Gauges are read through callbacks at scrape time, which
+keeps pool/queue gauges free on the hot path.
+"""
+import math
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class _RecordedMetric(_Metric, ABC):
+    """Metric recorded in-process on one child per label combination."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # Unlabelled metrics are exported as 0 before the first sample
+            self.labels()
+
+    @abstractmethod
+    def _new_child(self):
+        ...
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+
+class Counter(_RecordedMetric):
+    type_name = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for values, child in list(self._children.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}")
+        return lines
+
+
+class Histogram(_RecordedMetric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+GaugeValue = Union[float, Dict[Tuple[str, ...], float]]
+
+
+class Gauge(_Metric):
+    """
+    Gauge read from a callback at scrape time. The callback returns a number,
+    or a dict of label-value tuples to numbers for labelled gauges.
+    """
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        fn: Callable[[], GaugeValue],
+        labelnames: Sequence[str] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.fn = fn
+
+    def labels(self, *values: str):
+        raise TypeError(f"gauge {self.name} is read from its callback and cannot be recorded through labels()")
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        value = self.fn()
+        samples = value.items() if isinstance(value, dict) else [((), value)]
+        for values, sample in samples:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(sample)}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        # Re-registering a name replaces the old metric (e.g. when the engine is rebuilt)
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        fn: Callable[[], GaugeValue],
+        labelnames: Sequence[str] = (),
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, fn, labelnames))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def collect(self) -> Iterable[_Metric]:
+        return list(self._metrics.values())
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.collect():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# HTTP
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")
+)
+
+# Sales
+SALES = registry.counter("sales_total", "Sales committed by process_sale.")
+SALE_FAILURES = registry.counter("sale_failures_total", "Sales rejected or failed, by reason.", ("reason",))
+SALE_DURATION = registry.histogram("sale_duration_seconds", "process_sale duration for committed sales.")
+SALE_LOCK_WAIT = registry.histogram(
+    "sale_lock_wait_seconds",
+    "Time spent acquiring product row locks in process_sale.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+SALE_BATCH_SIZE = registry.histogram(
+    "sale_batch_size", "Sales committed together by the group-commit writer.", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+# Inventory
+STOCK_ALERTS = registry.counter("stock_alerts_total", "Low/out-of-stock alerts raised by sales.", ("kind",))
+STOCK_HOLDS = registry.counter(
+    "stock_holds_total", "Cart holds placed, rejected for lack of stock, or expired.", ("result",)
+)
+STOCK_SHARD_TAKES = registry.counter(
+    "stock_shard_takes_total",
+    "Sharded stock decrements: from a free shard, after waiting, by consolidating, or refused.",
+    ("result",),
+)
+STOCK_SHARD_REBALANCES = registry.counter("stock_shard_rebalances_total", "Shard sets evened out by the rebalancer.")
+
+# Outbox
+OUTBOX_EVENTS = registry.counter(
+    "outbox_events_total", "Outbox events delivered, scheduled for retry, or given up on.", ("topic", "result")
+)
+OUTBOX_DELIVERY_LAG = registry.histogram(
+    "outbox_delivery_lag_seconds",
+    "Time from an outbox event's creation to its delivery.",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 3600.0),
+)
+
+# Archival
+ARCHIVE_TRANSACTIONS = registry.counter(
+    "archive_transactions_total", "Transactions written to archive files, and purged from the hot tables.", ("stage",)
+)
+
+# Columnar analytics
+SNAPSHOT_TRANSACTIONS = registry.counter(
+    "snapshot_transactions_total", "Transactions exported to the Parquet analytics snapshot."
+)
+COLUMNAR_QUERIES = registry.counter(
+    "columnar_queries_total", "Analytics ranges answered from the Parquet snapshot instead of Postgres."
+)
+HOT_WINDOW_QUERIES = registry.counter(
+    "hot_window_queries_total", "Analytics ranges answered from the in-memory window of recent sales."
+)
+HOT_WINDOW_EVICTIONS = registry.counter(
+    "hot_window_evictions_total", "Times the in-memory sales window hit HOT_WINDOW_MAX_LINES and dropped its oldest lines."
+)
+
+# Caches
+CACHE_REQUESTS = registry.counter("cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
+
+# Storage
+STORAGE_UPLOAD_DURATION = registry.histogram(
+    "storage_upload_duration_seconds", "Image upload latency to the storage backend."
+)
+STORAGE_UPLOAD_FAILURES = registry.counter("storage_upload_failures_total", "Failed image uploads.")
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
@@ -0,0 +1,234 @@
+"""
+Opt-in sampling profiler for single requests.
+
+An owner asks for a profile with ``X-Profile: 1`` or ``?profile=1``. The
+endpoint call for that request (and only that request) is sampled from a
+background thread; other requests only pay a ContextVar lookup. An async
+endpoint is only sampled while its coroutine runs: while it waits, the
+event loop's thread is doing other requests' work, which is left out. Finished
+profiles are kept in a small in-memory ring buffer and can be downloaded as
+collapsed stacks or speedscope JSON.
+"""
+import functools
+import inspect
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from types import FrameType
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+from urllib.parse import parse_qs
+
+from app.core.config import settings
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY_PARAM = "profile"
+
+
+class StoredProfile:
+    def __init__(self, method: str, path: str, route: Optional[str], username: Optional[str]):
+        self.id = f"{int(time.time())}-{next(_ids)}"
+        self.created_at = datetime.utcnow()
+        self.method = method
+        self.path = path
+        self.route = route
+        self.username = username
+        self.duration_ms = 0.0
+        self.interval_ms = settings.PROFILER_INTERVAL_MS
+        self.stacks: Counter = Counter()
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self.stacks.values())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "created_at": self.created_at,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "username": self.username,
+            "duration_ms": round(self.duration_ms, 2),
+            "samples": self.sample_count,
+        }
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format: ``frame;frame;frame count`` per line."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def speedscope(self) -> Dict[str, Any]:
+        frame_index: Dict[str, int] = {}
+        frames: List[Dict[str, str]] = []
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        for stack, count in self.stacks.items():
+            indices = []
+            for name in stack.split(";"):
+                if name not in frame_index:
+                    frame_index[name] = len(frames)
+                    frames.append({"name": name})
+                indices.append(frame_index[name])
+            samples.append(indices)
+            weights.append(count * self.interval_ms)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": f"{self.method} {self.path}",
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+            "name": f"{self.method} {self.path} ({self.id})",
+            "exporter": "water-depot-pos",
+        }
+
+
+_ids = itertools.count(1)
+_ring: Deque[StoredProfile] = deque(maxlen=settings.PROFILER_RING_SIZE)
+_ring_lock = threading.Lock()
+
+
+class ProfileRequest:
+    """Marker put in the request context when a profile was asked for."""
+
+    def __init__(self, method: str, path: str) -> None:
+        self.method = method
+        self.path = path
+        self.profile: Optional[StoredProfile] = None
+
+
+profile_request_ctx: ContextVar[Optional[ProfileRequest]] = ContextVar("profile_request", default=None)
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, thread_id: int, entry: FrameType, interval: float, profile: StoredProfile):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.entry = entry
+        self.interval = interval
+        self.profile = profile
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.entry:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            # Everything below the profiled call is threadpool/event loop
+            # plumbing. No entry frame on the thread: the coroutine is
+            # suspended and the loop is running something else.
+            if frame is not None and stack:
+                self.profile.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+@contextmanager
+def _sample_current_thread(profile: StoredProfile, entry: FrameType) -> Iterator[None]:
+    """Sample this thread's stacks above ``entry``, the profiled call's frame."""
+    sampler = _Sampler(threading.get_ident(), entry, settings.PROFILER_INTERVAL_MS / 1000, profile)
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        profile.duration_ms = (time.perf_counter() - start) * 1000
+
+
+def _is_owner(user: Any) -> bool:
+    return getattr(user, "role", None) == "owner"
+
+
+def _run_profiled(request: ProfileRequest, endpoint: Callable, args, kwargs):
+    user = kwargs.get("current_user")
+    request.profile = StoredProfile(request.method, request.path, None, getattr(user, "username", None))
+    with _sample_current_thread(request.profile, sys._getframe()):
+        return endpoint(*args, **kwargs)
+
+
+async def _run_profiled_async(request: ProfileRequest, endpoint: Callable, args, kwargs):
+    user = kwargs.get("current_user")
+    request.profile = StoredProfile(request.method, request.path, None, getattr(user, "username", None))
+    # A coroutine keeps its frame across awaits
+    with _sample_current_thread(request.profile, sys._getframe()):
+        return await endpoint(*args, **kwargs)
+
+
+def wrap_endpoint(endpoint: Callable) -> Callable:
+    """
+    Wrap a path operation so it can be profiled on demand. The wrapper keeps
+    the endpoint's signature (via ``functools.wraps``) so FastAPI resolves the
+    same dependencies. Only requests by owners are profiled.
+    """
+    if getattr(endpoint, "__profiled__", False):
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def profiled(*args, **kwargs):
+            request = profile_request_ctx.get()
+            if request is None or not _is_owner(kwargs.get("current_user")):
+                return await endpoint(*args, **kwargs)
+            return await _run_profiled_async(request, endpoint, args, kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def profiled(*args, **kwargs):
+            request = profile_request_ctx.get()
+            if request is None or not _is_owner(kwargs.get("current_user")):
+                return endpoint(*args, **kwargs)
+            return _run_profiled(request, endpoint, args, kwargs)
+
+    profiled.__profiled__ = True
+    return profiled
+
+
+def requested(scope: Dict[str, Any]) -> bool:
+    """True if the request carries the profiling header or query flag."""
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if "1" in query.get(PROFILE_QUERY_PARAM, []):
+        return True
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value != b"0"
+    return False
+
+
+def store(request: ProfileRequest, route: Optional[str]) -> Optional[StoredProfile]:
+    profile = request.profile
+    if profile is None:
+        return None
+    profile.route = route
+    with _ring_lock:
+        _ring.append(profile)
+    return profile
+
+
+def recent_profiles() -> List[StoredProfile]:
+    with _ring_lock:
+        return list(reversed(_ring))
+
+
+def get_profile(profile_id: str) -> Optional[StoredProfile]:
+    with _ring_lock:
+        for profile in _ring:
+            if profile.id == profile_id:
+                return profile
+    return None
@@ -0,0 +1,30 @@
+import random
+from contextvars import ContextVar
+from typing import Any, MutableMapping, Optional
+
+# Request id of the request currently being handled (None outside requests)
+request_id_ctx: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def new_request_id() -> str:
+    # Not a secret; avoids a getrandom() syscall per request
+    return f"{random.getrandbits(64):016x}"
+
+
+def route_template(scope: MutableMapping[str, Any]) -> Optional[str]:
+    """
+    Full path template of the matched route, e.g. ``/api/v1/products/{product_id}``.
+    Returns None when no route matched (404s), so callers can avoid using raw
+    paths as labels.
+    """
+    # Newer FastAPI resolves included routers lazily and keeps the full
+    # template on the effective route context instead of the route itself.
+    fastapi_scope = scope.get("fastapi")
+    if fastapi_scope:
+        context = fastapi_scope.get("effective_route_context")
+        if context is not None:
+            return context.path_format
+    route = scope.get("route")
+    if route is None:
+        return None
+    return getattr(route, "path", None)
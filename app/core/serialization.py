@@ -0,0 +1,109 @@
+"""
+ORM rows to JSON bytes in one pass.
+
+``model_response(ProductResponse, rows)`` lets pydantic-core read attributes
+straight off ORM objects or Core rows (``from_attributes``), validate a whole
+list in one call through a cached ``TypeAdapter``, and write JSON bytes with
+``dump_json``. The result is a finished ``Response``, so FastAPI doesn't
+validate and encode it again against ``response_model`` (which stays on the
+route for the OpenAPI schema).
+
+Plain dicts go through orjson when it is installed, else pydantic-core's
+encoder; neither touches the stdlib ``json`` module.
+
+Clients sending ``Accept: application/msgpack`` get the same document as
+MessagePack from ``model_response`` when msgpack is installed
+(``ContentNegotiationMiddleware`` records the preference per request).
+"""
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, List, Type
+
+import pydantic_core
+from pydantic import BaseModel, TypeAdapter
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional binary encoding
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# Whether the current request asked for MessagePack
+msgpack_ctx: ContextVar[bool] = ContextVar("msgpack", default=False)
+
+
+def wants_msgpack(accept: str) -> bool:
+    """True if an Accept header lists a MessagePack type (and it can be produced)."""
+    if msgpack is None or not accept:
+        return False
+    accept = accept.lower()
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+class JSONBytesResponse(Response):
+    """JSON response whose body is already encoded (or is encoded with ``dumps``)."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return pydantic_core.to_jsonable_python(value)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return pydantic_core.to_json(content)
+
+
+@lru_cache(maxsize=None)
+def _adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def dump_model(model: Type[BaseModel], obj: Any) -> bytes:
+    adapter = _adapter(model)
+    return adapter.dump_json(adapter.validate_python(obj, from_attributes=True))
+
+
+def dump_models(model: Type[BaseModel], rows: Any) -> bytes:
+    """Validate a sequence of ORM objects/rows in one call and encode it."""
+    adapter = _list_adapter(model)
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+
+def model_response(model: Type[BaseModel], data: Any, status_code: int = 200) -> Response:
+    """Response for one object, or a list of objects, shaped by ``model``."""
+    adapter = _list_adapter(model) if isinstance(data, (list, tuple)) else _adapter(model)
+    value = adapter.validate_python(data, from_attributes=True)
+    if msgpack is None:
+        return JSONBytesResponse(adapter.dump_json(value), status_code=status_code)
+    # Caches must key on Accept once the body depends on it
+    headers = {"Vary": "Accept"}
+    if msgpack_ctx.get():
+        body = msgpack.packb(adapter.dump_python(value, mode="json"))
+        return MsgPackResponse(body, status_code=status_code, headers=headers)
+    return JSONBytesResponse(adapter.dump_json(value), status_code=status_code, headers=headers)
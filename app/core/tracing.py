@@ -0,0 +1,238 @@
+"""
+Lightweight OpenTelemetry-style tracing.
+
+A trace starts in the request middleware, either continuing an incoming W3C
+``traceparent`` or as a new root chosen by ``TRACING_SAMPLE_RATE``. Spans
+nest through a ContextVar (so threadpool calls join their request's trace).
+When a request isn't sampled the ContextVar stays empty and ``span()`` /
+``traced()`` cost a single lookup.
+
+Finished traces are handed to a background thread that writes them to the
+configured exporter (console log or a JSON-lines file), so nothing is
+written on the event loop.
+"""
+import functools
+import inspect
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger("water_depot_pos.trace")
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self, trace_id: str) -> None:
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.end_ns = 0
+        self.start_ns = time.time_ns()
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+        self.trace.spans.append(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+current_span_ctx: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Return (trace_id, parent_span_id, sampled) from a W3C traceparent header."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 0x01)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], sampled
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes: Any) -> Optional[Span]:
+    """
+    Start the root span for a request, or return None when it isn't sampled.
+    The caller must make it current (``current_span_ctx``) and call ``finish_trace``.
+    """
+    if traceparent is None and settings.TRACING_SAMPLE_RATE <= 0.0:
+        return None
+    parent = parse_traceparent(traceparent)
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id, sampled = None, None, False
+    if not sampled:
+        rate = settings.TRACING_SAMPLE_RATE
+        if rate <= 0.0 or random.random() >= rate:
+            return None
+    return Span(Trace(trace_id or _new_id(128)), name, parent_id, attributes)
+
+
+def finish_trace(root: Span) -> None:
+    root.end()
+    _exporter.submit(root.trace)
+
+
+def traceparent_for(span: Span) -> str:
+    return f"00-{span.trace_id}-{span.span_id}-01"
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Child span of the current span; a no-op outside a sampled trace."""
+    parent = current_span_ctx.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    token = current_span_ctx.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current_span_ctx.reset(token)
+        child.end()
+
+
+def start_span(name: str, **attributes: Any) -> Optional[Span]:
+    """
+    Start a child span without making it current, for callbacks that can't
+    use a ``with`` block (e.g. before/after SQLAlchemy events).
+    """
+    parent = current_span_ctx.get()
+    if parent is None:
+        return None
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """Decorator that wraps a function (sync or async) in a span."""
+
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if current_span_ctx.get() is None:
+                    return await fn(*args, **kwargs)
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if current_span_ctx.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class ConsoleExporter:
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        for data in spans:
+            logger.info("span", extra={"fields": data})
+
+
+class FileExporter:
+    """Appends one JSON object per span to a local file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for data in spans:
+                f.write(json.dumps(data, default=str) + "\n")
+
+
+class _ExportWorker:
+    """Serialises and exports finished traces on a daemon thread."""
+
+    def __init__(self) -> None:
+        self._queue: "queue.SimpleQueue[Trace]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.exporter: Any = None
+
+    def submit(self, trace: Trace) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self.exporter = build_exporter()
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        self._queue.put(trace)
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            if self.exporter is None:
+                continue
+            try:
+                self.exporter.export([s.to_dict() for s in sorted(trace.spans, key=lambda s: s.start_ns)])
+            except Exception:
+                logger.exception("Failed to export trace %s", trace.trace_id)
+
+
+def build_exporter():
+    if settings.TRACING_EXPORTER == "file":
+        return FileExporter(settings.TRACING_FILE_PATH)
+    if settings.TRACING_EXPORTER == "console":
+        return ConsoleExporter()
+    return None
+
+
+_exporter = _ExportWorker()
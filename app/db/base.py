@@ -1,6 +1,12 @@
 # Import all the models, so that Base has them before being
 # imported by Alembic
 from app.db.base_class import Base  # noqa
+from app.models.depot import Depot  # noqa
 from app.models.user import User  # noqa
-from app.models.product import Product  # noqa
-from app.models.transaction import Transaction, TransactionItem  # noqa
\ No newline at end of file
+from app.models.product import Product, ProductStockShard  # noqa
+from app.models.transaction import Transaction, TransactionItem  # noqa
+from app.models.stock_alert import StockAlert  # noqa
+from app.models.stock_hold import StockHold  # noqa
+from app.models.outbox import OutboxEvent  # noqa
+from app.models.sales_rollup import ProductDailySales  # noqa
+from app.models.archive import TransactionArchive  # noqa
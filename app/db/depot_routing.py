@@ -0,0 +1,87 @@
+"""
+Placement of depots on databases.
+
+Every depot-scoped row carries ``depot_id``, and queries filter on it, so
+all depots can share one database. When one depot outgrows that, it can get
+its own: ``DEPOT_PLACEMENTS`` maps a depot id to ``"<database url>"``, to
+``"<database url>#<schema>"`` or to ``"#<schema>"`` (a schema of the default
+database). Sessions scoped to that depot (``scope_to_depot``) then send
+every statement that touches more than the directory tables (users, depots)
+to the depot's engine, with the default engine's execution options (read-only snapshots for
+analytics) and the schema mapped in through ``schema_translate_map``.
+
+The depot's database needs the full schema, including copies of the rows of
+its users that its transactions and holds reference. A session writing to
+both databases commits them one after the other, not atomically. Background jobs run once per
+placement. LISTEN/NOTIFY push channels only see depots on the primary
+database; use ``BROADCAST_BACKEND="memory"`` for others.
+
+``DepotRouter`` is the extension point: override ``placement`` to look
+placements up somewhere else (a directory table, a config service).
+"""
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.util import find_tables
+
+DEPOT_KEY = "depot_id"
+DIRECTORY_TABLES = frozenset({"users", "depots"})
+
+
+def scope_to_depot(session: Session, depot_id: Optional[uuid.UUID]) -> Session:
+    """Route ``session``'s depot-scoped statements to ``depot_id``'s database."""
+    session.info[DEPOT_KEY] = depot_id
+    return session
+
+
+def _directory_only(mapper, clause) -> bool:
+    # Anything touching a depot-scoped table (or unknown, like text()) goes to the depot
+    tables = {table.name for table in find_tables(clause, include_crud=True)} if clause is not None else set()
+    if mapper is not None:
+        tables.add(mapper.persist_selectable.name)
+    return bool(tables) and tables <= DIRECTORY_TABLES
+
+
+class DepotRouter:
+    def __init__(self, placements: Dict[str, str], engine_factory: Callable[[str, str], Engine]) -> None:
+        self.engine_factory = engine_factory
+        self._placements: Dict[uuid.UUID, Tuple[Optional[str], Optional[str]]] = {}
+        for depot_id, target in placements.items():
+            url, _, schema = target.partition("#")
+            self._placements[uuid.UUID(depot_id)] = (url or None, schema or None)
+        self._engines: Dict[Tuple, Engine] = {}
+        self._lock = threading.Lock()
+
+    def placement(self, depot_id: uuid.UUID) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """(database url or None for the default, schema or None) for a depot placed elsewhere."""
+        return self._placements.get(depot_id)
+
+    def placed_depots(self) -> List[uuid.UUID]:
+        return list(self._placements)
+
+    def route(self, depot_id: Optional[uuid.UUID], mapper, clause, default: Engine) -> Engine:
+        """The engine for a statement on ``mapper``/``clause`` in ``depot_id``'s session."""
+        if depot_id is None:
+            return default
+        placement = self.placement(depot_id)
+        if placement is None or _directory_only(mapper, clause):
+            return default
+        return self._engine(depot_id, placement, default)
+
+    def _engine(self, depot_id: uuid.UUID, placement: Tuple[Optional[str], Optional[str]], default: Engine) -> Engine:
+        key = (placement, id(default))
+        engine = self._engines.get(key)
+        if engine is None:
+            url, schema = placement
+            with self._lock:
+                base = self._engines.get((url, None)) if url else default
+                if base is None:
+                    base = self._engines[(url, None)] = self.engine_factory(url, f"depot-{depot_id}")
+                options = dict(default.get_execution_options())
+                if schema:
+                    options["schema_translate_map"] = {None: schema}
+                engine = self._engines[key] = base.execution_options(**options)
+        return engine
@@ -0,0 +1,183 @@
+"""
+Per-request SQL accounting through SQLAlchemy engine events.
+
+The request middleware puts a ``QueryStats`` in ``query_stats_ctx``; every
+statement executed while it is set (including from the threadpool, which
+copies the context) is counted and timed. When nothing is being tracked the
+hooks cost one ContextVar lookup per statement.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import tracing
+from app.core.config import settings
+from app.core.request_context import request_id_ctx
+
+logger = logging.getLogger("water_depot_pos.sql")
+
+MAX_LOGGED_STATEMENT = 1000
+EXPLAIN_PREFIX = "EXPLAIN (ANALYZE, BUFFERS)"
+# Re-running these would take their row locks a second time
+_LOCKING_CLAUSE = re.compile(r"\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b", re.IGNORECASE)
+
+
+class QueryStats:
+    __slots__ = ("count", "duration", "statements", "slow")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter = Counter()
+        self.slow: List[Tuple[str, float]] = []
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.duration += elapsed
+        self.statements[statement] += 1
+
+    def repeated_statements(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statements run at least ``threshold`` times: the usual shape of an N+1."""
+        return [(statement, n) for statement, n in self.statements.most_common() if n >= threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries"'
+
+
+query_stats_ctx: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+_installed = False
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is None:
+        return
+    # Kept on the execution context so a failing statement leaves nothing behind
+    context._query_span = tracing.start_span("db.query", statement=statement[:MAX_LOGGED_STATEMENT])
+    context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is None:
+        return
+    elapsed = time.perf_counter() - context._query_start
+    if context._query_span is not None:
+        context._query_span.end()
+    stats = query_stats_ctx.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    if elapsed * 1000 >= settings.SQL_SLOW_QUERY_MS:
+        if stats is not None:
+            stats.slow.append((statement, elapsed))
+        _log_slow_statement(conn, statement, parameters, elapsed, executemany)
+
+
+def _log_slow_statement(conn, statement, parameters, elapsed, executemany) -> None:
+    fields = {
+        "request_id": request_id_ctx.get(),
+        "duration_ms": round(elapsed * 1000, 2),
+        "statement": " ".join(statement.split())[:MAX_LOGGED_STATEMENT],
+    }
+    # EXPLAIN ANALYZE executes the statement again, so only do it for plain reads
+    if (
+        settings.SQL_EXPLAIN_SLOW_QUERIES
+        and not executemany
+        and statement.lstrip()[:6].upper() == "SELECT"
+        and not _LOCKING_CLAUSE.search(statement)
+    ):
+        fields["plan"] = _explain(conn, statement, parameters)
+    logger.warning("slow query", extra={"fields": fields})
+
+
+def _explain(conn, statement, parameters) -> str:
+    dbapi_connection = conn.connection.dbapi_connection
+    # Inside the request's transaction a failed EXPLAIN (a statement_timeout,
+    # say) would abort it, so it runs in a savepoint that is always rolled back
+    savepoint = not getattr(dbapi_connection, "autocommit", False)
+    try:
+        cursor = dbapi_connection.cursor()
+        try:
+            if savepoint:
+                cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute(f"{EXPLAIN_PREFIX} {statement}", parameters)
+                return " / ".join(row[0].strip() for row in cursor.fetchall())
+            finally:
+                if savepoint:
+                    cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                    cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        finally:
+            cursor.close()
+    except Exception as e:  # the plan is best-effort diagnostics
+        return f"<explain failed: {e}>"
+
+
+def install() -> None:
+    """Attach the hooks to every Engine (idempotent)."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _installed = True
+
+
+def report(stats: QueryStats, route: Optional[str]) -> None:
+    """Log N+1 suspects and query-budget overruns for a finished request."""
+    repeated = stats.repeated_statements(settings.SQL_N_PLUS_ONE_THRESHOLD)
+    for statement, n in repeated:
+        logger.warning(
+            "possible N+1",
+            extra={
+                "fields": {
+                    "request_id": request_id_ctx.get(),
+                    "route": route,
+                    "repeats": n,
+                    "statement": " ".join(statement.split())[:MAX_LOGGED_STATEMENT],
+                }
+            },
+        )
+    budget = settings.SQL_QUERY_BUDGETS.get(route) if route else None
+    if budget is not None and stats.count > budget:
+        logger.warning(
+            "query budget exceeded",
+            extra={"fields": {"request_id": request_id_ctx.get(), "route": route, "queries": stats.count, "budget": budget}},
+        )
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Count the statements executed inside the block (in this context)."""
+    install()
+    stats = QueryStats()
+    token = query_stats_ctx.set(stats)
+    try:
+        yield stats
+    finally:
+        query_stats_ctx.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries: int) -> Iterator[QueryStats]:
+    """
+    Fail if the block runs more than ``max_queries`` statements.
+
+        with query_budget(4):
+            SaleService.process_sale(db, user, items, SaleType.RETAIL)
+    """
+    with track_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        statements = "\n".join(f"{n}x {s}" for s, n in stats.statements.most_common())
+        raise QueryBudgetExceeded(f"{stats.count} queries executed, budget is {max_queries}:\n{statements}")
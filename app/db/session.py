@@ -1,6 +1,155 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import threading
+import time
+from typing import Dict, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+from app.core import metrics
 from app.core.config import settings
+from app.db import instrumentation
+from app.db.depot_routing import DEPOT_KEY, DepotRouter
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+POOL_CHECKOUT_SECONDS = metrics.registry.histogram(
+    "db_pool_checkout_seconds",
+    "Time to get a connection from the pool (includes waiting for a free slot).",
+    ("engine",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+
+    engine_name = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_SECONDS.labels(self.engine_name).observe(time.perf_counter() - start)
+
+def create_db_engine(url: str, name: str = "primary") -> Engine:
+    """
+    Engine with the pool profile from ``Settings``. In PgBouncer mode pooling
+    is left to PgBouncer (NullPool), and nothing relies on session state:
+    no startup options, no server-side prepared statements, and the
+    statement timeout is set per transaction.
+    """
+    connect_args = {}
+    timeout_ms = settings.DB_STATEMENT_TIMEOUT_MS
+    if settings.DB_PGBOUNCER:
+        if make_url(url).get_driver_name() == "psycopg":
+            connect_args["prepare_threshold"] = None
+        engine = create_engine(url, poolclass=NullPool, connect_args=connect_args)
+        if timeout_ms:
+            @event.listens_for(engine, "begin")
+            def _set_statement_timeout(conn):
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+        return engine
+
+    if timeout_ms:
+        connect_args["options"] = f"-c statement_timeout={int(timeout_ms)}"
+    # Subclass per engine so the pool's label survives pool.recreate()
+    poolclass = type(f"InstrumentedQueuePool_{name}", (InstrumentedQueuePool,), {"engine_name": name})
+    return create_engine(
+        url,
+        poolclass=poolclass,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=True,
+        connect_args=connect_args,
+    )
+
+depot_router = DepotRouter(settings.DEPOT_PLACEMENTS, create_db_engine)
+
+class DepotSession(Session):
+    """Session that sends a placed depot's statements to that depot's database."""
+
+    def get_bind(self, mapper=None, *, clause=None, **kw):
+        default = super().get_bind(mapper, clause=clause, **kw)
+        return depot_router.route(self.info.get(DEPOT_KEY), mapper, clause, default)
+
+engine = create_db_engine(settings.SQLALCHEMY_DATABASE_URI)
+SessionLocal = sessionmaker(class_=DepotSession, autocommit=False, autoflush=False, bind=engine)
+
+# Reads go to the replica when one is configured, otherwise to the primary
+if settings.SQLALCHEMY_READ_DATABASE_URI:
+    read_engine = create_db_engine(settings.SQLALCHEMY_READ_DATABASE_URI, "replica")
+else:
+    read_engine = engine
+ReadSessionLocal = sessionmaker(class_=DepotSession, autocommit=False, autoflush=False, bind=read_engine)
+
+def _read_only(target: Engine) -> Engine:
+    # SERIALIZABLE READ ONLY DEFERRABLE waits for a snapshot that can't see
+    # serialization anomalies, then runs without SSI overhead. Standbys don't
+    # allow SERIALIZABLE, so use a REPEATABLE READ snapshot there.
+    if target is engine:
+        return target.execution_options(
+            isolation_level="SERIALIZABLE", postgresql_readonly=True, postgresql_deferrable=True
+        )
+    return target.execution_options(isolation_level="REPEATABLE READ", postgresql_readonly=True)
+
+# Analytics/reporting: one consistent, read-only snapshot per request
+AnalyticsSessionLocal = sessionmaker(class_=DepotSession, autocommit=False, autoflush=False, bind=_read_only(read_engine))
+PrimaryAnalyticsSessionLocal = sessionmaker(class_=DepotSession, autocommit=False, autoflush=False, bind=_read_only(engine))
+
+instrumentation.install()
+
+
+class RecentWrites:
+    """
+    Remembers who committed a write in the last ``window`` seconds, so their
+    reads can be sent to the primary instead of a lagging replica. State is
+    per process; with several workers a user's next request may land on a
+    worker that didn't see the write, so keep the window above replica lag.
+    """
+
+    MAX_ENTRIES = 10000
+
+    def __init__(self, window: float) -> None:
+        self.window = window
+        self._writes: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._writes) >= self.MAX_ENTRIES:
+                self._writes = {k: t for k, t in self._writes.items() if now - t < self.window}
+            self._writes[key] = now
+
+    def recent(self, key: Optional[str]) -> bool:
+        written = self._writes.get(key) if key else None
+        return written is not None and time.monotonic() - written < self.window
+
+
+recent_writes = RecentWrites(settings.READ_YOUR_WRITES_SECONDS)
+
+@event.listens_for(SessionLocal, "after_commit")
+def _remember_writer(session: Session) -> None:
+    # get_current_user tags the request's primary session with the username
+    username = session.info.get("username")
+    if username is not None and read_engine is not engine and recent_writes.window > 0:
+        recent_writes.mark(username)
+
+
+_engines = {"primary": engine, "replica": read_engine} if read_engine is not engine else {"primary": engine}
+
+def _pool_gauge(read):
+    def collect():
+        return {(name,): read(e.pool) for name, e in _engines.items() if isinstance(e.pool, QueuePool)}
+    return collect
+
+metrics.registry.gauge("db_pool_size", "Configured pool size.", _pool_gauge(lambda p: p.size()), ("engine",))
+metrics.registry.gauge(
+    "db_pool_checked_out", "Connections currently checked out.", _pool_gauge(lambda p: p.checkedout()), ("engine",)
+)
+metrics.registry.gauge(
+    "db_pool_overflow",
+    "Connections open beyond pool_size.",
+    _pool_gauge(lambda p: max(p.overflow(), 0)),
+    ("engine",),
+)
@@ -1,20 +1,34 @@
 
+import asyncio
 import os
+import time
 import logging
 from fastapi import FastAPI, Request, Response, status
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from app.core import metrics, profiling, tracing
 from app.core.config import settings
+from app.core.content_negotiation import ContentNegotiationMiddleware
 from app.api.v1.api_router import api_router
-from app.services.storage_service import StorageService
-
-# Production-ready logging setup
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-    force=True,  # Ensures our config is used even if Uvicorn sets up logging first
-)
+from app.core.logging_config import configure_logging, request_sampler
+from app.core.request_context import new_request_id, request_id_ctx, route_template
+from app.db import instrumentation
+from app.db.session import PrimaryAnalyticsSessionLocal, SessionLocal, depot_router
+from app.services.archive_service import ArchiveService
+from app.services.hold_service import HoldService
+from app.services.hot_window import hot_window
+from app.services.outbox import JsonlSink, outbox
+from app.services.periodic import PeriodicJob
+from app.services.rollup_service import RollupService
+from app.services.sale_service import SALE_EVENT
+from app.services.snapshot_service import SnapshotService
+from app.services.stock_shard_service import StockShardService
+from app.services.storage_service import get_storage_service
+
+# Production-ready logging setup: records are queued and written by a
+# background thread, so request handling never blocks on stdout.
+configure_logging()
 # Use a dedicated logger for the application
 logger = logging.getLogger("water_depot_pos")
 
@@ -32,40 +46,134 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Inside observe_requests, so request latency includes compression
+app.add_middleware(ContentNegotiationMiddleware)
 
 
-# Log every request and response
+# One structured, sampled log line, one latency sample and SQL accounting per
+# request, plus a trace and/or an on-demand profile when sampled or asked for
 @app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger.info(f"Request: {request.method} {request.url}")
-    response = await call_next(request)
-    logger.info(f"Response: {response.status_code} {request.method} {request.url}")
-    return response
+async def observe_requests(request: Request, call_next):
+    request_id = request.headers.get("x-request-id") or new_request_id()
+    token = request_id_ctx.set(request_id)
+    query_stats = instrumentation.QueryStats()
+    stats_token = instrumentation.query_stats_ctx.set(query_stats)
+    profile_request = None
+    if profiling.requested(request.scope):
+        profile_request = profiling.ProfileRequest(request.method, request.scope["path"])
+    profile_token = profiling.profile_request_ctx.set(profile_request)
+    root_span = tracing.start_trace("http.request", request.headers.get("traceparent"), request_id=request_id)
+    span_token = tracing.current_span_ctx.set(root_span)
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        if root_span is not None:
+            response.headers["traceresponse"] = tracing.traceparent_for(root_span)
+        if profile_request is not None:
+            profile = profiling.store(profile_request, route_template(request.scope))
+            if profile is not None:
+                response.headers["X-Profile-ID"] = profile.id
+        response.headers["Server-Timing"] = (
+            f"{query_stats.server_timing()}, app;dur={(time.perf_counter() - start) * 1000:.2f}"
+        )
+        return response
+    finally:
+        tracing.current_span_ctx.reset(span_token)
+        profiling.profile_request_ctx.reset(profile_token)
+        instrumentation.query_stats_ctx.reset(stats_token)
+        elapsed = time.perf_counter() - start
+        route = route_template(request.scope)
+        if root_span is not None:
+            root_span.name = f"{request.method} {route or request.scope['path']}"
+            root_span.set_attribute("http.status_code", status_code)
+            tracing.finish_trace(root_span)
+        if query_stats.count:
+            instrumentation.report(query_stats, route)
+        # Unmatched paths share one label so 404 scans can't blow up cardinality
+        route_label = route or "<unmatched>"
+        metrics.HTTP_REQUEST_DURATION.labels(request.method, route_label).observe(elapsed)
+        metrics.HTTP_REQUESTS.labels(request.method, route_label, str(status_code)).inc()
+        route_path = route or request.scope["path"]
+        if request_sampler.should_log(route_path, status_code):
+            fields = {
+                "request_id": request_id,
+                "method": request.method,
+                "path": request.scope["path"],
+                "route": route_path,
+                "status": status_code,
+                "latency_ms": round(elapsed * 1000, 2),
+                "db_queries": query_stats.count,
+                "db_ms": round(query_stats.duration * 1000, 2),
+            }
+            if root_span is not None:
+                fields["trace_id"] = root_span.trace_id
+            logger.info("request", extra={"fields": fields})
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+# The default database, then each depot placed elsewhere
+def _job_depots():
+    return [None, *depot_router.placed_depots()]
+
+# Work derived from sales runs off the checkout path, fed by the outbox
+outbox.register(SALE_EVENT, "sales-rollup", RollupService.apply_sales)
+if settings.OUTBOX_WEBHOOK_FILE:
+    outbox.register(SALE_EVENT, "webhook-file", JsonlSink(settings.OUTBOX_WEBHOOK_FILE))
+
+hold_sweeper = PeriodicJob(
+    "hold-sweeper", HoldService.sweep_expired, lambda: settings.STOCK_HOLD_SWEEP_SECONDS, SessionLocal, _job_depots
+)
+shard_rebalancer = PeriodicJob(
+    "shard-rebalancer", StockShardService.rebalance_all, lambda: settings.STOCK_SHARD_REBALANCE_SECONDS,
+    SessionLocal, _job_depots,
+)
+outbox_dispatcher = PeriodicJob(
+    "outbox-dispatcher", outbox.dispatch_pending, lambda: settings.OUTBOX_DISPATCH_SECONDS, SessionLocal, _job_depots
+)
+snapshot_exporter = PeriodicJob(
+    "snapshot-exporter", SnapshotService.export_all,
+    lambda: settings.ANALYTICS_SNAPSHOT_SECONDS if settings.ANALYTICS_SNAPSHOT_DIR else 0, SessionLocal, _job_depots,
+)
+archiver = PeriodicJob("archiver", ArchiveService.run, lambda: settings.ARCHIVE_INTERVAL_SECONDS, SessionLocal, _job_depots)
+hot_window_task = None
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application started successfully. Waiting for requests...")
+    hold_sweeper.start()
+    shard_rebalancer.start()
+    outbox_dispatcher.start()
+    archiver.start()
+    snapshot_exporter.start()
+    global hot_window_task
+    if hot_window.enabled():
+        hot_window_task = asyncio.create_task(hot_window.run(PrimaryAnalyticsSessionLocal))
     
     # Check storage connection
     try:
-        storage = StorageService()
+        storage = get_storage_service()
         storage.check_connection()
     except Exception as e:
-        logger.error(f"Failed to initialize storage service check: {e}")
+        logger.error("Failed to initialize storage service check: %s", e)
 
 
 
 
 @app.api_route("/", methods=["GET", "HEAD"])
 def root():
-    logger.info("Root endpoint accessed.")
+    logger.debug("Root endpoint accessed.")
     return {"message": "Welcome to Water Depot POS API"}
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Global exception: {exc}", exc_info=True)
+    logger.error("Global exception: %s", exc, exc_info=True)
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "Internal Server Error. Please check server logs."},
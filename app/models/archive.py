@@ -0,0 +1,29 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, Date, DateTime, Float, Integer, String, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.base_class import Base
+from app.models.depot import depot_id_column
+
+class TransactionArchive(Base):
+    """
+    Manifest entry for one depot's month of transactions, moved out of the
+    hot tables into a compressed columnar file (see archive_service).
+    """
+    __tablename__ = "transaction_archives"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
+    depot_id = depot_id_column()
+    month = Column(Date, nullable=False)
+    # Exclusive; live analytics start here once a month is archived
+    month_end = Column(DateTime, nullable=False)
+    key = Column(String, nullable=False)
+    transaction_count = Column(Integer, nullable=False)
+    item_count = Column(Integer, nullable=False)
+    total_amount = Column(Float, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Set once the month's rows are deleted from transactions/transaction_items
+    purged_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (UniqueConstraint("depot_id", "month", name="uq_transaction_archives_depot_id_month"),)
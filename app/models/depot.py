@@ -0,0 +1,34 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import DDL, Column, DateTime, ForeignKey, String, event, text
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.base_class import Base
+
+# Rows from before depots existed, and anything created without one, belong here
+DEFAULT_DEPOT_ID = uuid.UUID("00000000-0000-0000-0000-000000000001")
+
+class Depot(Base):
+    __tablename__ = "depots"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
+    name = Column(String, nullable=False)
+    code = Column(String, unique=True, index=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Databases built with create_all (tests, local setups) need the default depot
+# the migration inserts
+event.listen(
+    Depot.__table__,
+    "after_create",
+    DDL(f"INSERT INTO depots (id, name, code, created_at) VALUES ('{DEFAULT_DEPOT_ID}', 'Main depot', 'main', now())"),
+)
+
+def depot_id_column() -> Column:
+    """The depot a row belongs to; every depot-scoped table has one."""
+    return Column(
+        UUID(as_uuid=True),
+        ForeignKey("depots.id"),
+        nullable=False,
+        default=DEFAULT_DEPOT_ID,
+        server_default=text(f"'{DEFAULT_DEPOT_ID}'"),
+    )
@@ -0,0 +1,24 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Column, DateTime, Identity, Integer, String, func
+from sqlalchemy.dialects.postgresql import JSONB
+from app.db.base_class import Base
+from app.models.depot import depot_id_column
+
+class OutboxEvent(Base):
+    """
+    An event written in the same transaction as the change it describes,
+    waiting for the outbox dispatcher to hand it to its consumers.
+    """
+    __tablename__ = "outbox_events"
+
+    # Increasing, so the dispatcher delivers roughly in commit order
+    id = Column(BigInteger, Identity(), primary_key=True)
+    depot_id = depot_id_column()
+    topic = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Failed deliveries are retried from here on; events that used up
+    # OUTBOX_MAX_ATTEMPTS stay in the table for inspection
+    available_at = Column(DateTime, default=datetime.utcnow, server_default=func.now(), nullable=False)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    last_error = Column(String, nullable=True)
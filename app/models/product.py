@@ -1,20 +1,94 @@
-from sqlalchemy import Column, String, Float, Boolean, Integer, DateTime
+from sqlalchemy import (
+    DDL, BigInteger, Column, String, Float, Boolean, Integer, DateTime, FetchedValue, ForeignKey, Index, case, event,
+    func, select, text,
+)
 import uuid
 from datetime import datetime
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import column_property
 from app.db.base_class import Base
+from app.models.depot import depot_id_column
 
 class Product(Base):
     __tablename__ = "products"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    depot_id = depot_id_column()
     name = Column(String, index=True, nullable=False)
     wholesale_price = Column(Float, nullable=False)
     retail_price = Column(Float, nullable=False)
     stock_quantity = Column(Integer, default=0, nullable=False)
     low_stock_threshold = Column(Integer, default=2, nullable=False)
+    # Units held by open carts (stock_holds); available = stock_quantity - reserved_quantity
+    reserved_quantity = Column(Integer, default=0, server_default="0", nullable=False)
+    # Hot products can spread their stock over N product_stock_shards rows so
+    # concurrent sales don't queue on this row. While sharded, the shards are
+    # authoritative and stock_quantity is a copy refreshed by the rebalancer;
+    # read current_stock for the exact figure.
+    stock_shards = Column(Integer, default=0, server_default="0", nullable=False)
     is_active = Column(Boolean, default=True)
-    sku = Column(String, unique=True, index=True, nullable=True)
-    category = Column(String, index=True, nullable=True)
+    sku = Column(String, nullable=True)  # unique within a depot
+    category = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    image_url = Column(String, nullable=True)  # Path or URL to image file
\ No newline at end of file
+    image_url = Column(String, nullable=True)  # Path or URL to image file
+    # Id of the transaction that last inserted or changed the row (stock and
+    # soft deletes included), set by the products_row_version trigger.
+    # Terminals sync from it with GET /products/changes.
+    row_version = Column(
+        BigInteger, nullable=False, server_default=text("0"), server_onupdate=FetchedValue()
+    )
+
+    # Listings and lookups are always within one depot
+    __table_args__ = (
+        Index("ix_products_depot_id_sku", "depot_id", "sku", unique=True),
+        Index("ix_products_depot_id_category", "depot_id", "category"),
+        Index("ix_products_depot_id_row_version", "depot_id", "row_version"),
+    )
+
+ROW_VERSION_FUNCTION = """
+CREATE OR REPLACE FUNCTION products_bump_row_version() RETURNS trigger AS $$
+DECLARE
+    unchanged products;
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        -- Holds only move reserved_quantity, which terminals don't sync
+        unchanged := OLD;
+        unchanged.reserved_quantity := NEW.reserved_quantity;
+        IF NEW IS NOT DISTINCT FROM unchanged THEN
+            RETURN NEW;
+        END IF;
+    END IF;
+    NEW.row_version := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+ROW_VERSION_TRIGGER = """
+CREATE TRIGGER products_row_version BEFORE INSERT OR UPDATE ON products
+FOR EACH ROW EXECUTE FUNCTION products_bump_row_version()
+"""
+
+# Databases built with create_all (tests, local setups) need the trigger the migration adds
+event.listen(Product.__table__, "after_create", DDL(ROW_VERSION_FUNCTION))
+event.listen(Product.__table__, "after_create", DDL(ROW_VERSION_TRIGGER))
+
+class ProductStockShard(Base):
+    __tablename__ = "product_stock_shards"
+
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    quantity = Column(Integer, default=0, nullable=False)
+
+Product.current_stock = column_property(
+    case(
+        (
+            Product.stock_shards > 0,
+            select(func.coalesce(func.sum(ProductStockShard.quantity), 0))
+            .where(ProductStockShard.product_id == Product.id)
+            .correlate_except(ProductStockShard)
+            .scalar_subquery(),
+        ),
+        else_=Product.stock_quantity,
+    ),
+    deferred=True,
+)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer, PrimaryKeyConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.base_class import Base
+from app.models.depot import depot_id_column
+
+class ProductDailySales(Base):
+    """Units and revenue per product per day, kept up to date from the outbox's sale events."""
+    __tablename__ = "product_daily_sales"
+
+    depot_id = depot_id_column()
+    day = Column(Date, nullable=False)
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    revenue = Column(Float, nullable=False)
+
+    # Forecast reads go by depot and day range
+    __table_args__ = (PrimaryKeyConstraint("depot_id", "day", "product_id"),)
@@ -0,0 +1,28 @@
+import enum
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, Index
+import uuid
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from app.db.base_class import Base
+
+class StockAlertKind(str, enum.Enum):
+    LOW_STOCK = "low_stock"
+    OUT_OF_STOCK = "out_of_stock"
+
+class StockAlert(Base):
+    """A product's stock crossing its low-stock threshold (or hitting zero) in a sale."""
+    __tablename__ = "stock_alerts"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"), nullable=False)
+    transaction_id = Column(UUID(as_uuid=True), ForeignKey("transactions.id"), nullable=True)
+    kind = Column(Enum(StockAlertKind, values_callable=lambda x: [e.value for e in x]), nullable=False)
+    stock_quantity = Column(Integer, nullable=False)
+    low_stock_threshold = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    product = relationship("Product")
+    transaction = relationship("Transaction")
+
+    __table_args__ = (Index("ix_stock_alerts_created_at", "created_at"),)
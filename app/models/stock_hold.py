@@ -0,0 +1,22 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, Index, UniqueConstraint
+import uuid
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.base_class import Base
+
+class StockHold(Base):
+    """Units of a product reserved by an open cart until ``expires_at``."""
+    __tablename__ = "stock_holds"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
+    cart_id = Column(UUID(as_uuid=True), nullable=False)
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id"), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("cart_id", "product_id", name="uq_stock_holds_cart_product"),
+        Index("ix_stock_holds_expires_at", "expires_at"),
+    )
@@ -1,10 +1,11 @@
 import enum
 from datetime import datetime
-from sqlalchemy import Column, Float, ForeignKey, DateTime, Enum, Integer
+from sqlalchemy import Column, Float, ForeignKey, DateTime, Enum, Index, Integer
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
+from app.models.depot import depot_id_column
 
 class SaleType(str, enum.Enum):
     WHOLESALE = "wholesale"
@@ -15,6 +16,7 @@ class Transaction(Base):
     __tablename__ = "transactions"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    depot_id = depot_id_column()
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     total_amount = Column(Float, nullable=False)
     sale_type = Column(Enum(SaleType, values_callable=lambda x: [e.value for e in x]), nullable=False)
@@ -22,6 +24,14 @@ class Transaction(Base):
 
     items = relationship("TransactionItem", back_populates="transaction")
 
+    # History pages and analytics walk (created_at, id) within a depot, per
+    # cashier, or across depots
+    __table_args__ = (
+        Index("ix_transactions_depot_id_created_at_id", "depot_id", "created_at", "id"),
+        Index("ix_transactions_created_at_id", "created_at", "id"),
+        Index("ix_transactions_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
 class TransactionItem(Base):
     __tablename__ = "transaction_items"
 
@@ -32,4 +42,9 @@ class TransactionItem(Base):
     price_at_sale = Column(Float, nullable=False)
     sale_type = Column(Enum(SaleType, values_callable=lambda x: [e.value for e in x]), nullable=False, default=SaleType.RETAIL)
 
-    transaction = relationship("Transaction", back_populates="items")
\ No newline at end of file
+    transaction = relationship("Transaction", back_populates="items")
+
+    __table_args__ = (
+        Index("ix_transaction_items_transaction_id", "transaction_id"),
+        Index("ix_transaction_items_product_id_transaction_id", "product_id", "transaction_id"),
+    )
\ No newline at end of file
@@ -1,9 +1,10 @@
 import enum
-from sqlalchemy import Column, String, Boolean, Enum, DateTime
+from sqlalchemy import Column, String, Boolean, Enum, DateTime, Index
 from datetime import datetime
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
 from app.db.base_class import Base
+from app.models.depot import depot_id_column
 
 class UserRole(str, enum.Enum):
     OWNER = "owner"
@@ -13,6 +14,7 @@ class User(Base):
     __tablename__ = "users"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    depot_id = depot_id_column()
     username = Column(String, unique=True, index=True, nullable=False)
     full_name = Column(String, nullable=True)
     hashed_password = Column(String, nullable=False)
@@ -20,4 +22,6 @@ class User(Base):
     phone = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_users_depot_id_role", "depot_id", "role"),)
@@ -1,6 +1,7 @@
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pydantic import BaseModel, field_validator
+from app.models.stock_alert import StockAlertKind
 
 # Sales Analytics
 class SalesMetrics(BaseModel):
@@ -42,6 +43,52 @@ class EmployeeSalesResponse(BaseModel):
     period: str
     employees: List[EmployeeSalesMetrics]
 
+# Period-over-period comparisons: the current period and the one of the
+# same length right before it
+class MetricChange(BaseModel):
+    absolute: float
+    percent: Optional[float] = None  # None when the previous value is 0
+
+class SalesMetricsComparison(BaseModel):
+    current_period: str
+    previous_period: str
+    current: SalesMetrics
+    previous: SalesMetrics
+    changes: Dict[str, MetricChange]  # per SalesMetrics field
+
+class ProductSalesChange(BaseModel):
+    product_id: str
+    product_name: str
+    quantity_sold: int
+    previous_quantity_sold: int
+    total_revenue: float
+    previous_total_revenue: float
+    quantity_change: MetricChange
+    revenue_change: MetricChange
+
+class ProductSalesComparison(BaseModel):
+    current_period: str
+    previous_period: str
+    products: List[ProductSalesChange]
+    total_revenue: float
+    previous_total_revenue: float
+    revenue_change: MetricChange
+
+class EmployeeSalesChange(BaseModel):
+    user_id: str
+    username: str
+    total_sales: float
+    previous_total_sales: float
+    transaction_count: int
+    previous_transaction_count: int
+    sales_change: MetricChange
+    transaction_count_change: MetricChange
+
+class EmployeeSalesComparison(BaseModel):
+    current_period: str
+    previous_period: str
+    employees: List[EmployeeSalesChange]
+
 # Inventory Analytics
 class InventoryStatus(BaseModel):
     product_id: str
@@ -58,6 +105,44 @@ class InventoryAnalytics(BaseModel):
     average_stock_level: float
     products: List[InventoryStatus]
 
+class StockAlertResponse(BaseModel):
+    id: str
+    product_id: str
+    product_name: str
+    transaction_id: Optional[str] = None
+    kind: StockAlertKind
+    stock_quantity: int
+    low_stock_threshold: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+    @field_validator("id", "product_id", "transaction_id", mode="before")
+    @classmethod
+    def _stringify_ids(cls, value):
+        return None if value is None else str(value)
+
+class ReorderSuggestion(BaseModel):
+    product_id: str
+    product_name: str
+    available_stock: int  # on hand minus held by carts
+    daily_velocity: float  # mean units/day over the window
+    trend: float  # change in units/day per day (least squares)
+    daily_demand: float  # trend line's value for today
+    days_of_cover: Optional[float] = None  # None when nothing is selling
+    reorder_point: float
+    suggested_quantity: int
+
+class ReorderForecast(BaseModel):
+    generated_at: datetime
+    window_days: int
+    lead_time_days: int
+    cover_days: int
+    total_products: int
+    reorder_count: int
+    suggestions: List[ReorderSuggestion]
+
 # Revenue Analytics
 class RevenueBreakdown(BaseModel):
     wholesale_revenue: float
@@ -1,6 +1,6 @@
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 class ProductBase(BaseModel):
     name: str
@@ -19,9 +19,36 @@ class ProductCreate(ProductBase):
 class ProductUpdate(ProductBase):
     pass
 
-class ProductResponse(ProductBase):
+class StockShardsUpdate(BaseModel):
+    # 0 keeps the stock on the product row
+    shards: int = Field(..., ge=0, le=64)
+
+class CatalogProduct(ProductBase):
+    """A product as terminals sync it (``/products/changes``)."""
     id: str
+    depot_id: Optional[str] = None
     created_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+    @field_validator("id", mode="before")
+    @classmethod
+    def _stringify_id(cls, value):
+        # ORM rows carry UUIDs
+        return str(value)
+
+    @field_validator("depot_id", mode="before")
+    @classmethod
+    def _stringify_depot_id(cls, value):
+        return None if value is None else str(value)
+
+class ProductResponse(CatalogProduct):
+    reserved_quantity: int = 0  # held by open carts
+
+class ProductChanges(BaseModel):
+    # Pass as ``since`` next time. Rows can come again in the next batch;
+    # terminals apply them by id.
+    version: int
+    products: List[CatalogProduct]  # changed or added, active
+    deactivated: List[str]  # ids of products removed from sale
@@ -1,6 +1,7 @@
-from typing import List
+from typing import List, Optional
+from uuid import UUID
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from app.models.transaction import SaleType
 
 class TransactionItemCreate(BaseModel):
@@ -11,6 +12,35 @@ class TransactionItemCreate(BaseModel):
 class TransactionCreate(BaseModel):
     sale_type: SaleType = SaleType.MIXED
     items: List[TransactionItemCreate]
+    # Check out a cart's stock holds; they are released whether or not every unit is sold
+    cart_id: Optional[UUID] = None
+
+class StockHoldItem(BaseModel):
+    product_id: str
+    quantity: int = Field(..., gt=0)
+
+    class Config:
+        from_attributes = True
+
+    @field_validator("product_id", mode="before")
+    @classmethod
+    def _stringify_product_id(cls, value):
+        return str(value)
+
+class StockHoldCreate(BaseModel):
+    # Omit to start a new cart
+    cart_id: Optional[UUID] = None
+    items: List[StockHoldItem]
+
+class StockHoldResponse(BaseModel):
+    cart_id: str
+    expires_at: datetime
+    items: List[StockHoldItem]
+
+    @field_validator("cart_id", mode="before")
+    @classmethod
+    def _stringify_cart_id(cls, value):
+        return str(value)
 
 class TransactionItemResponse(BaseModel):
     product_id: str
@@ -18,6 +48,14 @@ class TransactionItemResponse(BaseModel):
     price_at_sale: float
     sale_type: SaleType
 
+    class Config:
+        from_attributes = True
+
+    @field_validator("product_id", mode="before")
+    @classmethod
+    def _stringify_product_id(cls, value):
+        return str(value)
+
 class TransactionResponse(BaseModel):
     id: str
     total_amount: float
@@ -25,7 +63,42 @@ class TransactionResponse(BaseModel):
     created_at: datetime
     items: List[TransactionItemResponse]
 
+    class Config:
+        from_attributes = True
+
+    @field_validator("id", mode="before")
+    @classmethod
+    def _stringify_id(cls, value):
+        return str(value)
+
+class TransactionDetailResponse(TransactionResponse):
+    user_id: str
+    depot_id: Optional[str] = None
+
+    @field_validator("user_id", mode="before")
+    @classmethod
+    def _stringify_user_id(cls, value):
+        return str(value)
+
+    @field_validator("depot_id", mode="before")
+    @classmethod
+    def _stringify_depot_id(cls, value):
+        return None if value is None else str(value)
+
+class TransactionPage(BaseModel):
+    transactions: List[TransactionDetailResponse]
+    # Pass as ``cursor`` for the next (older) page; None on the last page
+    next_cursor: Optional[str] = None
+
 class TopProduct(BaseModel):
     product_id: str
     name: str
-    quantity: int
\ No newline at end of file
+    quantity: int
+
+    class Config:
+        from_attributes = True
+
+    @field_validator("product_id", mode="before")
+    @classmethod
+    def _stringify_product_id(cls, value):
+        return str(value)
\ No newline at end of file
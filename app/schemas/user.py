@@ -1,6 +1,6 @@
 from typing import Optional
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from app.models.user import UserRole
 
 class UserBase(BaseModel):
@@ -20,7 +20,18 @@ class UserUpdate(BaseModel):
 
 class UserResponse(UserBase):
     id: str
+    depot_id: Optional[str] = None
     created_at: Optional[datetime] = Field(default=None)
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+    @field_validator("id", mode="before")
+    @classmethod
+    def _stringify_id(cls, value):
+        return str(value)
+
+    @field_validator("depot_id", mode="before")
+    @classmethod
+    def _stringify_depot_id(cls, value):
+        return None if value is None else str(value)
@@ -0,0 +1,337 @@
+"""
+Synthetic dataset for benchmarks.
+
+Generates a product catalogue, staff accounts and years of sales history with
+daily/weekly/annual seasonality and a wholesale/retail mix, and bulk-loads it
+with COPY. Transactions are generated in fixed-size chunks of days, each from
+its own RNG derived from ``--seed``, so the dataset is identical for a given
+seed and end date however many worker processes load it.
+
+    python -m app.seed_data --products 300 --staff 25 --days 730 --per-day 7000 --workers 8 --reset
+
+``--reset`` TRUNCATES transactions and transaction_items and removes
+previously seeded products and staff; don't point it at real data.
+"""
+import argparse
+import io
+import logging
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.security import get_password_hash
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEED_SKU_PREFIX = "SEED-"
+SEED_USERNAME_SUFFIX = "@seed.waterdepot.local"
+STAFF_PASSWORD = "staff"
+
+# (name, category, retail price, wholesale price); the first rows are the hot SKUs
+CATALOGUE = [
+    ("5-Gallon Refill (Round)", "Water", 35.0, 25.0),
+    ("5-Gallon Refill (Slim)", "Water", 35.0, 25.0),
+    ("Alkaline 5-Gallon Refill", "Water", 50.0, 38.0),
+    ("Mineral 5-Gallon Refill", "Water", 45.0, 33.0),
+    ("500ml Bottled Water", "Water", 12.0, 8.0),
+    ("1L Bottled Water", "Water", 20.0, 14.0),
+    ("Round Container 5-Gallon", "Containers", 250.0, 200.0),
+    ("Slim Container 5-Gallon", "Containers", 230.0, 185.0),
+    ("Container Cap", "Accessories", 5.0, 3.0),
+    ("Container Seal", "Accessories", 3.0, 2.0),
+    ("Faucet", "Accessories", 60.0, 45.0),
+    ("Manual Pump Dispenser", "Accessories", 150.0, 115.0),
+    ("Tabletop Dispenser", "Accessories", 450.0, 360.0),
+]
+CATEGORIES = ("Water", "Containers", "Accessories")
+
+# Share of sales per hour of the day (opening 6:00 to 20:00, morning/evening peaks)
+HOURLY_WEIGHTS = [0, 0, 0, 0, 0, 0, 4, 9, 10, 8, 6, 5, 5, 5, 5, 6, 8, 9, 7, 4, 2, 0, 0, 0]
+# Monday..Sunday
+WEEKDAY_FACTORS = (0.9, 0.95, 0.95, 1.0, 1.1, 1.3, 1.2)
+LINES_PER_SALE = (1, 2, 3, 4, 5, 6)
+LINES_WEIGHTS = (50, 25, 12, 7, 4, 2)
+WHOLESALE_SHARE = 0.22
+
+# Columns in COPY order
+PRODUCT_COLUMNS = (
+    "id", "name", "wholesale_price", "retail_price", "stock_quantity",
+    "low_stock_threshold", "is_active", "sku", "category", "created_at",
+)
+USER_COLUMNS = ("id", "username", "full_name", "hashed_password", "role", "is_active", "is_superuser", "created_at")
+TRANSACTION_COLUMNS = ("id", "user_id", "total_amount", "sale_type", "created_at")
+ITEM_COLUMNS = ("id", "transaction_id", "product_id", "quantity", "price_at_sale", "sale_type")
+
+# (id, retail price, wholesale price)
+ProductRow = Tuple[str, float, float]
+
+
+def random_uuid(rng: random.Random) -> str:
+    """A version-4 UUID (hex form, which Postgres accepts) drawn from ``rng``."""
+    value = rng.getrandbits(128)
+    value = (value & ~(0xF << 76)) | (0x4 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return f"{value:032x}"
+
+
+def build_products(rng: random.Random, count: int, created_at: datetime) -> List[tuple]:
+    rows = []
+    for i in range(count):
+        if i < len(CATALOGUE):
+            name, category, retail, wholesale = CATALOGUE[i]
+        else:
+            category = rng.choice(CATEGORIES)
+            retail = round(rng.uniform(5, 500), 2)
+            wholesale = round(retail * rng.uniform(0.65, 0.85), 2)
+            name = f"{category} item {i:04d}"
+        rows.append((
+            random_uuid(rng), name, wholesale, retail, rng.randint(50, 5000),
+            rng.choice((2, 5, 10)), True, f"{SEED_SKU_PREFIX}{i:05d}", category, created_at,
+        ))
+    return rows
+
+
+def build_staff(rng: random.Random, count: int, password_hash: str, created_at: datetime) -> List[tuple]:
+    return [
+        (
+            random_uuid(rng), f"staff{i:03d}{SEED_USERNAME_SUFFIX}", f"Seed Staff {i:03d}",
+            password_hash, "staff", True, False, created_at,
+        )
+        for i in range(count)
+    ]
+
+
+def popularity_weights(count: int, skew: float = 1.1) -> List[float]:
+    """Zipf-like weights: a few hot SKUs (the refills) take most of the volume."""
+    return [1.0 / (rank + 1) ** skew for rank in range(count)]
+
+
+def daily_volume(day: date, start: date, days: int, per_day: float, rng: random.Random) -> int:
+    # Hotter months sell more water (peak around April-May), plus slow growth over the period
+    season = 1.0 + 0.25 * math.sin(2 * math.pi * (day.timetuple().tm_yday - 30) / 365.25)
+    growth = 0.8 + 0.4 * ((day - start).days / max(days - 1, 1))
+    return int(per_day * season * growth * WEEKDAY_FACTORS[day.weekday()] * rng.lognormvariate(0, 0.12))
+
+
+def generate_chunk(
+    seed: int,
+    chunk_index: int,
+    days: Sequence[date],
+    start: date,
+    total_days: int,
+    per_day: float,
+    products: Sequence[ProductRow],
+    staff_ids: Sequence[str],
+) -> Tuple[io.StringIO, io.StringIO, int, int]:
+    """
+    Build COPY text for the transactions and items of one chunk of days.
+    Returns (transactions, items, transaction count, item count).
+    """
+    rng = random.Random(f"{seed}:{chunk_index}")
+    weights = popularity_weights(len(products))
+    cumulative_products = list(_accumulate(weights))
+    cumulative_hours = list(_accumulate(HOURLY_WEIGHTS))
+    cumulative_lines = list(_accumulate(LINES_WEIGHTS))
+    transactions = io.StringIO()
+    items = io.StringIO()
+    n_transactions = n_items = 0
+
+    for day in days:
+        midnight = datetime(day.year, day.month, day.day)
+        for _ in range(daily_volume(day, start, total_days, per_day, rng)):
+            transaction_id = random_uuid(rng)
+            hour = rng.choices(range(24), cum_weights=cumulative_hours)[0]
+            created_at = midnight + timedelta(hours=hour, seconds=rng.randrange(3600))
+            n_lines = rng.choices(LINES_PER_SALE, cum_weights=cumulative_lines)[0]
+            wholesale_customer = rng.random() < WHOLESALE_SHARE
+            chosen = set(rng.choices(range(len(products)), cum_weights=cumulative_products, k=n_lines))
+            total = 0.0
+            line_types = set()
+            for index in chosen:
+                product_id, retail, wholesale = products[index]
+                # Wholesale customers occasionally pick up a retail add-on
+                if wholesale_customer and rng.random() < 0.9:
+                    sale_type, price, quantity = "wholesale", wholesale, rng.randint(5, 40)
+                else:
+                    sale_type, price, quantity = "retail", retail, rng.choices((1, 2, 3, 4), (60, 25, 10, 5))[0]
+                line_types.add(sale_type)
+                total += price * quantity
+                items.write(f"{random_uuid(rng)}\t{transaction_id}\t{product_id}\t{quantity}\t{price}\t{sale_type}\n")
+                n_items += 1
+            sale_type = line_types.pop() if len(line_types) == 1 else "mixed"
+            transactions.write(
+                f"{transaction_id}\t{rng.choice(staff_ids)}\t{round(total, 2)}\t{sale_type}\t{created_at.isoformat()}\n"
+            )
+            n_transactions += 1
+
+    transactions.seek(0)
+    items.seek(0)
+    return transactions, items, n_transactions, n_items
+
+
+def _accumulate(values: Sequence[float]):
+    total = 0.0
+    for value in values:
+        total += value
+        yield total
+
+
+def _connect():
+    """Raw DBAPI connection outside the app's instrumented pool."""
+    engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, poolclass=NullPool)
+    return engine.raw_connection()
+
+
+def copy_rows(cursor, table: str, columns: Sequence[str], data: io.StringIO) -> None:
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    if hasattr(cursor, "copy_expert"):  # psycopg2
+        cursor.copy_expert(sql, data)
+    else:  # psycopg 3
+        with cursor.copy(sql) as copy:
+            copy.write(data.getvalue())
+
+
+def _as_copy_text(rows: Sequence[tuple]) -> io.StringIO:
+    def value(v):
+        if v is None:
+            return "\\N"
+        if isinstance(v, datetime):
+            return v.isoformat()
+        return str(v)
+
+    return io.StringIO("".join("\t".join(value(v) for v in row) + "\n" for row in rows))
+
+
+# Set in each worker by the pool initializer so chunks don't re-pickle them
+_worker_state: Dict[str, object] = {}
+
+
+def _init_worker(products: Sequence[ProductRow], staff_ids: Sequence[str]) -> None:
+    _worker_state["products"] = products
+    _worker_state["staff_ids"] = staff_ids
+
+
+def load_chunk(seed: int, chunk_index: int, days: Sequence[date], start: date, total_days: int,
+               per_day: float) -> Tuple[int, int]:
+    transactions, items, n_transactions, n_items = generate_chunk(
+        seed, chunk_index, days, start, total_days, per_day,
+        _worker_state["products"], _worker_state["staff_ids"],
+    )
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        # Losing a seed chunk on a crash is fine; waiting for WAL flushes isn't
+        cursor.execute("SET synchronous_commit = off")
+        copy_rows(cursor, "transactions", TRANSACTION_COLUMNS, transactions)
+        copy_rows(cursor, "transaction_items", ITEM_COLUMNS, items)
+        conn.commit()
+    finally:
+        conn.close()
+    return n_transactions, n_items
+
+
+def reset(cursor) -> None:
+    cursor.execute("TRUNCATE transaction_items, transactions")
+    cursor.execute("DELETE FROM products WHERE sku LIKE %s", (f"{SEED_SKU_PREFIX}%",))
+    cursor.execute("DELETE FROM users WHERE username LIKE %s", (f"%{SEED_USERNAME_SUFFIX}",))
+
+
+def seed(
+    products: int,
+    staff: int,
+    days: int,
+    per_day: float,
+    seed_value: int = 42,
+    workers: int = 4,
+    chunk_days: int = 7,
+    end_date: Optional[date] = None,
+    reset_first: bool = False,
+) -> Tuple[int, int]:
+    end_date = end_date or datetime.utcnow().date()
+    start = end_date - timedelta(days=days - 1)
+    rng = random.Random(seed_value)
+    created_at = datetime(start.year, start.month, start.day)
+    product_rows = build_products(rng, products, created_at)
+    staff_rows = build_staff(rng, staff, get_password_hash(STAFF_PASSWORD), created_at)
+
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        if reset_first:
+            reset(cursor)
+        cursor.execute("SELECT count(*) FROM products WHERE sku LIKE %s", (f"{SEED_SKU_PREFIX}%",))
+        if cursor.fetchone()[0]:
+            raise SystemExit("Seed data already present; rerun with --reset to replace it")
+        copy_rows(cursor, "products", PRODUCT_COLUMNS, _as_copy_text(product_rows))
+        copy_rows(cursor, "users", USER_COLUMNS, _as_copy_text(staff_rows))
+        conn.commit()
+    finally:
+        conn.close()
+    logger.info("Loaded %d products and %d staff", len(product_rows), len(staff_rows))
+
+    catalogue = [(row[0], row[3], row[2]) for row in product_rows]
+    staff_ids = [row[0] for row in staff_rows]
+    all_days = [start + timedelta(days=i) for i in range(days)]
+    chunks = [all_days[i:i + chunk_days] for i in range(0, days, chunk_days)]
+
+    began = time.perf_counter()
+    n_transactions = n_items = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(catalogue, staff_ids)) as pool:
+        futures = [
+            pool.submit(load_chunk, seed_value, index, chunk, start, days, per_day)
+            for index, chunk in enumerate(chunks)
+        ]
+        for done, future in enumerate(futures, 1):
+            t, i = future.result()
+            n_transactions += t
+            n_items += i
+            if done % 10 == 0 or done == len(futures):
+                elapsed = time.perf_counter() - began
+                logger.info(
+                    "%d/%d chunks: %d transactions, %d items (%.0f items/s)",
+                    done, len(futures), n_transactions, n_items, n_items / elapsed if elapsed else 0,
+                )
+
+    conn = _connect()
+    try:
+        conn.autocommit = True
+        conn.cursor().execute("ANALYZE products, users, transactions, transaction_items")
+    finally:
+        conn.close()
+    return n_transactions, n_items
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--staff", type=int, default=20)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--per-day", type=float, default=500, help="average sales per day before seasonality")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-days", type=int, default=7, help="days per COPY chunk (part of the dataset identity)")
+    parser.add_argument("--end-date", type=date.fromisoformat, help="last day of history (default: today, UTC)")
+    parser.add_argument("--reset", action="store_true", help="truncate sales and drop earlier seed rows first")
+    args = parser.parse_args()
+
+    began = time.perf_counter()
+    n_transactions, n_items = seed(
+        args.products, args.staff, args.days, args.per_day, args.seed, args.workers,
+        args.chunk_days, args.end_date, args.reset,
+    )
+    logger.info(
+        "Seeded %d transactions / %d items in %.1fs", n_transactions, n_items, time.perf_counter() - began
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
+from uuid import UUID
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy import and_, case, func, true
+from typing import Dict, Iterable, List, Optional
+from app.core import tracing
 from app.models.transaction import Transaction, TransactionItem, SaleType
 from app.models.product import Product
 from app.models.user import User
+from app.services.archive_service import ArchiveService
+from app.services.hot_window import hot_window
+from app.services.snapshot_service import SnapshotService
 from app.schemas.analytics import (
     SalesMetrics,
     DailySalesMetrics,
@@ -17,29 +22,108 @@ from app.schemas.analytics import (
     RevenueBreakdown,
     TopProduct,
     DashboardAnalytics,
+    MetricChange,
+    SalesMetricsComparison,
+    ProductSalesChange,
+    ProductSalesComparison,
+    EmployeeSalesChange,
+    EmployeeSalesComparison,
 )
 
+def _period(start_date: datetime, end_date: datetime) -> str:
+    return f"{start_date.date()} to {end_date.date()}"
+
+def _change(current: float, previous: float) -> MetricChange:
+    return MetricChange(
+        absolute=current - previous,
+        percent=(current - previous) / previous * 100 if previous else None,
+    )
+
+def _in_depot(column, depot_id: Optional[UUID]):
+    """Filter on a depot_id column; None means every depot."""
+    return column == depot_id if depot_id is not None else true()
+
+def _names(
+    db: Session, id_column, name_column, ids: Iterable[UUID], known: Optional[Dict[UUID, str]] = None,
+) -> Dict[UUID, str]:
+    """Names for rows that only turned up in sales read outside the live tables (``known`` ones aside)."""
+    names = {}
+    missing = []
+    for row_id in ids:
+        if known and row_id in known:
+            names[row_id] = known[row_id]
+        else:
+            missing.append(row_id)
+    if missing:
+        names.update(db.query(id_column, name_column).filter(id_column.in_(missing)).all())
+    return names
+
+def _split_history(db: Session, start_date: Optional[datetime], end_date: Optional[datetime], depot_id: Optional[UUID]):
+    """
+    Recent ranges are answered from the worker's in-memory window, with no
+    live filter (None: skip the SQL). Long ranges the Parquet snapshot covers
+    go to DuckDB, up to the snapshot horizon; otherwise the range is split
+    between the archive and the live rows.
+    """
+    return (
+        hot_window.split(db, start_date, end_date, depot_id)
+        or SnapshotService.split(db, start_date, end_date, depot_id)
+        or ArchiveService.split(db, start_date, end_date, depot_id)
+    )
+
+def _compare_window(start_date: Optional[datetime], end_date: Optional[datetime]):
+    """
+    The current period, the previous one of the same length, and a filter
+    selecting rows of the current one. Compare queries scan both periods at
+    once (``created_at`` from ``previous_start`` to ``end_date``) and split
+    each aggregate with ``FILTER (WHERE ...)`` on the returned condition.
+    """
+    if not end_date:
+        end_date = datetime.utcnow()
+    if not start_date:
+        start_date = end_date - timedelta(days=30)
+    previous_start = start_date - (end_date - start_date)
+    window = and_(Transaction.created_at >= previous_start, Transaction.created_at <= end_date)
+    current = Transaction.created_at >= start_date
+    return start_date, end_date, previous_start, window, current
+
 class AnalyticsService:
     @staticmethod
-    def get_sales_metrics(db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> SalesMetrics:
+    @tracing.traced("AnalyticsService.get_sales_metrics")
+    def get_sales_metrics(
+        db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+        depot_id: Optional[UUID] = None,
+    ) -> SalesMetrics:
         """Get overall sales metrics for a period"""
         if not start_date:
             start_date = datetime.utcnow() - timedelta(days=30)
         if not end_date:
             end_date = datetime.utcnow()
 
+        live, earlier = _split_history(db, start_date, end_date, depot_id)
         query = db.query(Transaction).filter(
             Transaction.created_at >= start_date,
-            Transaction.created_at <= end_date
+            Transaction.created_at <= end_date,
+            _in_depot(Transaction.depot_id, depot_id),
+            live,
         )
 
         wholesale = query.filter(Transaction.sale_type == SaleType.WHOLESALE)
         retail = query.filter(Transaction.sale_type == SaleType.RETAIL)
 
-        total_sales = query.with_entities(func.sum(Transaction.total_amount)).scalar() or 0.0
-        total_transactions = query.count()
-        wholesale_sales = wholesale.with_entities(func.sum(Transaction.total_amount)).scalar() or 0.0
-        retail_sales = retail.with_entities(func.sum(Transaction.total_amount)).scalar() or 0.0
+        if live is None:
+            total_sales, total_transactions, wholesale_sales, retail_sales = 0.0, 0, 0.0, 0.0
+        else:
+            total_sales = query.with_entities(func.sum(Transaction.total_amount)).scalar() or 0.0
+            total_transactions = query.count()
+            wholesale_sales = wholesale.with_entities(func.sum(Transaction.total_amount)).scalar() or 0.0
+            retail_sales = retail.with_entities(func.sum(Transaction.total_amount)).scalar() or 0.0
+        if earlier is not None:
+            earlier_sales, earlier_count, earlier_wholesale, earlier_retail = earlier.totals()
+            total_sales = float(total_sales) + earlier_sales
+            total_transactions += earlier_count
+            wholesale_sales = float(wholesale_sales) + earlier_wholesale
+            retail_sales = float(retail_sales) + earlier_retail
 
         return SalesMetrics(
             total_sales=float(total_sales),
@@ -50,52 +134,68 @@ class AnalyticsService:
         )
 
     @staticmethod
-    def get_daily_sales(db: Session, days: int = 30) -> List[DailySalesMetrics]:
+    @tracing.traced("AnalyticsService.get_daily_sales")
+    def get_daily_sales(db: Session, days: int = 30, depot_id: Optional[UUID] = None) -> List[DailySalesMetrics]:
         """Get daily sales metrics for the last N days"""
         start_date = datetime.utcnow() - timedelta(days=days)
-        
-        daily_sales = db.query(
+        live, earlier = hot_window.split(db, start_date, None, depot_id) or ArchiveService.split(
+            db, start_date, None, depot_id
+        )
+
+        daily_sales = [] if live is None else db.query(
             func.date(Transaction.created_at).label('date'),
             func.sum(Transaction.total_amount).label('total_sales'),
             func.count(Transaction.id).label('transaction_count')
         ).filter(
-            Transaction.created_at >= start_date
+            Transaction.created_at >= start_date,
+            _in_depot(Transaction.depot_id, depot_id),
+            live,
         ).group_by(
             func.date(Transaction.created_at)
         ).order_by(
             func.date(Transaction.created_at)
         ).all()
 
+        figures = {day.date: (float(day.total_sales or 0), day.transaction_count or 0) for day in daily_sales}
+        if earlier is not None:
+            for day, (total, count) in earlier.daily().items():
+                live_total, live_count = figures.get(day, (0.0, 0))
+                figures[day] = (live_total + total, live_count + count)
+
         return [
-            DailySalesMetrics(
-                date=day.date,
-                total_sales=float(day.total_sales or 0),
-                transaction_count=day.transaction_count or 0
-            )
-            for day in daily_sales
+            DailySalesMetrics(date=day, total_sales=total, transaction_count=count)
+            for day, (total, count) in sorted(figures.items())
         ]
 
     @staticmethod
-    def get_product_sales(db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> ProductSalesResponse:
+    @tracing.traced("AnalyticsService.get_product_sales")
+    def get_product_sales(
+        db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+        depot_id: Optional[UUID] = None,
+    ) -> ProductSalesResponse:
         """Get product sales analytics"""
         if not start_date:
             start_date = datetime.utcnow() - timedelta(days=30)
         if not end_date:
             end_date = datetime.utcnow()
 
-        product_stats = db.query(
+        live, earlier = _split_history(db, start_date, end_date, depot_id)
+        product_stats = [] if live is None else db.query(
             Product.id,
             Product.name,
             func.sum(TransactionItem.quantity).label('quantity_sold'),
             func.sum(TransactionItem.quantity * TransactionItem.price_at_sale).label('total_revenue'),
-            func.avg(TransactionItem.price_at_sale).label('average_price')
+            func.avg(TransactionItem.price_at_sale).label('average_price'),
+            func.count(TransactionItem.id).label('item_count'),
         ).join(
             TransactionItem, Product.id == TransactionItem.product_id
         ).join(
             Transaction, TransactionItem.transaction_id == Transaction.id
         ).filter(
             Transaction.created_at >= start_date,
-            Transaction.created_at <= end_date
+            Transaction.created_at <= end_date,
+            _in_depot(Transaction.depot_id, depot_id),
+            live,
         ).group_by(
             Product.id, Product.name
         ).order_by(
@@ -112,6 +212,24 @@ class AnalyticsService:
             )
             for stat in product_stats
         ]
+        if earlier is not None:
+            # Fold in the earlier items: sums add up, the average price is re-weighted by item count
+            by_id = {stat.id: (sale, stat.item_count) for sale, stat in zip(sales, product_stats)}
+            earlier_products = earlier.by_product()
+            names = _names(db, Product.id, Product.name, earlier_products.keys() - by_id.keys(),
+                           getattr(earlier, "product_names", None))
+            for product_id, (quantity, revenue, price_sum, items) in earlier_products.items():
+                sale, live_items = by_id.get(product_id, (None, 0))
+                if sale is None:
+                    sale = ProductSales(
+                        product_id=str(product_id), product_name=names.get(product_id, ""),
+                        quantity_sold=0, total_revenue=0.0, average_price=0.0,
+                    )
+                    sales.append(sale)
+                sale.average_price = (sale.average_price * live_items + price_sum) / (live_items + items)
+                sale.quantity_sold += int(quantity)
+                sale.total_revenue += revenue
+            sales.sort(key=lambda sale: sale.total_revenue, reverse=True)
 
         total_quantity = sum(s.quantity_sold for s in sales)
         total_revenue = sum(s.total_revenue for s in sales)
@@ -124,26 +242,31 @@ class AnalyticsService:
         )
 
     @staticmethod
-    def get_employee_sales(db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> EmployeeSalesResponse:
+    @tracing.traced("AnalyticsService.get_employee_sales")
+    def get_employee_sales(
+        db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+        depot_id: Optional[UUID] = None,
+    ) -> EmployeeSalesResponse:
         """Get sales metrics by employee"""
         if not start_date:
             start_date = datetime.utcnow() - timedelta(days=30)
         if not end_date:
             end_date = datetime.utcnow()
+        live, earlier = _split_history(db, start_date, end_date, depot_id)
 
-        employee_stats = db.query(
+        employee_stats = [] if live is None else db.query(
             User.id,
             User.username,
             func.sum(Transaction.total_amount).label('total_sales'),
             func.count(Transaction.id).label('transaction_count'),
             func.sum(
-                func.case(
+                case(
                     (Transaction.sale_type == SaleType.WHOLESALE, Transaction.total_amount),
                     else_=0
                 )
             ).label('wholesale_sales'),
             func.sum(
-                func.case(
+                case(
                     (Transaction.sale_type == SaleType.RETAIL, Transaction.total_amount),
                     else_=0
                 )
@@ -152,7 +275,9 @@ class AnalyticsService:
             Transaction, User.id == Transaction.user_id
         ).filter(
             Transaction.created_at >= start_date,
-            Transaction.created_at <= end_date
+            Transaction.created_at <= end_date,
+            _in_depot(Transaction.depot_id, depot_id),
+            live,
         ).group_by(
             User.id, User.username
         ).order_by(
@@ -171,6 +296,25 @@ class AnalyticsService:
             )
             for stat in employee_stats
         ]
+        if earlier is not None:
+            by_id = {employee.user_id: employee for employee in employees}
+            earlier_users = earlier.by_user()
+            names = _names(db, User.id, User.username, (u for u in earlier_users if str(u) not in by_id),
+                           getattr(earlier, "usernames", None))
+            for user_id, (total, count, wholesale_sales, retail_sales) in earlier_users.items():
+                employee = by_id.get(str(user_id))
+                if employee is None:
+                    employee = EmployeeSalesMetrics(
+                        user_id=str(user_id), username=names.get(user_id, ""), total_sales=0.0,
+                        transaction_count=0, average_transaction_value=0.0, wholesale_sales=0.0, retail_sales=0.0,
+                    )
+                    employees.append(employee)
+                employee.total_sales += total
+                employee.transaction_count += int(count)
+                employee.wholesale_sales += wholesale_sales
+                employee.retail_sales += retail_sales
+                employee.average_transaction_value = employee.total_sales / (employee.transaction_count or 1)
+            employees.sort(key=lambda employee: employee.total_sales, reverse=True)
 
         return EmployeeSalesResponse(
             period=f"{start_date.date()} to {end_date.date()}",
@@ -178,17 +322,210 @@ class AnalyticsService:
         )
 
     @staticmethod
-    def get_inventory_analytics(db: Session) -> InventoryAnalytics:
+    @tracing.traced("AnalyticsService.compare_sales_metrics")
+    def compare_sales_metrics(
+        db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+        depot_id: Optional[UUID] = None,
+    ) -> SalesMetricsComparison:
+        """Sales metrics for a period and the one before it, in one scan"""
+        start_date, end_date, previous_start, window, current = _compare_window(start_date, end_date)
+        live, archived = ArchiveService.split(db, previous_start, end_date, depot_id)
+        previous = ~current
+        wholesale = Transaction.sale_type == SaleType.WHOLESALE
+        retail = Transaction.sale_type == SaleType.RETAIL
+        row = db.query(
+            func.sum(Transaction.total_amount).filter(current).label("total"),
+            func.count(Transaction.id).filter(current).label("count"),
+            func.sum(Transaction.total_amount).filter(current, wholesale).label("wholesale"),
+            func.sum(Transaction.total_amount).filter(current, retail).label("retail"),
+            func.sum(Transaction.total_amount).filter(previous).label("previous_total"),
+            func.count(Transaction.id).filter(previous).label("previous_count"),
+            func.sum(Transaction.total_amount).filter(previous, wholesale).label("previous_wholesale"),
+            func.sum(Transaction.total_amount).filter(previous, retail).label("previous_retail"),
+        ).filter(window, _in_depot(Transaction.depot_id, depot_id), live).one()
+
+        def metrics(total, count, wholesale_sales, retail_sales, archived_part) -> SalesMetrics:
+            total = float(total or 0)
+            wholesale_sales = float(wholesale_sales or 0)
+            retail_sales = float(retail_sales or 0)
+            if archived_part is not None:
+                archived_total, archived_count, archived_wholesale, archived_retail = archived_part.totals()
+                total += archived_total
+                count += archived_count
+                wholesale_sales += archived_wholesale
+                retail_sales += archived_retail
+            return SalesMetrics(
+                total_sales=total,
+                total_transactions=count,
+                average_transaction_value=total / count if count else 0.0,
+                wholesale_sales=wholesale_sales,
+                retail_sales=retail_sales,
+            )
+
+        this_period = metrics(
+            row.total, row.count, row.wholesale, row.retail,
+            archived.since(start_date) if archived is not None else None,
+        )
+        last_period = metrics(
+            row.previous_total, row.previous_count, row.previous_wholesale, row.previous_retail,
+            archived.before(start_date) if archived is not None else None,
+        )
+        return SalesMetricsComparison(
+            current_period=_period(start_date, end_date),
+            previous_period=_period(previous_start, start_date),
+            current=this_period,
+            previous=last_period,
+            changes={
+                field: _change(getattr(this_period, field), getattr(last_period, field))
+                for field in SalesMetrics.model_fields
+            },
+        )
+
+    @staticmethod
+    @tracing.traced("AnalyticsService.compare_product_sales")
+    def compare_product_sales(
+        db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+        depot_id: Optional[UUID] = None,
+    ) -> ProductSalesComparison:
+        """Per-product sales for a period and the one before it, in one scan"""
+        start_date, end_date, previous_start, window, current = _compare_window(start_date, end_date)
+        live, archived = ArchiveService.split(db, previous_start, end_date, depot_id)
+        revenue = TransactionItem.quantity * TransactionItem.price_at_sale
+        current_revenue = func.coalesce(func.sum(revenue).filter(current), 0)
+        product_stats = db.query(
+            Product.id,
+            Product.name,
+            func.coalesce(func.sum(TransactionItem.quantity).filter(current), 0).label("quantity_sold"),
+            func.coalesce(func.sum(TransactionItem.quantity).filter(~current), 0).label("previous_quantity_sold"),
+            current_revenue.label("total_revenue"),
+            func.coalesce(func.sum(revenue).filter(~current), 0).label("previous_total_revenue"),
+        ).join(
+            TransactionItem, Product.id == TransactionItem.product_id
+        ).join(
+            Transaction, TransactionItem.transaction_id == Transaction.id
+        ).filter(
+            window, _in_depot(Transaction.depot_id, depot_id), live
+        ).group_by(
+            Product.id, Product.name
+        ).order_by(
+            current_revenue.desc()
+        ).all()
+
+        # product id -> [name, quantity, previous quantity, revenue, previous revenue]
+        figures = {
+            stat.id: [stat.name, stat.quantity_sold, stat.previous_quantity_sold,
+                      float(stat.total_revenue), float(stat.previous_total_revenue)]
+            for stat in product_stats
+        }
+        if archived is not None:
+            this_period = archived.since(start_date).by_product()
+            last_period = archived.before(start_date).by_product()
+            names = _names(db, Product.id, Product.name, (this_period.keys() | last_period.keys()) - figures.keys())
+            for offset, period in ((0, this_period), (1, last_period)):
+                for product_id, (quantity, revenue, _, _) in period.items():
+                    figure = figures.setdefault(product_id, [names.get(product_id, ""), 0, 0, 0.0, 0.0])
+                    figure[1 + offset] += int(quantity)
+                    figure[3 + offset] += revenue
+        products = sorted((
+            ProductSalesChange(
+                product_id=str(product_id),
+                product_name=name,
+                quantity_sold=quantity,
+                previous_quantity_sold=previous_quantity,
+                total_revenue=revenue,
+                previous_total_revenue=previous_revenue,
+                quantity_change=_change(quantity, previous_quantity),
+                revenue_change=_change(revenue, previous_revenue),
+            )
+            for product_id, (name, quantity, previous_quantity, revenue, previous_revenue) in figures.items()
+        ), key=lambda product: product.total_revenue, reverse=True)
+        total_revenue = sum(p.total_revenue for p in products)
+        previous_total_revenue = sum(p.previous_total_revenue for p in products)
+        return ProductSalesComparison(
+            current_period=_period(start_date, end_date),
+            previous_period=_period(previous_start, start_date),
+            products=products,
+            total_revenue=total_revenue,
+            previous_total_revenue=previous_total_revenue,
+            revenue_change=_change(total_revenue, previous_total_revenue),
+        )
+
+    @staticmethod
+    @tracing.traced("AnalyticsService.compare_employee_sales")
+    def compare_employee_sales(
+        db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+        depot_id: Optional[UUID] = None,
+    ) -> EmployeeSalesComparison:
+        """Per-employee sales for a period and the one before it, in one scan"""
+        start_date, end_date, previous_start, window, current = _compare_window(start_date, end_date)
+        live, archived = ArchiveService.split(db, previous_start, end_date, depot_id)
+        current_sales = func.coalesce(func.sum(Transaction.total_amount).filter(current), 0)
+        employee_stats = db.query(
+            User.id,
+            User.username,
+            current_sales.label("total_sales"),
+            func.coalesce(func.sum(Transaction.total_amount).filter(~current), 0).label("previous_total_sales"),
+            func.count(Transaction.id).filter(current).label("transaction_count"),
+            func.count(Transaction.id).filter(~current).label("previous_transaction_count"),
+        ).join(
+            Transaction, User.id == Transaction.user_id
+        ).filter(
+            window, _in_depot(Transaction.depot_id, depot_id), live
+        ).group_by(
+            User.id, User.username
+        ).order_by(
+            current_sales.desc()
+        ).all()
+
+        # user id -> [username, sales, previous sales, count, previous count]
+        figures = {
+            stat.id: [stat.username, float(stat.total_sales), float(stat.previous_total_sales),
+                      stat.transaction_count, stat.previous_transaction_count]
+            for stat in employee_stats
+        }
+        if archived is not None:
+            this_period = archived.since(start_date).by_user()
+            last_period = archived.before(start_date).by_user()
+            names = _names(db, User.id, User.username, (this_period.keys() | last_period.keys()) - figures.keys())
+            for offset, period in ((0, this_period), (1, last_period)):
+                for user_id, (total, count, _, _) in period.items():
+                    figure = figures.setdefault(user_id, [names.get(user_id, ""), 0.0, 0.0, 0, 0])
+                    figure[1 + offset] += total
+                    figure[3 + offset] += int(count)
+
+        return EmployeeSalesComparison(
+            current_period=_period(start_date, end_date),
+            previous_period=_period(previous_start, start_date),
+            employees=sorted((
+                EmployeeSalesChange(
+                    user_id=str(user_id),
+                    username=username,
+                    total_sales=sales,
+                    previous_total_sales=previous_sales,
+                    transaction_count=count,
+                    previous_transaction_count=previous_count,
+                    sales_change=_change(sales, previous_sales),
+                    transaction_count_change=_change(count, previous_count),
+                )
+                for user_id, (username, sales, previous_sales, count, previous_count) in figures.items()
+            ), key=lambda employee: employee.total_sales, reverse=True),
+        )
+
+    @staticmethod
+    @tracing.traced("AnalyticsService.get_inventory_analytics")
+    def get_inventory_analytics(db: Session, depot_id: Optional[UUID] = None) -> InventoryAnalytics:
         """Get inventory status and low stock alerts"""
-        products = db.query(Product).filter(Product.is_active == True).all()
+        products = db.query(Product).options(undefer(Product.current_stock)).filter(
+            _in_depot(Product.depot_id, depot_id), Product.is_active == True
+        ).all()
 
         inventory_items = [
             InventoryStatus(
                 product_id=str(p.id),
                 product_name=getattr(p, "name", ""),
-                current_stock=getattr(p, "stock_quantity", 0),
+                current_stock=getattr(p, "current_stock", 0),
                 low_stock_threshold=getattr(p, "low_stock_threshold", 0),
-                is_low_stock=(getattr(p, "stock_quantity", 0) <= getattr(p, "low_stock_threshold", 0)),
+                is_low_stock=(getattr(p, "current_stock", 0) <= getattr(p, "low_stock_threshold", 0)),
                 wholesale_price=getattr(p, "wholesale_price", 0.0),
                 retail_price=getattr(p, "retail_price", 0.0),
             )
@@ -206,30 +543,47 @@ class AnalyticsService:
         )
 
     @staticmethod
-    def get_dashboard_analytics(db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> DashboardAnalytics:
+    @tracing.traced("AnalyticsService.get_dashboard_analytics")
+    def get_dashboard_analytics(
+        db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+        depot_id: Optional[UUID] = None,
+    ) -> DashboardAnalytics:
         """Get comprehensive dashboard analytics"""
         if not start_date:
             start_date = datetime.utcnow() - timedelta(days=30)
         if not end_date:
             end_date = datetime.utcnow()
 
+        live, earlier = _split_history(db, start_date, end_date, depot_id)
         query = db.query(Transaction).filter(
             Transaction.created_at >= start_date,
-            Transaction.created_at <= end_date
+            Transaction.created_at <= end_date,
+            _in_depot(Transaction.depot_id, depot_id),
+            live,
         )
 
-        total_transactions = query.count()
-        total_revenue = query.with_entities(func.sum(Transaction.total_amount)).scalar() or 0.0
+        if live is None:
+            total_transactions, total_revenue, wholesale_revenue, retail_revenue = 0, 0.0, 0.0, 0.0
+        else:
+            total_transactions = query.count()
+            total_revenue = query.with_entities(func.sum(Transaction.total_amount)).scalar() or 0.0
+
+            wholesale_revenue = query.filter(
+                Transaction.sale_type == SaleType.WHOLESALE
+            ).with_entities(func.sum(Transaction.total_amount)).scalar() or 0.0
+
+            retail_revenue = query.filter(
+                Transaction.sale_type == SaleType.RETAIL
+            ).with_entities(func.sum(Transaction.total_amount)).scalar() or 0.0
+
+        if earlier is not None:
+            earlier_revenue, earlier_count, earlier_wholesale, earlier_retail = earlier.totals()
+            total_transactions += earlier_count
+            total_revenue = float(total_revenue) + earlier_revenue
+            wholesale_revenue = float(wholesale_revenue) + earlier_wholesale
+            retail_revenue = float(retail_revenue) + earlier_retail
         avg_transaction = float(total_revenue) / total_transactions if total_transactions > 0 else 0.0
 
-        wholesale_revenue = query.filter(
-            Transaction.sale_type == SaleType.WHOLESALE
-        ).with_entities(func.sum(Transaction.total_amount)).scalar() or 0.0
-
-        retail_revenue = query.filter(
-            Transaction.sale_type == SaleType.RETAIL
-        ).with_entities(func.sum(Transaction.total_amount)).scalar() or 0.0
-
         if total_revenue > 0:
             wholesale_pct = (float(wholesale_revenue) / float(total_revenue)) * 100
             retail_pct = (float(retail_revenue) / float(total_revenue)) * 100
@@ -237,7 +591,7 @@ class AnalyticsService:
             wholesale_pct = 0.0
             retail_pct = 0.0
 
-        top_products_data = db.query(
+        top_products_query = db.query(
             Product.id,
             Product.name,
             func.sum(TransactionItem.quantity).label('quantity_sold'),
@@ -248,12 +602,19 @@ class AnalyticsService:
             Transaction, TransactionItem.transaction_id == Transaction.id
         ).filter(
             Transaction.created_at >= start_date,
-            Transaction.created_at <= end_date
+            Transaction.created_at <= end_date,
+            _in_depot(Transaction.depot_id, depot_id),
+            live,
         ).group_by(
             Product.id, Product.name
         ).order_by(
             func.sum(TransactionItem.quantity * TransactionItem.price_at_sale).desc()
-        ).limit(5).all()
+        )
+        # With earlier sales in range the top five are only known after merging
+        if live is None:
+            top_products_data = []
+        else:
+            top_products_data = top_products_query.all() if earlier is not None else top_products_query.limit(5).all()
 
         top_products = [
             TopProduct(
@@ -264,18 +625,34 @@ class AnalyticsService:
             )
             for p in top_products_data
         ]
+        if earlier is not None:
+            by_id = {p.id: product for p, product in zip(top_products_data, top_products)}
+            earlier_products = earlier.by_product()
+            names = _names(db, Product.id, Product.name, earlier_products.keys() - by_id.keys(),
+                           getattr(earlier, "product_names", None))
+            for product_id, (quantity, revenue, _, _) in earlier_products.items():
+                product = by_id.get(product_id)
+                if product is None:
+                    product = TopProduct(
+                        product_id=str(product_id), product_name=names.get(product_id, ""), quantity_sold=0, revenue=0.0
+                    )
+                    top_products.append(product)
+                product.quantity_sold += int(quantity)
+                product.revenue += revenue
+            top_products = sorted(top_products, key=lambda product: product.revenue, reverse=True)[:5]
 
         # Get low stock products
-        low_stock_products = db.query(Product).filter(
+        low_stock_products = db.query(Product).options(undefer(Product.current_stock)).filter(
+            _in_depot(Product.depot_id, depot_id),
             Product.is_active == True,
-            Product.stock_quantity <= Product.low_stock_threshold
+            Product.current_stock <= Product.low_stock_threshold
         ).all()
 
         low_stock_list = [
             InventoryStatus(
                 product_id=str(p.id),
                 product_name=getattr(p, "name", ""),
-                current_stock=getattr(p, "stock_quantity", 0),
+                current_stock=getattr(p, "current_stock", 0),
                 low_stock_threshold=getattr(p, "low_stock_threshold", 0),
                 is_low_stock=True,
                 wholesale_price=getattr(p, "wholesale_price", 0.0),
@@ -285,7 +662,7 @@ class AnalyticsService:
         ]
 
         # Get employee count
-        employee_count = db.query(User).filter(User.is_active == True).count()
+        employee_count = db.query(User).filter(_in_depot(User.depot_id, depot_id), User.is_active == True).count()
 
         return DashboardAnalytics(
             date_range_start=start_date,
@@ -0,0 +1,523 @@
+"""
+Cold-data archival for transactions.
+
+Sales from closed months are rarely read again but make up most of
+``transactions`` and ``transaction_items``. The archiver (a periodic job per
+depot placement) moves them out one depot-month at a time, oldest first,
+once a month is ``ARCHIVE_AFTER_MONTHS`` old:
+
+1. archive: the month's transactions and items are written to one
+   compressed columnar file (NumPy ``.npz``, one array per column) on local
+   disk (``ARCHIVE_DIR``) or in the storage bucket, and a manifest row
+   (``transaction_archives``) is committed for it. From then on analytics
+   read the month from the file and only ask the database for rows after
+   the depot's cutoff, the end of its last archived month;
+2. purge: once every worker's cached manifest has caught up (twice
+   ``ARCHIVE_MANIFEST_CACHE_SECONDS`` later), the month's rows are checked
+   against the file and deleted in batches of ``ARCHIVE_DELETE_BATCH``, each
+   its own transaction, so sales never wait behind one long delete.
+
+Analytics call ``ArchiveService.split`` with their range. It returns a
+filter for the live rows and the archived part of the range as an
+``ArchivedSales`` frame, whose figures they add to the query's. Archived
+transactions no longer show up in transaction history or receipt lookups,
+and a rollup ``rebuild`` only recovers live days.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import and_, delete, func, or_, select, true, update
+from sqlalchemy.orm import Session
+
+from app.core import metrics, tracing
+from app.core.config import settings
+from app.models.archive import TransactionArchive
+from app.models.depot import Depot
+from app.models.stock_alert import StockAlert
+from app.models.transaction import SaleType, Transaction, TransactionItem
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMAT = 1
+SALE_TYPES = list(SaleType)
+WHOLESALE = SALE_TYPES.index(SaleType.WHOLESALE)
+RETAIL = SALE_TYPES.index(SaleType.RETAIL)
+
+ManifestEntry = namedtuple("ManifestEntry", "depot_id month month_end key sha256")
+
+
+class ArchiveError(Exception):
+    """An archive file that is missing, corrupt or doesn't match the live rows."""
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _uuids(values: Iterable[UUID]) -> np.ndarray:
+    return np.frombuffer(b"".join(value.bytes for value in values), dtype=np.uint8).reshape(-1, 16)
+
+
+def _group(keys: np.ndarray, *weights: np.ndarray) -> Dict[UUID, Tuple[float, ...]]:
+    """Sums of ``weights`` per distinct 16-byte key."""
+    if not len(keys):
+        return {}
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    sums = [np.bincount(inverse, weights=weight, minlength=len(unique)) for weight in weights]
+    return {
+        UUID(bytes=key.tobytes()): tuple(float(column[position]) for column in sums)
+        for position, key in enumerate(unique)
+    }
+
+
+class ArchivedSales:
+    """
+    Archived transactions and their items, one array per column. Items
+    point at their transaction by position (``items["transaction"]``).
+    """
+
+    def __init__(self, transactions: Dict[str, np.ndarray], items: Dict[str, np.ndarray]) -> None:
+        self.transactions = transactions
+        self.items = items
+
+    def __len__(self) -> int:
+        return len(self.transactions["id"])
+
+    @classmethod
+    def from_rows(cls, transactions: Sequence, items: Sequence) -> "ArchivedSales":
+        """
+        ``transactions``: (id, user_id, created_at, total_amount, sale_type)
+        rows; ``items``: (transaction_id, product_id, quantity, price_at_sale,
+        sale_type) rows of those transactions.
+        """
+        position = {row[0]: index for index, row in enumerate(transactions)}
+        return cls(
+            {
+                "id": _uuids(row[0] for row in transactions),
+                "user_id": _uuids(row[1] for row in transactions),
+                "created_at": np.array([row[2] for row in transactions], dtype="datetime64[us]"),
+                "total_amount": np.array([row[3] for row in transactions], dtype=np.float64),
+                "sale_type": np.array([SALE_TYPES.index(row[4]) for row in transactions], dtype=np.int8),
+            },
+            {
+                "transaction": np.array([position[row[0]] for row in items], dtype=np.int64),
+                "product_id": _uuids(row[1] for row in items),
+                "quantity": np.array([row[2] for row in items], dtype=np.int64),
+                "price_at_sale": np.array([row[3] for row in items], dtype=np.float64),
+                "sale_type": np.array([SALE_TYPES.index(row[4]) for row in items], dtype=np.int8),
+            },
+        )
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            format=np.array(ARCHIVE_FORMAT),
+            sale_types=np.array([sale_type.value for sale_type in SALE_TYPES]),
+            **{f"transactions.{name}": column for name, column in self.transactions.items()},
+            **{f"items.{name}": column for name, column in self.items.items()},
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ArchivedSales":
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            if int(arrays["format"]) != ARCHIVE_FORMAT:
+                raise ArchiveError(f"Unsupported archive format {int(arrays['format'])}")
+            # Sale type codes are positions in the enum as it was when written
+            codes = np.array([SALE_TYPES.index(SaleType(value)) for value in arrays["sale_types"]], dtype=np.int8)
+            columns = {name: arrays[name] for name in arrays.files if "." in name}
+        transactions = {name.split(".", 1)[1]: column for name, column in columns.items() if name.startswith("transactions.")}
+        items = {name.split(".", 1)[1]: column for name, column in columns.items() if name.startswith("items.")}
+        transactions["sale_type"] = codes[transactions["sale_type"]]
+        items["sale_type"] = codes[items["sale_type"]]
+        return cls(transactions, items)
+
+    @classmethod
+    def concat(cls, frames: Sequence["ArchivedSales"]) -> "ArchivedSales":
+        offsets = np.cumsum([0] + [len(frame) for frame in frames[:-1]])
+        transactions = {
+            name: np.concatenate([frame.transactions[name] for frame in frames]) for name in frames[0].transactions
+        }
+        items = {name: np.concatenate([frame.items[name] for frame in frames]) for name in frames[0].items}
+        items["transaction"] = np.concatenate(
+            [frame.items["transaction"] + offset for frame, offset in zip(frames, offsets)]
+        )
+        return cls(transactions, items)
+
+    def _where(self, keep: np.ndarray) -> "ArchivedSales":
+        if keep.all():
+            return self
+        item_keep = keep[self.items["transaction"]]
+        items = {name: column[item_keep] for name, column in self.items.items()}
+        # Renumber the surviving transactions
+        items["transaction"] = (np.cumsum(keep) - 1)[items["transaction"]]
+        return ArchivedSales({name: column[keep] for name, column in self.transactions.items()}, items)
+
+    def since(self, start: Optional[datetime]) -> "ArchivedSales":
+        if start is None:
+            return self
+        return self._where(self.transactions["created_at"] >= np.datetime64(start, "us"))
+
+    def until(self, end: Optional[datetime]) -> "ArchivedSales":
+        if end is None:
+            return self
+        return self._where(self.transactions["created_at"] <= np.datetime64(end, "us"))
+
+    def before(self, moment: datetime) -> "ArchivedSales":
+        return self._where(self.transactions["created_at"] < np.datetime64(moment, "us"))
+
+    def between(self, start: Optional[datetime], end: Optional[datetime]) -> "ArchivedSales":
+        return self.since(start).until(end)
+
+    def _by_type(self, code: int) -> np.ndarray:
+        return np.where(self.transactions["sale_type"] == code, self.transactions["total_amount"], 0.0)
+
+    def totals(self) -> Tuple[float, int, float, float]:
+        """Total amount, transaction count, wholesale and retail amounts."""
+        return (
+            float(self.transactions["total_amount"].sum()),
+            len(self),
+            float(self._by_type(WHOLESALE).sum()),
+            float(self._by_type(RETAIL).sum()),
+        )
+
+    def daily(self) -> Dict[date, Tuple[float, int]]:
+        """Total amount and transaction count per day."""
+        days, inverse = np.unique(self.transactions["created_at"].astype("datetime64[D]"), return_inverse=True)
+        inverse = inverse.ravel()
+        totals = np.bincount(inverse, weights=self.transactions["total_amount"], minlength=len(days))
+        counts = np.bincount(inverse, minlength=len(days))
+        return {day.item(): (float(total), int(count)) for day, total, count in zip(days, totals, counts)}
+
+    def by_product(self) -> Dict[UUID, Tuple[float, ...]]:
+        """Quantity, revenue, sum of unit prices and item count per product."""
+        quantity = self.items["quantity"].astype(np.float64)
+        price = self.items["price_at_sale"]
+        return _group(self.items["product_id"], quantity, quantity * price, price, np.ones(len(price)))
+
+    def by_user(self) -> Dict[UUID, Tuple[float, ...]]:
+        """Total amount, transaction count, wholesale and retail amounts per cashier."""
+        amount = self.transactions["total_amount"]
+        return _group(
+            self.transactions["user_id"], amount, np.ones(len(amount)), self._by_type(WHOLESALE), self._by_type(RETAIL)
+        )
+
+
+class LocalArchiveStore:
+    """Archive files under a local directory."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def write(self, key: str, data: bytes) -> None:
+        path = os.path.join(self.directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Never leave a half-written file under the final name
+        partial = f"{path}.partial"
+        with open(partial, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(partial, path)
+
+    def read(self, key: str) -> bytes:
+        with open(os.path.join(self.directory, key), "rb") as f:
+            return f.read()
+
+
+class BucketArchiveStore:
+    """Archive files in the storage bucket, under ``ARCHIVE_S3_PREFIX`` (not public)."""
+
+    def __init__(self) -> None:
+        from app.services.storage_service import StorageService
+
+        self.storage = StorageService()
+        self.prefix = settings.ARCHIVE_S3_PREFIX
+
+    def write(self, key: str, data: bytes) -> None:
+        self.storage.put_object(self.prefix + key, data)
+
+    def read(self, key: str) -> bytes:
+        return self.storage.get_object(self.prefix + key)
+
+
+def get_archive_store():
+    """Archive store selected by ``ARCHIVE_BACKEND``."""
+    if settings.ARCHIVE_BACKEND == "s3":
+        return BucketArchiveStore()
+    return LocalArchiveStore(settings.ARCHIVE_DIR)
+
+
+# Manifest per database (engine), reloaded after ARCHIVE_MANIFEST_CACHE_SECONDS,
+# and the most recently read archive files
+_cache_lock = threading.Lock()
+_manifests: Dict[object, Tuple[float, List[ManifestEntry]]] = {}
+_frames: "OrderedDict[str, ArchivedSales]" = OrderedDict()
+
+
+class ArchiveService:
+    @staticmethod
+    def archive_closed_months(
+        db: Session, now: Optional[datetime] = None, depot_ids: Optional[Iterable[UUID]] = None
+    ) -> List[TransactionArchive]:
+        """
+        Write every depot's months older than ``ARCHIVE_AFTER_MONTHS`` to
+        archive files, committing a manifest row per file. The rows stay in
+        the hot tables until ``purge_archived``.
+        """
+        now = now or datetime.utcnow()
+        bound = add_months(month_start(now), -settings.ARCHIVE_AFTER_MONTHS)
+        if depot_ids is None:
+            depot_ids = [depot_id for depot_id, in db.query(Depot.id).order_by(Depot.id)]
+        store = get_archive_store()
+        archived = []
+        for depot_id in depot_ids:
+            while True:
+                # One archiver per depot at a time; the lock ends with the commit
+                if not db.execute(select(func.pg_try_advisory_xact_lock(_lock_key(depot_id)))).scalar():
+                    break
+                cutoff = db.query(func.max(TransactionArchive.month_end)).filter(
+                    TransactionArchive.depot_id == depot_id
+                ).scalar()
+                oldest = db.query(func.min(Transaction.created_at)).filter(
+                    Transaction.depot_id == depot_id,
+                    Transaction.created_at >= cutoff if cutoff else true(),
+                    Transaction.created_at < bound,
+                ).scalar()
+                if oldest is None:
+                    db.commit()
+                    break
+                entry = ArchiveService._archive_month(db, store, depot_id, month_start(oldest), now)
+                db.add(entry)
+                db.commit()
+                archived.append(entry)
+        if archived:
+            ArchiveService.clear_caches()
+        return archived
+
+    @staticmethod
+    def _archive_month(db: Session, store, depot_id: UUID, month: datetime, now: datetime) -> TransactionArchive:
+        end = add_months(month, 1)
+        in_month = and_(
+            Transaction.depot_id == depot_id, Transaction.created_at >= month, Transaction.created_at < end
+        )
+        transactions = db.query(
+            Transaction.id, Transaction.user_id, Transaction.created_at, Transaction.total_amount, Transaction.sale_type
+        ).filter(in_month).order_by(Transaction.created_at, Transaction.id).all()
+        items = db.query(
+            TransactionItem.transaction_id,
+            TransactionItem.product_id,
+            TransactionItem.quantity,
+            TransactionItem.price_at_sale,
+            TransactionItem.sale_type,
+        ).join(Transaction, TransactionItem.transaction_id == Transaction.id).filter(in_month).all()
+
+        frame = ArchivedSales.from_rows(transactions, items)
+        data = frame.to_bytes()
+        key = f"transactions/{depot_id}/{month:%Y-%m}.npz"
+        store.write(key, data)
+        metrics.ARCHIVE_TRANSACTIONS.labels("archived").inc(len(frame))
+        logger.info("Archived %d transactions of %s for depot %s to %s", len(frame), f"{month:%Y-%m}", depot_id, key)
+        return TransactionArchive(
+            depot_id=depot_id,
+            month=month.date(),
+            month_end=end,
+            key=key,
+            transaction_count=len(frame),
+            item_count=len(items),
+            total_amount=frame.totals()[0],
+            sha256=hashlib.sha256(data).hexdigest(),
+            created_at=now,
+        )
+
+    @staticmethod
+    def purge_archived(db: Session, now: Optional[datetime] = None) -> int:
+        """
+        Delete the rows of archived months from the hot tables, once every
+        worker reads those months from the archive. Returns how many
+        transactions were deleted.
+        """
+        now = now or datetime.utcnow()
+        settled = now - timedelta(seconds=2 * settings.ARCHIVE_MANIFEST_CACHE_SECONDS)
+        due = db.query(TransactionArchive).filter(
+            TransactionArchive.purged_at.is_(None), TransactionArchive.created_at <= settled
+        ).order_by(TransactionArchive.month).all()
+        store = get_archive_store()
+        purged = 0
+        for entry in due:
+            try:
+                purged += ArchiveService._purge_month(db, store, entry)
+            except ArchiveError:
+                db.rollback()
+                logger.exception("Not purging %s", entry.key)
+        return purged
+
+    @staticmethod
+    def _purge_month(db: Session, store, entry: TransactionArchive) -> int:
+        frame = _read_frame(store, entry.key, entry.sha256)
+        if len(frame) != entry.transaction_count:
+            raise ArchiveError(f"{entry.key} holds {len(frame)} transactions, the manifest {entry.transaction_count}")
+        archived_ids = {row.tobytes() for row in frame.transactions["id"]}
+        month = datetime.combine(entry.month, datetime.min.time())
+        in_month = and_(
+            Transaction.depot_id == entry.depot_id,
+            Transaction.created_at >= month,
+            Transaction.created_at < entry.month_end,
+        )
+        purged = 0
+        while True:
+            ids = [
+                transaction_id for transaction_id, in
+                db.query(Transaction.id).filter(in_month).limit(settings.ARCHIVE_DELETE_BATCH)
+            ]
+            if not ids:
+                break
+            if any(transaction_id.bytes not in archived_ids for transaction_id in ids):
+                raise ArchiveError(f"{entry.key} is missing transactions still in the table")
+            db.execute(
+                update(StockAlert).where(StockAlert.transaction_id.in_(ids)).values(transaction_id=None),
+                execution_options={"synchronize_session": False},
+            )
+            db.execute(
+                delete(TransactionItem).where(TransactionItem.transaction_id.in_(ids)),
+                execution_options={"synchronize_session": False},
+            )
+            db.execute(
+                delete(Transaction).where(Transaction.id.in_(ids)),
+                execution_options={"synchronize_session": False},
+            )
+            db.commit()
+            purged += len(ids)
+            metrics.ARCHIVE_TRANSACTIONS.labels("purged").inc(len(ids))
+        entry.purged_at = datetime.utcnow()
+        db.commit()
+        return purged
+
+    @staticmethod
+    def run(db: Session) -> None:
+        """Periodic job: archive what is due, then purge what has settled."""
+        ArchiveService.archive_closed_months(db)
+        ArchiveService.purge_archived(db)
+
+    @staticmethod
+    @tracing.traced("ArchiveService.split")
+    def split(
+        db: Session, start: Optional[datetime], end: Optional[datetime], depot_id: Optional[UUID] = None
+    ) -> Tuple[object, Optional[ArchivedSales]]:
+        """
+        Split a transaction range (None: unbounded) at the archive cutoffs.
+        Returns a filter selecting the live transactions to combine with the
+        range's own, and the archived transactions in the range (None when
+        the range doesn't reach into the archive).
+        """
+        entries = [
+            entry for entry in _manifest(db) if depot_id is None or entry.depot_id == depot_id
+        ]
+        if not entries:
+            return true(), None
+        cutoffs: Dict[UUID, datetime] = {}
+        for entry in entries:
+            cutoffs[entry.depot_id] = max(entry.month_end, cutoffs.get(entry.depot_id, entry.month_end))
+        if start is not None and start >= max(cutoffs.values()):
+            return true(), None
+
+        if depot_id is not None:
+            live = Transaction.created_at >= cutoffs[depot_id]
+        else:
+            live = or_(
+                Transaction.depot_id.notin_(list(cutoffs)),
+                *(and_(Transaction.depot_id == depot, Transaction.created_at >= cutoff) for depot, cutoff in cutoffs.items()),
+            )
+        wanted = [
+            entry for entry in entries
+            if (start is None or entry.month_end > start) and (end is None or entry.month <= end)
+        ]
+        if not wanted:
+            return live, None
+        store = None
+        frames = []
+        for entry in wanted:
+            frame = _cached_frame(entry.key)
+            if frame is None:
+                store = store or get_archive_store()
+                frame = _read_frame(store, entry.key, entry.sha256)
+                _cache_frame(entry.key, frame)
+            frames.append(frame)
+        return live, ArchivedSales.concat(frames).between(start, end)
+
+    @staticmethod
+    def clear_caches() -> None:
+        """Forget cached manifests and files, e.g. right after archiving."""
+        with _cache_lock:
+            _manifests.clear()
+            _frames.clear()
+
+
+def _lock_key(depot_id: UUID) -> int:
+    return int.from_bytes(hashlib.sha256(b"transaction_archives:" + depot_id.bytes).digest()[:8], "big", signed=True)
+
+
+def _manifest(db: Session) -> List[ManifestEntry]:
+    bind = db.get_bind(TransactionArchive.__mapper__)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _manifests.get(bind)
+    if cached and now - cached[0] < settings.ARCHIVE_MANIFEST_CACHE_SECONDS:
+        metrics.record_cache("archive_manifest", True)
+        return cached[1]
+    metrics.record_cache("archive_manifest", False)
+    entries = [
+        ManifestEntry(depot_id, datetime.combine(month, datetime.min.time()), month_end, key, sha256)
+        for depot_id, month, month_end, key, sha256 in db.query(
+            TransactionArchive.depot_id,
+            TransactionArchive.month,
+            TransactionArchive.month_end,
+            TransactionArchive.key,
+            TransactionArchive.sha256,
+        )
+    ]
+    with _cache_lock:
+        _manifests[bind] = (now, entries)
+    return entries
+
+
+def _read_frame(store, key: str, sha256: str) -> ArchivedSales:
+    try:
+        data = store.read(key)
+    except Exception as exc:
+        raise ArchiveError(f"Can't read archive {key}: {exc!r}") from exc
+    if hashlib.sha256(data).hexdigest() != sha256:
+        raise ArchiveError(f"Archive {key} doesn't match its checksum")
+    return ArchivedSales.from_bytes(data)
+
+
+def _cached_frame(key: str) -> Optional[ArchivedSales]:
+    with _cache_lock:
+        frame = _frames.get(key)
+        if frame is not None:
+            _frames.move_to_end(key)
+    metrics.record_cache("archive_files", frame is not None)
+    return frame
+
+
+def _cache_frame(key: str, frame: ArchivedSales) -> None:
+    with _cache_lock:
+        _frames[key] = frame
+        while len(_frames) > settings.ARCHIVE_CACHE_FILES:
+            _frames.popitem(last=False)
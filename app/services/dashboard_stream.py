@@ -0,0 +1,181 @@
+"""
+Live state behind ``GET /analytics/dashboard/stream``.
+
+Each worker keeps one ``DashboardFeed`` per window length (``days``) and
+depot while anyone is watching it. The feed loads a snapshot with ``AnalyticsService``
+once, then folds every sale announced on ``SALES_CHANNEL`` into its totals
+and per-product figures in memory and fans a pre-rendered SSE delta out to
+its viewers. Another open dashboard costs a queue, not a query.
+
+Deltas only ever add sales, so sales ageing out of the window are not
+subtracted. The feed reloads every ``DASHBOARD_STREAM_RESYNC_SECONDS`` (and
+at once after a sale too large to announce, or after falling behind) and
+sends the result as a new snapshot, which also repairs a sale that committed
+while a snapshot was being read.
+"""
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.broadcast import Subscription, broadcaster, sse
+from app.core.config import settings
+from app.core.serialization import dumps
+from app.db.session import PrimaryAnalyticsSessionLocal
+from app.models.transaction import SaleType
+from app.services.analytics_service import AnalyticsService
+from app.services.sale_service import SALES_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+TOP_PRODUCTS = 5
+LOAD_RETRY_SECONDS = 5.0
+
+
+class DashboardFeed:
+    def __init__(self, days: int, depot_id: Optional[UUID] = None) -> None:
+        self.days = days
+        self.depot_id = depot_id  # None: every depot
+        self.channel = f"dashboard:{days}:{depot_id}"
+        self.viewers = 0
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.state: Dict = {}  # DashboardAnalytics as JSON-ready dict
+        self.products: Dict[str, list] = {}  # product_id -> [name, quantity_sold, revenue]
+        self.as_of = datetime.min
+        self.stale = False
+
+    def _load(self) -> None:
+        end = datetime.utcnow()
+        start = end - timedelta(days=self.days)
+        db = PrimaryAnalyticsSessionLocal()
+        try:
+            dashboard = AnalyticsService.get_dashboard_analytics(db, start, end, self.depot_id)
+            product_sales = AnalyticsService.get_product_sales(db, start, end, self.depot_id)
+        finally:
+            db.close()
+        self.state = dashboard.model_dump(mode="json")
+        self.products = {
+            p.product_id: [p.product_name, p.quantity_sold, p.total_revenue] for p in product_sales.sales
+        }
+        self.state["top_products"] = self._top_products()
+        self.as_of = end
+        self.stale = False
+
+    def _top_products(self) -> List[Dict]:
+        ranked = sorted(self.products.items(), key=lambda entry: entry[1][2], reverse=True)[:TOP_PRODUCTS]
+        return [
+            {"product_id": product_id, "product_name": name, "quantity_sold": quantity, "revenue": revenue}
+            for product_id, (name, quantity, revenue) in ranked
+        ]
+
+    def snapshot_event(self) -> str:
+        return sse(dumps(self.state).decode(), "snapshot")
+
+    def apply(self, sale: Dict) -> Optional[str]:
+        """Fold one announced sale into the state; returns the delta event, if any."""
+        if self.stale:
+            return None
+        if self.depot_id is not None and sale.get("depot_id") != str(self.depot_id):
+            return None
+        created_at = datetime.fromisoformat(sale["created_at"])
+        if created_at <= self.as_of:
+            return None  # already in the snapshot
+        if sale["items"] is None:
+            self.stale = True
+            return None
+
+        state = self.state
+        amount = sale["total_amount"]
+        state["total_revenue"] += amount
+        state["total_transactions"] += 1
+        state["average_transaction_value"] = state["total_revenue"] / state["total_transactions"]
+        breakdown = state["revenue_breakdown"]
+        if sale["sale_type"] == SaleType.WHOLESALE.value:
+            breakdown["wholesale_revenue"] += amount
+        elif sale["sale_type"] == SaleType.RETAIL.value:
+            breakdown["retail_revenue"] += amount
+        breakdown["total_revenue"] = state["total_revenue"]
+        if state["total_revenue"] > 0:
+            breakdown["wholesale_percentage"] = breakdown["wholesale_revenue"] / state["total_revenue"] * 100
+            breakdown["retail_percentage"] = breakdown["retail_revenue"] / state["total_revenue"] * 100
+        state["date_range_end"] = sale["created_at"]
+
+        for product_id, name, quantity, revenue in sale["items"]:
+            figures = self.products.setdefault(product_id, [name, 0, 0.0])
+            figures[1] += quantity
+            figures[2] += revenue
+
+        delta = {
+            "transaction_id": sale["transaction_id"],
+            "sale_type": sale["sale_type"],
+            "amount": amount,
+            "created_at": sale["created_at"],
+            "total_revenue": state["total_revenue"],
+            "total_transactions": state["total_transactions"],
+            "average_transaction_value": state["average_transaction_value"],
+            "revenue_breakdown": breakdown,
+        }
+        top_products = self._top_products()
+        if top_products != state["top_products"]:
+            state["top_products"] = delta["top_products"] = top_products
+        return sse(dumps(delta).decode(), "delta")
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        # Subscribe before loading so no sale falls between snapshot and deltas
+        async with broadcaster.subscribe(SALES_CHANNEL) as sales:
+            while True:
+                try:
+                    await run_in_threadpool(self._load)
+                except Exception:
+                    logger.exception("Dashboard snapshot for %s days failed; retrying", self.days)
+                    await asyncio.sleep(LOAD_RETRY_SECONDS)
+                    continue
+                self.ready.set()
+                broadcaster.publish(self.channel, self.snapshot_event())
+                resync_at = loop.time() + settings.DASHBOARD_STREAM_RESYNC_SECONDS
+                while not self.stale:
+                    remaining = resync_at - loop.time()
+                    message = await sales.get(remaining) if remaining > 0 else None
+                    if message is None:
+                        break
+                    if sales.dropped:
+                        # Missed sales while busy; only a reload can make the totals right again
+                        sales.dropped = 0
+                        self.stale = True
+                    event = self.apply(json.loads(message))
+                    if event is not None:
+                        broadcaster.publish(self.channel, event)
+
+
+_feeds: Dict[Tuple[int, Optional[UUID]], DashboardFeed] = {}
+
+
+@asynccontextmanager
+async def watch(days: int, depot_id: Optional[UUID] = None) -> AsyncIterator[Tuple[DashboardFeed, Subscription]]:
+    """
+    Subscribe to the feed for ``days`` of ``depot_id``, starting it if this is
+    the first viewer. The feed's ``snapshot_event()`` is current as of the subscription;
+    after that the subscription gets every delta (and resync snapshot).
+    """
+    key = (days, depot_id)
+    feed = _feeds.get(key)
+    if feed is None:
+        feed = _feeds[key] = DashboardFeed(days, depot_id)
+        feed.task = asyncio.create_task(feed.run())
+    feed.viewers += 1
+    try:
+        await feed.ready.wait()
+        async with broadcaster.subscribe(feed.channel, local=True) as subscription:
+            yield feed, subscription
+    finally:
+        feed.viewers -= 1
+        if feed.viewers == 0:
+            feed.task.cancel()
+            del _feeds[key]
@@ -0,0 +1,169 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.core import metrics, tracing
+from app.core.config import settings
+from app.models.product import Product
+from app.models.stock_hold import StockHold
+from app.models.user import User
+from app.schemas.transaction import StockHoldItem
+from app.services.inventory_service import parse_product_id
+
+# Each product's hold total lives on products.reserved_quantity, so checking
+# availability is one conditional UPDATE rather than a SUM over stock_holds.
+# Lock order is always hold rows first, then products in id order, in every
+# path (holds, checkout, sweep), so they can't deadlock with each other.
+# Checkout locks all of its products (bought or held) in one statement
+# before it touches reserved_quantity; sweeps skip hold rows that are
+# already locked, so they never wait on them.
+_RESERVE = (
+    update(Product)
+    .where(
+        Product.id == bindparam("product_id"),
+        Product.depot_id == bindparam("depot"),
+        Product.is_active == True,
+        Product.current_stock - Product.reserved_quantity >= bindparam("quantity"),
+    )
+    .values(reserved_quantity=Product.reserved_quantity + bindparam("quantity"))
+    .returning(Product.id)
+    .execution_options(synchronize_session=False)
+)
+_RELEASE = (
+    update(Product)
+    .where(Product.id == bindparam("product_id"))
+    .values(reserved_quantity=Product.reserved_quantity - bindparam("quantity"))
+    .execution_options(synchronize_session=False)
+)
+
+def _release(db: Session, released: List[Tuple[uuid.UUID, int]]) -> Dict[uuid.UUID, int]:
+    totals: Dict[uuid.UUID, int] = {}
+    for product_id, quantity in released:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    if totals:
+        db.connection().execute(
+            _RELEASE, [{"product_id": pid, "quantity": totals[pid]} for pid in sorted(totals)]
+        )
+    return totals
+
+class HoldService:
+    @staticmethod
+    @tracing.traced("HoldService.place_holds")
+    def place_holds(
+        db: Session, user: User, items: List[StockHoldItem], cart_id: Optional[uuid.UUID] = None
+    ) -> Tuple[uuid.UUID, datetime, List]:
+        """
+        Reserve ``items`` for ``cart_id`` (a new cart when None) and push the
+        whole cart's expiry out by STOCK_HOLD_TTL_SECONDS. Fails with 409 if a
+        product doesn't have enough unreserved stock.
+        """
+        quantities: Dict[uuid.UUID, int] = {}
+        for item in items:
+            product_id = parse_product_id(item.product_id)
+            quantities[product_id] = quantities.get(product_id, 0) + item.quantity
+        expires_at = datetime.utcnow() + timedelta(seconds=settings.STOCK_HOLD_TTL_SECONDS)
+
+        if cart_id is None:
+            cart_id = uuid.uuid4()
+        else:
+            owner = db.query(StockHold.user_id).filter(StockHold.cart_id == cart_id).first()
+            if owner is not None and owner.user_id != user.id:
+                raise HTTPException(status_code=404, detail=f"Cart {cart_id} not found")
+            # Extend the cart first: hold rows are locked before product rows
+            db.execute(
+                update(StockHold).where(StockHold.cart_id == cart_id).values(expires_at=expires_at),
+                execution_options={"synchronize_session": False},
+            )
+
+        for product_id in sorted(quantities):
+            HoldService._reserve(db, product_id, quantities[product_id], user.depot_id)
+
+        upsert = insert(StockHold).values([
+            {"id": uuid.uuid4(), "cart_id": cart_id, "product_id": product_id, "user_id": user.id,
+             "quantity": quantity, "expires_at": expires_at, "created_at": datetime.utcnow()}
+            for product_id, quantity in quantities.items()
+        ])
+        db.execute(upsert.on_conflict_do_update(
+            constraint="uq_stock_holds_cart_product",
+            set_={"quantity": StockHold.quantity + upsert.excluded.quantity, "expires_at": expires_at},
+        ))
+        holds = (
+            db.query(StockHold.product_id, StockHold.quantity)
+            .filter(StockHold.cart_id == cart_id)
+            .order_by(StockHold.created_at)
+            .all()
+        )
+        db.commit()
+        metrics.STOCK_HOLDS.labels("placed").inc(len(quantities))
+        return cart_id, expires_at, holds
+
+    @staticmethod
+    def _reserve(db: Session, product_id: uuid.UUID, quantity: int, depot_id: uuid.UUID) -> None:
+        params = {"product_id": product_id, "depot": depot_id, "quantity": quantity}
+        if db.connection().execute(_RESERVE, params).first() is not None:
+            return
+        # Lapsed holds on this product may be all that's in the way
+        if HoldService.sweep_expired(db, [product_id]) and db.connection().execute(_RESERVE, params).first():
+            return
+        row = (
+            db.query(Product.name, Product.current_stock, Product.reserved_quantity, Product.is_active)
+            .filter(Product.id == product_id, Product.depot_id == depot_id)
+            .first()
+        )
+        if row is None or not row.is_active:
+            raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+        metrics.STOCK_HOLDS.labels("conflict").inc()
+        available = row.current_stock - row.reserved_quantity
+        raise HTTPException(status_code=409, detail=f"Not enough stock for {row.name}. Available: {available}")
+
+    @staticmethod
+    def take_cart(db: Session, cart_id: uuid.UUID, user: User) -> List[Tuple[uuid.UUID, int]]:
+        """
+        Delete every hold of ``cart_id`` and return (product id, units) for
+        each. Their units stay reserved until passed to ``release``, so a
+        caller can lock the products first.
+        """
+        return db.execute(
+            delete(StockHold)
+            .where(StockHold.cart_id == cart_id, StockHold.user_id == user.id)
+            .returning(StockHold.product_id, StockHold.quantity),
+            execution_options={"synchronize_session": False},
+        ).all()
+
+    @staticmethod
+    def release(db: Session, holds: List[Tuple[uuid.UUID, int]]) -> Dict[uuid.UUID, int]:
+        """Return the units of ``holds`` (from ``take_cart``) to availability. Returns units per product."""
+        return _release(db, holds)
+
+    @staticmethod
+    def release_cart(db: Session, cart_id: uuid.UUID, user: User) -> Dict[uuid.UUID, int]:
+        """
+        Drop every hold of ``cart_id`` and return its units to availability,
+        in the caller's transaction. Returns units released per product.
+        """
+        return _release(db, HoldService.take_cart(db, cart_id, user))
+
+    @staticmethod
+    def sweep_expired(db: Session, product_ids: Optional[List[uuid.UUID]] = None) -> Dict[uuid.UUID, int]:
+        """
+        Release every lapsed hold (or just those on ``product_ids``) in one
+        DELETE and one batched UPDATE, in the caller's transaction. Holds
+        another transaction has locked (a checkout, another sweep) are
+        skipped, so a sweep never waits on hold rows. Returns units released
+        per product.
+        """
+        expired = select(StockHold.id).where(StockHold.expires_at <= datetime.utcnow())
+        if product_ids is not None:
+            expired = expired.where(StockHold.product_id.in_(product_ids))
+        released = db.execute(
+            delete(StockHold)
+            .where(StockHold.id.in_(expired.with_for_update(skip_locked=True).scalar_subquery()))
+            .returning(StockHold.product_id, StockHold.quantity),
+            execution_options={"synchronize_session": False},
+        ).all()
+        if released:
+            metrics.STOCK_HOLDS.labels("expired").inc(len(released))
+        return _release(db, released)
@@ -0,0 +1,390 @@
+"""
+In-memory window of recent sales for analytics.
+
+Nearly every dashboard and report asks about the last few weeks. Each
+worker keeps the last ``HOT_WINDOW_DAYS`` of sales as flat NumPy columns,
+one row per transaction line:
+
+* ``ts`` (epoch microseconds), ``depot``/``user``/``product`` (small int
+  codes into per-window id lists), ``quantity``, ``price``, ``sale_type``
+  (of the transaction);
+* ``amount``: the transaction's total on its first line (``head``), 0 on the
+  others, so transaction sums and counts are plain masked sums.
+
+That is ``LINE_BYTES`` (40) bytes a line, about 40 MB per million lines.
+``HOT_WINDOW_MAX_LINES`` bounds it: past it, the oldest lines are dropped
+and the window covers less time.
+
+The window loads once, then appends every sale announced on
+``SALES_CHANNEL`` (from any worker), and reloads every
+``HOT_WINDOW_RESYNC_SECONDS``. A sale commits a little after its
+timestamp, so one stamped before a load may still be announced after it:
+announced sales up to ``HOT_WINDOW_OVERLAP_SECONDS`` older than the load
+are matched by transaction id against what it read, and only the new ones
+appended. A reload drops aged-out lines, and repairs sales that were too
+large to announce (the window is stale, so unused, until then).
+
+Only the "postgres" broadcast backend reaches every worker; with "memory"
+each worker would miss the others' sales, so ``enabled()`` is False.
+
+``hot_window.split(db, start, end, depot_id)`` returns ``(None, frame)``
+when the window covers the whole range, else None (callers fall back to
+SQL). The ``HotSales`` frame answers ``totals``/``daily``/``by_product``/
+``by_user`` like an archive frame, with vectorized group-bys; the None
+stands for "no live rows to query".
+"""
+import asyncio
+import json
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import String, cast, select
+from starlette.concurrency import run_in_threadpool
+
+from app.core import metrics
+from app.core.broadcast import broadcaster
+from app.core.config import settings
+from app.db.depot_routing import DEPOT_KEY
+from app.db.session import depot_router
+from app.models.product import Product
+from app.models.transaction import SaleType, Transaction, TransactionItem
+from app.models.user import User
+from app.services.sale_service import SALES_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+SALE_TYPES = list(SaleType)
+WHOLESALE = SALE_TYPES.index(SaleType.WHOLESALE)
+RETAIL = SALE_TYPES.index(SaleType.RETAIL)
+EPOCH = datetime(1970, 1, 1)
+LOAD_RETRY_SECONDS = 5.0
+
+COLUMNS = {
+    "ts": np.int64,
+    "depot": np.int16,
+    "user": np.int32,
+    "product": np.int32,
+    "quantity": np.int32,
+    "price": np.float64,
+    "sale_type": np.int8,
+    "amount": np.float64,
+    "head": np.bool_,
+}
+LINE_BYTES = sum(np.dtype(dtype).itemsize for dtype in COLUMNS.values())
+
+
+def _micros(moment: datetime) -> int:
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+class _Codes:
+    """Ids (as text) to small ints, and the ints back to UUIDs."""
+
+    def __init__(self) -> None:
+        self.ids: List[UUID] = []
+        self.codes: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.ids)
+            self.ids.append(UUID(value))
+        return code
+
+
+class HotSales:
+    """A depot's (or every depot's) lines between two moments, as column views."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], products: List[UUID], users: List[UUID],
+                 product_names: Dict[UUID, str], usernames: Dict[UUID, str]) -> None:
+        self.columns = columns
+        self.products = products
+        self.users = users
+        self.product_names = product_names
+        self.usernames = usernames
+
+    def _by_type(self, code: int) -> np.ndarray:
+        return np.where(self.columns["sale_type"] == code, self.columns["amount"], 0.0)
+
+    def totals(self) -> Tuple[float, int, float, float]:
+        """Total amount, transaction count, wholesale and retail amounts."""
+        return (
+            float(self.columns["amount"].sum()),
+            int(self.columns["head"].sum()),
+            float(self._by_type(WHOLESALE).sum()),
+            float(self._by_type(RETAIL).sum()),
+        )
+
+    def daily(self) -> Dict[date, Tuple[float, int]]:
+        """Total amount and transaction count per day."""
+        days = self.columns["ts"] // 86_400_000_000
+        unique, inverse = np.unique(days, return_inverse=True)
+        totals = np.bincount(inverse, weights=self.columns["amount"], minlength=len(unique))
+        counts = np.bincount(inverse, weights=self.columns["head"], minlength=len(unique))
+        return {
+            (EPOCH + timedelta(days=int(day))).date(): (float(total), int(count))
+            for day, total, count in zip(unique, totals, counts)
+            if count
+        }
+
+    def _group(self, codes: np.ndarray, ids: List[UUID], *weights: np.ndarray, present: np.ndarray):
+        sums = [np.bincount(codes, weights=weight, minlength=len(ids)) for weight in weights]
+        return {
+            ids[code]: tuple(float(column[code]) for column in sums)
+            for code in np.flatnonzero(present)
+        }
+
+    def by_product(self) -> Dict[UUID, Tuple[float, ...]]:
+        """Quantity, revenue, sum of unit prices and line count per product."""
+        codes = self.columns["product"]
+        quantity = self.columns["quantity"].astype(np.float64)
+        price = self.columns["price"]
+        lines = np.bincount(codes, minlength=len(self.products))
+        return self._group(codes, self.products, quantity, quantity * price, price, np.ones(len(codes)),
+                           present=lines > 0)
+
+    def by_user(self) -> Dict[UUID, Tuple[float, ...]]:
+        """Total amount, transaction count, wholesale and retail amounts per cashier."""
+        codes = self.columns["user"]
+        heads = self.columns["head"].astype(np.float64)
+        return self._group(
+            codes, self.users, self.columns["amount"], heads, self._by_type(WHOLESALE), self._by_type(RETAIL),
+            present=np.bincount(codes, weights=heads, minlength=len(self.users)) > 0,
+        )
+
+
+class HotWindow:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget everything; ``frame`` returns None until the next load."""
+        with self._lock:
+            self.ready = False
+            self.covers_from = datetime.max
+            self.as_of = datetime.min
+            self.stale = False
+            self._size = 0
+            self._columns = {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+            self._depots, self._users, self._products = _Codes(), _Codes(), _Codes()
+            self._product_names: Dict[UUID, str] = {}
+            self._usernames: Dict[UUID, str] = {}
+            self._seen: Set[str] = set()  # transactions near as_of, and every one appended
+
+    @property
+    def lines(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self._columns.values())
+
+    @staticmethod
+    def enabled() -> bool:
+        return settings.HOT_WINDOW_DAYS > 0 and settings.BROADCAST_BACKEND != "memory"
+
+    def load(self, db, days: Optional[int] = None, now: Optional[datetime] = None) -> None:
+        """Replace the window with the last ``days`` of sales from ``db``."""
+        now = now or datetime.utcnow()
+        start = now - timedelta(days=days or settings.HOT_WINDOW_DAYS)
+        # Ids as text: parsing a UUID per line would take most of the load
+        rows = db.execute(
+            select(
+                cast(Transaction.id, String),
+                Transaction.created_at,
+                cast(Transaction.depot_id, String),
+                cast(Transaction.user_id, String),
+                Transaction.total_amount,
+                Transaction.sale_type,
+                cast(TransactionItem.product_id, String),
+                TransactionItem.quantity,
+                TransactionItem.price_at_sale,
+            ).join_from(Transaction, TransactionItem, TransactionItem.transaction_id == Transaction.id).where(
+                Transaction.created_at >= start, Transaction.created_at <= now
+            ).order_by(Transaction.created_at, Transaction.id)
+        ).all()
+        product_names = dict(db.query(Product.id, Product.name).all())
+        usernames = dict(db.query(User.id, User.username).all())
+
+        if len(rows) > settings.HOT_WINDOW_MAX_LINES:
+            rows = rows[len(rows) - settings.HOT_WINDOW_MAX_LINES:]
+            # Cut inside a transaction: drop its remaining lines too
+            first = next((n for n, row in enumerate(rows) if row[0] != rows[0][0]), len(rows))
+            rows = rows[first:]
+            start = rows[0][1] if rows else now
+        (transaction_ids, created_at, depot_ids, user_ids, totals, sale_types, product_ids, quantities,
+         prices) = zip(*rows) if rows else ((),) * 9
+        head = np.ones(len(rows), dtype=np.bool_)
+        head[1:] = [current != previous for current, previous in zip(transaction_ids[1:], transaction_ids)]
+        depots, users, products = _Codes(), _Codes(), _Codes()
+        sale_codes = {sale_type: code for code, sale_type in enumerate(SALE_TYPES)}
+        columns = {
+            "ts": np.array(created_at, dtype="datetime64[us]").astype(np.int64),
+            "depot": np.array([depots.code(value) for value in depot_ids], dtype=np.int16),
+            "user": np.array([users.code(value) for value in user_ids], dtype=np.int32),
+            "product": np.array([products.code(value) for value in product_ids], dtype=np.int32),
+            "quantity": np.array(quantities, dtype=np.int32),
+            "price": np.array(prices, dtype=np.float64),
+            "sale_type": np.array([sale_codes[sale_type] for sale_type in sale_types], dtype=np.int8),
+            "amount": np.where(head, np.array(totals, dtype=np.float64), 0.0),
+            "head": head,
+        }
+        overlap_from = _micros(now - timedelta(seconds=settings.HOT_WINDOW_OVERLAP_SECONDS))
+        seen = {transaction_ids[n] for n in np.flatnonzero(head & (columns["ts"] >= overlap_from))}
+        with self._lock:
+            self._columns, self._size = columns, len(rows)
+            self._depots, self._users, self._products = depots, users, products
+            self._product_names, self._usernames = product_names, usernames
+            self._seen = seen
+            self.covers_from, self.as_of = start, now
+            self.stale = False
+            self.ready = True
+
+    def apply(self, sale: Dict) -> bool:
+        """Append one announced sale. Returns False if it was skipped."""
+        if not self.ready or self.stale:
+            return False
+        created_at = datetime.fromisoformat(sale["created_at"])
+        if created_at < self.as_of - timedelta(seconds=settings.HOT_WINDOW_OVERLAP_SECONDS):
+            return False  # committed long before the load read
+        transaction_id = str(sale["transaction_id"])
+        if transaction_id in self._seen:
+            return False  # already loaded (or appended)
+        if sale["items"] is None or "user_id" not in sale:
+            self.stale = True  # too large to announce: only a reload has it
+            return False
+        if depot_router.placement(UUID(sale["depot_id"])) is not None:
+            return False  # not in the database the window was loaded from
+        count = len(sale["items"])
+        if count > settings.HOT_WINDOW_MAX_LINES:
+            self.stale = True
+            return False
+        with self._lock:
+            if self._size + count > settings.HOT_WINDOW_MAX_LINES:
+                self._evict(count)
+            self._reserve(count)
+            user_id = UUID(sale["user_id"])
+            self._usernames.setdefault(user_id, None)
+            values = {
+                "ts": _micros(created_at),
+                "depot": self._depots.code(sale["depot_id"]),
+                "user": self._users.code(sale["user_id"]),
+                "sale_type": SALE_TYPES.index(SaleType(sale["sale_type"])),
+            }
+            at = slice(self._size, self._size + count)
+            for name, value in values.items():
+                self._columns[name][at] = value
+            for offset, (product_id, name, quantity, revenue) in enumerate(sale["items"]):
+                self._product_names[UUID(product_id)] = name
+                row = self._size + offset
+                self._columns["product"][row] = self._products.code(product_id)
+                self._columns["quantity"][row] = quantity
+                self._columns["price"][row] = revenue / quantity
+                self._columns["amount"][row] = sale["total_amount"] if offset == 0 else 0.0
+                self._columns["head"][row] = offset == 0
+            self._size += count
+            self._seen.add(transaction_id)
+        return True
+
+    def _reserve(self, count: int) -> None:
+        capacity = len(self._columns["ts"])
+        if self._size + count <= capacity:
+            return
+        # New arrays: frames handed out earlier keep viewing the old ones
+        capacity = min(max(2 * capacity, self._size + count, 1024), settings.HOT_WINDOW_MAX_LINES)
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+
+    def _evict(self, count: int) -> None:
+        """Drop the oldest lines (whole transactions) to make room for ``count`` more."""
+        ts = self._columns["ts"][:self._size]
+        # Free a tenth of the window at a time, so evictions stay rare
+        limit = settings.HOT_WINDOW_MAX_LINES
+        drop = min(max(self._size + count - limit, limit // 10), self._size)
+        # A transaction's lines share a timestamp, so cutting on time keeps them together
+        cutoff = int(np.sort(ts)[drop - 1])
+        keep = ts > cutoff
+        self._columns = {name: column[:self._size][keep].copy() for name, column in self._columns.items()}
+        self._size = int(keep.sum())
+        self.covers_from = max(self.covers_from, EPOCH + timedelta(microseconds=cutoff + 1))
+        metrics.HOT_WINDOW_EVICTIONS.inc()
+
+    def frame(self, start: Optional[datetime], end: Optional[datetime], depot_id: Optional[UUID]) -> Optional[HotSales]:
+        """The sales between ``start`` and ``end`` (inclusive), if the window holds all of them."""
+        if not self.ready or self.stale or start is None or start < self.covers_from:
+            return None
+        with self._lock:
+            columns = {name: column[:self._size] for name, column in self._columns.items()}
+            depot_code = self._depots.codes.get(str(depot_id)) if depot_id is not None else None
+            products, users = list(self._products.ids), list(self._users.ids)
+            product_names, usernames = self._product_names, self._usernames
+        keep = columns["ts"] >= _micros(start)
+        if end is not None:
+            keep &= columns["ts"] <= _micros(end)
+        if depot_id is not None:
+            keep &= columns["depot"] == (depot_code if depot_code is not None else -1)
+        return HotSales(
+            {name: column[keep] for name, column in columns.items()},
+            products,
+            users,
+            product_names,
+            {user_id: name for user_id, name in usernames.items() if name is not None},
+        )
+
+    def split(self, db, start: Optional[datetime], end: Optional[datetime], depot_id: Optional[UUID]):
+        """
+        ``(None, frame)`` when the window answers the whole range, else None.
+        The window only holds the default database, so depots placed
+        elsewhere always go to SQL.
+        """
+        if any(depot_router.placement(depot) is not None for depot in (depot_id, db.info.get(DEPOT_KEY)) if depot):
+            return None
+        frame = self.frame(start, end, depot_id)
+        if frame is None:
+            return None
+        metrics.HOT_WINDOW_QUERIES.inc()
+        return None, frame
+
+    async def run(self, session_factory) -> None:
+        """Load, then follow the sales channel, reloading every ``HOT_WINDOW_RESYNC_SECONDS``."""
+        loop = asyncio.get_running_loop()
+
+        def load() -> None:
+            db = session_factory()
+            try:
+                self.load(db)
+            finally:
+                db.close()
+
+        # Subscribe before loading so no sale falls between the load and the appends
+        async with broadcaster.subscribe(SALES_CHANNEL) as sales:
+            while True:
+                try:
+                    await run_in_threadpool(load)
+                except Exception:
+                    logger.exception("Hot window load failed; retrying")
+                    await asyncio.sleep(LOAD_RETRY_SECONDS)
+                    continue
+                resync_at = loop.time() + settings.HOT_WINDOW_RESYNC_SECONDS
+                while not self.stale:
+                    remaining = resync_at - loop.time()
+                    message = await sales.get(remaining) if remaining > 0 else None
+                    if message is None:
+                        break
+                    if sales.dropped:
+                        sales.dropped = 0
+                        self.stale = True
+                    self.apply(json.loads(message))
+
+
+hot_window = HotWindow()
+
+metrics.registry.gauge("hot_window_lines", "Sale lines held in this worker's analytics window.", lambda: hot_window.lines)
+metrics.registry.gauge("hot_window_bytes", "Memory held by this worker's analytics window.", lambda: hot_window.nbytes)
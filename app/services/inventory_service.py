@@ -1,10 +1,78 @@
+from datetime import datetime
+from typing import List, Optional, Union
+from uuid import UUID
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
+from fastapi import HTTPException
 from app.models.product import Product
+from app.models.stock_alert import StockAlert, StockAlertKind
+
+STOCK_ALERTS_CHANNEL = "stock_alerts"
+
+# Columns for StockAlertResponse, read as Core rows
+ALERT_COLUMNS = (
+    StockAlert.id,
+    StockAlert.product_id,
+    Product.name.label("product_name"),
+    StockAlert.transaction_id,
+    StockAlert.kind,
+    StockAlert.stock_quantity,
+    StockAlert.low_stock_threshold,
+    StockAlert.created_at,
+)
+
+def parse_product_id(value: Union[str, UUID]) -> UUID:
+    """Product id from a request; malformed ids are unknown products."""
+    if isinstance(value, UUID):
+        return value
+    try:
+        return UUID(value)
+    except ValueError:
+        raise HTTPException(status_code=404, detail=f"Product {value} not found")
 
 class InventoryService:
     @staticmethod
-    def check_low_stock(db: Session, product_id: int) -> bool:
-        product = db.query(Product).filter(Product.id == product_id).first()
-        if product and product.stock_quantity <= product.low_stock_threshold:
-            return True
-        return False
\ No newline at end of file
+    def check_low_stock(db: Session, product_id: Union[str, UUID]) -> bool:
+        row = (
+            db.query(Product.current_stock, Product.low_stock_threshold)
+            .filter(Product.id == product_id)
+            .first()
+        )
+        return row is not None and row.current_stock <= row.low_stock_threshold
+
+    @staticmethod
+    def threshold_crossing(before: int, after: int, threshold: int) -> Optional[StockAlertKind]:
+        """The alert a stock change from ``before`` to ``after`` raises, if it crossed a line."""
+        if after <= 0 < before:
+            return StockAlertKind.OUT_OF_STOCK
+        if after <= threshold < before:
+            return StockAlertKind.LOW_STOCK
+        return None
+
+    @staticmethod
+    def recent_alerts(
+        db: Session, since: Optional[datetime] = None, limit: int = 100, depot_id: Optional[UUID] = None
+    ) -> List:
+        query = db.query(*ALERT_COLUMNS).join(Product, StockAlert.product_id == Product.id)
+        if depot_id is not None:
+            query = query.filter(Product.depot_id == depot_id)
+        if since is not None:
+            query = query.filter(StockAlert.created_at >= since)
+        return query.order_by(StockAlert.created_at.desc()).limit(limit).all()
+
+    @staticmethod
+    def alerts_after(
+        db: Session, alert_id: Union[str, UUID], limit: int = 500, depot_id: Optional[UUID] = None
+    ) -> List:
+        """Alerts created after ``alert_id`` (an SSE Last-Event-ID), oldest first."""
+        anchor = db.query(StockAlert.created_at, StockAlert.id).filter(StockAlert.id == alert_id).first()
+        if anchor is None:
+            return []
+        query = (
+            db.query(*ALERT_COLUMNS)
+            .join(Product, StockAlert.product_id == Product.id)
+            .filter(tuple_(StockAlert.created_at, StockAlert.id) > tuple_(anchor.created_at, anchor.id))
+        )
+        if depot_id is not None:
+            query = query.filter(Product.depot_id == depot_id)
+        return query.order_by(StockAlert.created_at, StockAlert.id).limit(limit).all()
@@ -0,0 +1,154 @@
+"""
+Transactional outbox.
+
+Work derived from a sale (rollups, notifications to other systems) doesn't
+run in checkout. ``record_event`` gives the sale an ``OutboxEvent`` row,
+inserted and committed with the sale itself, so an event exists exactly when
+its sale does. The dispatcher (``outbox.dispatch_pending``, a periodic job in
+every worker) then:
+
+* takes a batch of due events ``FOR UPDATE SKIP LOCKED``, oldest first, so
+  dispatchers of several workers share the backlog without waiting on each
+  other;
+* hands each topic's events to that topic's consumers, inside a savepoint;
+* deletes the delivered events in the same transaction.
+
+A consumer that writes to the database (a rollup) commits or rolls back with
+the deletion, so it sees each event once. Anything outside the database sees
+it at least once: when a batch fails, its events are retried one by one, and
+each failing event goes back with a growing delay (``OUTBOX_RETRY_SECONDS``,
+doubled per attempt) until ``OUTBOX_MAX_ATTEMPTS``, after which it is left
+in the table. Ordering is only roughly by commit: a retried event is
+delivered after newer ones.
+"""
+import json
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.models.outbox import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+Consumer = Callable[[Session, List[OutboxEvent]], None]
+
+
+def record_event(topic: str, payload: Dict, depot_id: uuid.UUID) -> OutboxEvent:
+    """An (unsaved) event; add it to the session of the change it describes."""
+    return OutboxEvent(topic=topic, payload=payload, depot_id=depot_id, created_at=datetime.utcnow())
+
+
+class OutboxDispatcher:
+    def __init__(self) -> None:
+        self._consumers: Dict[str, List[Tuple[str, Consumer]]] = {}
+
+    def register(self, topic: str, name: str, consumer: Consumer) -> None:
+        """Call ``consumer(db, events)`` with each batch's events of ``topic``."""
+        self._consumers.setdefault(topic, []).append((name, consumer))
+
+    def dispatch(self, db: Session, limit: Optional[int] = None) -> int:
+        """
+        Deliver one batch of due events, in the caller's transaction. Returns
+        how many events were taken (delivered or rescheduled).
+        """
+        now = datetime.utcnow()
+        events = (
+            db.query(OutboxEvent)
+            .filter(OutboxEvent.available_at <= now, OutboxEvent.attempts < settings.OUTBOX_MAX_ATTEMPTS)
+            .order_by(OutboxEvent.id)
+            .limit(limit or settings.OUTBOX_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not events:
+            return 0
+
+        try:
+            with db.begin_nested():
+                self._deliver(db, events)
+            delivered = events
+        except Exception:
+            logger.warning("Outbox batch of %d failed; delivering its events one by one", len(events), exc_info=True)
+            delivered = []
+            for event in events:
+                try:
+                    with db.begin_nested():
+                        self._deliver(db, [event])
+                except Exception as exc:
+                    self._retry_later(event, exc, now)
+                else:
+                    delivered.append(event)
+
+        if delivered:
+            db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_([event.id for event in delivered])))
+            for event in delivered:
+                metrics.OUTBOX_EVENTS.labels(event.topic, "delivered").inc()
+                metrics.OUTBOX_DELIVERY_LAG.observe((now - event.created_at).total_seconds())
+                db.expunge(event)
+        return len(events)
+
+    def dispatch_pending(self, db: Session) -> int:
+        """Deliver due events batch by batch, committing each, until the backlog is drained."""
+        total = 0
+        while True:
+            taken = self.dispatch(db)
+            db.commit()
+            total += taken
+            if taken < settings.OUTBOX_BATCH_SIZE:
+                return total
+
+    def _deliver(self, db: Session, events: List[OutboxEvent]) -> None:
+        by_topic: Dict[str, List[OutboxEvent]] = {}
+        for event in events:
+            by_topic.setdefault(event.topic, []).append(event)
+        for topic, topic_events in by_topic.items():
+            for _, consumer in self._consumers.get(topic, ()):
+                consumer(db, topic_events)
+
+    @staticmethod
+    def _retry_later(event: OutboxEvent, exc: Exception, now: datetime) -> None:
+        event.attempts += 1
+        event.last_error = repr(exc)[:1000]
+        event.available_at = now + timedelta(seconds=settings.OUTBOX_RETRY_SECONDS * 2 ** (event.attempts - 1))
+        dead = event.attempts >= settings.OUTBOX_MAX_ATTEMPTS
+        metrics.OUTBOX_EVENTS.labels(event.topic, "dead" if dead else "retry").inc()
+        logger.log(
+            logging.ERROR if dead else logging.WARNING,
+            "Outbox event %s (%s) failed, attempt %d: %r", event.id, event.topic, event.attempts, exc,
+        )
+
+
+class JsonlSink:
+    """
+    Consumer that appends events to a file as JSON lines: a local stand-in
+    for a webhook (``OUTBOX_WEBHOOK_FILE``). Retries can append an event twice;
+    readers dedupe on ``id``.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, db: Session, events: List[OutboxEvent]) -> None:
+        lines = "".join(
+            json.dumps({
+                "id": event.id,
+                "topic": event.topic,
+                "depot_id": str(event.depot_id),
+                "created_at": event.created_at.isoformat(),
+                "payload": event.payload,
+            }, separators=(",", ":")) + "\n"
+            for event in events
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+outbox = OutboxDispatcher()
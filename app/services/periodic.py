@@ -0,0 +1,54 @@
+import logging
+import threading
+from typing import Callable, Iterable, Optional
+from uuid import UUID
+from sqlalchemy.orm import Session
+from app.db.depot_routing import scope_to_depot
+
+logger = logging.getLogger(__name__)
+
+class PeriodicJob:
+    """
+    Daemon thread that runs ``job(db)`` in a fresh session every ``interval()``
+    seconds and commits. An interval of 0 disables the job. With ``depots``,
+    each run repeats the job in a session scoped to each depot it returns
+    (None: the default database), so depots placed on other databases are
+    covered too.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        job: Callable[[Session], object],
+        interval: Callable[[], float],
+        session_factory,
+        depots: Optional[Callable[[], Iterable[Optional[UUID]]]] = None,
+    ) -> None:
+        self.name = name
+        self.job = job
+        self.interval = interval
+        self.session_factory = session_factory
+        self.depots = depots or (lambda: [None])
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None and self.interval() > 0:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval()):
+            for depot_id in self.depots():
+                db = scope_to_depot(self.session_factory(), depot_id)
+                try:
+                    self.job(db)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    logger.exception("Periodic job %s failed (depot %s)", self.name, depot_id)
+                finally:
+                    db.close()
@@ -1,10 +1,12 @@
 import csv
 import io
 from typing import Any
+from app.core import tracing
 from app.schemas.analytics import SalesMetrics, InventoryAnalytics, DashboardAnalytics
 
 class ReportService:
     @staticmethod
+    @tracing.traced("ReportService.generate_sales_csv")
     def generate_sales_csv(data: SalesMetrics) -> io.StringIO:
         output = io.StringIO()
         writer = csv.writer(output)
@@ -18,6 +20,7 @@ class ReportService:
         return output
 
     @staticmethod
+    @tracing.traced("ReportService.generate_inventory_csv")
     def generate_inventory_csv(data: InventoryAnalytics) -> io.StringIO:
         output = io.StringIO()
         writer = csv.writer(output)
@@ -36,6 +39,7 @@ class ReportService:
         return output
 
     @staticmethod
+    @tracing.traced("ReportService.generate_dashboard_pdf")
     def generate_dashboard_pdf(data: DashboardAnalytics) -> io.BytesIO:
         try:
             from reportlab.lib import colors
@@ -0,0 +1,170 @@
+"""
+Group commit for ``POST /transactions/`` (``SALE_BATCH_ENABLED``).
+
+Request threads hand their sale to ``sale_batcher.submit`` and wait on a
+future. One writer thread per worker takes the first queued sale, gathers
+whatever else arrives in the next ``SALE_BATCH_WINDOW_MS`` (up to
+``SALE_BATCH_MAX_SIZE``) and runs them in one database transaction:
+
+* each sale prices its cart and takes its stock inside its own savepoint, so
+  a sale that fails (unknown product, not enough stock) is rolled back alone
+  and its caller gets its own error;
+* the transactions, items, stock alerts and outbox events of the sales that
+  went through are inserted together at the end, and the batch commits (and
+  fsyncs) once.
+
+Sales of different depots are committed separately, since a depot may live
+on its own database (``DEPOT_PLACEMENTS``).
+
+A sale therefore waits at most the window plus one batch. Product rows stay
+locked until the batch commits, so batches of different workers can deadlock
+on each other's products; when a batch fails as a whole, its sales are rerun
+one at a time through ``SaleService.process_sale``.
+"""
+import logging
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.depot_routing import scope_to_depot
+from app.db.session import SessionLocal, engine, read_engine, recent_writes
+from app.models.transaction import SaleType, Transaction
+from app.models.user import User
+from app.schemas.transaction import TransactionItemCreate
+from app.services.sale_service import SaleService, _failure_reason
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingSale:
+    __slots__ = ("user", "items", "sale_type", "cart_id", "future", "queued_at")
+
+    def __init__(self, user: User, items: List[TransactionItemCreate], sale_type: SaleType,
+                 cart_id: Optional[uuid.UUID]) -> None:
+        self.user = user
+        self.items = items
+        self.sale_type = sale_type
+        self.cart_id = cart_id
+        self.future: "Future[Transaction]" = Future()
+        self.queued_at = time.perf_counter()
+
+    def succeed(self, transaction: Transaction) -> None:
+        metrics.SALES.inc()
+        metrics.SALE_DURATION.observe(time.perf_counter() - self.queued_at)
+        self.future.set_result(transaction)
+
+    def fail(self, exc: Exception) -> None:
+        metrics.SALE_FAILURES.labels(_failure_reason(exc)).inc()
+        self.future.set_exception(exc)
+
+
+class SaleBatcher:
+    def __init__(self, session_factory) -> None:
+        self.session_factory = session_factory
+        self._queue: "queue.Queue[_PendingSale]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(
+        self,
+        user: User,
+        items: List[TransactionItemCreate],
+        sale_type: SaleType,
+        cart_id: Optional[uuid.UUID] = None,
+    ) -> Transaction:
+        """
+        Queue a sale for the next batch and wait for it. Returns the committed
+        transaction (detached, fully loaded) or raises the sale's own error.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sale-batcher", daemon=True)
+                self._thread.start()
+        pending = _PendingSale(user, items, sale_type, cart_id)
+        self._queue.put(pending)
+        return pending.future.result()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + settings.SALE_BATCH_WINDOW_MS / 1000
+            while len(batch) < settings.SALE_BATCH_MAX_SIZE:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            by_depot: Dict[uuid.UUID, List[_PendingSale]] = {}
+            for pending in batch:
+                by_depot.setdefault(pending.user.depot_id, []).append(pending)
+            for sales in by_depot.values():
+                metrics.SALE_BATCH_SIZE.observe(len(sales))
+                try:
+                    self._write(sales)
+                except Exception:
+                    logger.exception("Sale batch of %d failed; retrying its sales one by one", len(sales))
+                    self._write_singly([pending for pending in sales if not pending.future.done()])
+
+    def _write(self, batch: List[_PendingSale]) -> None:
+        # All of one depot (see _run)
+        db = scope_to_depot(self.session_factory(), batch[0].user.depot_id)
+        # The callers serialize the transactions after the session is gone
+        db.expire_on_commit = False
+        try:
+            done = []
+            for pending in batch:
+                try:
+                    with db.begin_nested():
+                        transaction, quantities, prices = SaleService.build_sale(
+                            db, pending.user, pending.items, pending.sale_type
+                        )
+                        rows = SaleService.apply_sale(
+                            db, pending.user, transaction, quantities, prices, pending.cart_id
+                        )
+                except HTTPException as exc:
+                    pending.fail(exc)
+                    continue
+                done.append((pending, transaction, rows))
+
+            db.add_all([transaction for _, transaction, _ in done])
+            db.add_all([row for _, _, rows in done for row in rows])
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        for pending, transaction, _ in done:
+            pending.succeed(transaction)
+        if read_engine is not engine and recent_writes.window > 0:
+            for pending, _, _ in done:
+                recent_writes.mark(pending.user.username)
+
+    def _write_singly(self, batch: List[_PendingSale]) -> None:
+        for pending in batch:
+            db = scope_to_depot(self.session_factory(), pending.user.depot_id)
+            db.expire_on_commit = False
+            db.info["username"] = pending.user.username
+            try:
+                transaction = SaleService.process_sale(
+                    db, pending.user, pending.items, pending.sale_type, pending.cart_id
+                )
+                transaction.items  # load before the session closes
+            except Exception as exc:
+                db.rollback()
+                pending.future.set_exception(exc)
+            else:
+                pending.future.set_result(transaction)
+            finally:
+                db.close()
+
+
+sale_batcher = SaleBatcher(SessionLocal)
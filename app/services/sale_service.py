@@ -1,64 +1,287 @@
-from typing import List
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import OperationalError
 from fastapi import HTTPException
+from app.core import metrics, tracing
+from app.core.broadcast import publish_on_commit
 from app.models.transaction import Transaction, TransactionItem, SaleType
 from app.models.product import Product
 from app.models.user import User
+from app.models.stock_alert import StockAlert
 from app.schemas.transaction import TransactionItemCreate
+from app.services.hold_service import HoldService
+from app.services.inventory_service import STOCK_ALERTS_CHANNEL, InventoryService, parse_product_id
+from app.services.outbox import record_event
+from app.services.stock_shard_service import StockShardService
+
+# Postgres error codes that mean we gave up waiting on a row lock
+LOCK_WAIT_PGCODES = {"55P03", "57014"}  # lock_not_available, query_canceled (statement/lock timeout)
+DEADLOCK_PGCODE = "40P01"
+
+# Every committed sale is announced here (for the live dashboard)
+SALES_CHANNEL = "sales"
+# ... and leaves an outbox event of this topic (for rollups and other derived work)
+SALE_EVENT = "sale"
+
+def _failure_reason(exc: Exception) -> str:
+    if isinstance(exc, HTTPException):
+        return "not_found" if exc.status_code == 404 else "out_of_stock"
+    pgcode = getattr(getattr(exc, "orig", None), "pgcode", None)
+    if pgcode in LOCK_WAIT_PGCODES:
+        return "lock_wait"
+    if pgcode == DEADLOCK_PGCODE:
+        return "deadlock"
+    return "db_error"
 
 class SaleService:
     @staticmethod
+    @tracing.traced("SaleService.process_sale")
     def process_sale(
         db: Session, 
         user: User, 
         items: List[TransactionItemCreate], 
-        sale_type: SaleType
+        sale_type: SaleType,
+        cart_id: Optional[uuid.UUID] = None,
+    ) -> Transaction:
+        start = time.perf_counter()
+        try:
+            transaction = SaleService._process_sale(db, user, items, sale_type, cart_id)
+        except (HTTPException, OperationalError) as e:
+            metrics.SALE_FAILURES.labels(_failure_reason(e)).inc()
+            raise
+        metrics.SALES.inc()
+        metrics.SALE_DURATION.observe(time.perf_counter() - start)
+        return transaction
+
+    @staticmethod
+    def _process_sale(
+        db: Session,
+        user: User,
+        items: List[TransactionItemCreate],
+        sale_type: SaleType,
+        cart_id: Optional[uuid.UUID] = None,
     ) -> Transaction:
+        transaction, quantities, prices = SaleService.build_sale(db, user, items, sale_type)
+        db.add(transaction)
+        # Write the rows that nobody else contends on before taking any product lock
+        with tracing.span("sale.insert"):
+            db.flush()
+
+        db.add_all(SaleService.apply_sale(db, user, transaction, quantities, prices, cart_id))
+        with tracing.span("sale.commit"):
+            db.commit()
+        with tracing.span("sale.refresh"):
+            db.refresh(transaction)
+
+        return transaction
+
+    @staticmethod
+    def build_sale(
+        db: Session, user: User, items: List[TransactionItemCreate], sale_type: SaleType
+    ) -> Tuple[Transaction, Dict[uuid.UUID, int], Dict]:
+        """
+        Price the cart and build its (unsaved) transaction. Returns the
+        transaction, quantity per product and the product rows read.
+        """
+        quantities = {}
+        for item_data in items:
+            product_id = parse_product_id(item_data.product_id)
+            quantities[product_id] = quantities.get(product_id, 0) + item_data.quantity
+
+        # Prices are read without locks; the rows are locked only for the stock update
+        with tracing.span("sale.load_prices"):
+            prices = {
+                row.id: row
+                for row in db.query(
+                    Product.id, Product.name, Product.wholesale_price, Product.retail_price,
+                    Product.low_stock_threshold, Product.reserved_quantity, Product.stock_shards,
+                )
+                .filter(Product.id.in_(quantities), Product.depot_id == user.depot_id)
+                .all()
+            }
+
         total_amount = 0.0
         db_items = []
-
-        # Iterate through items to calculate total and deduct stock
         for item_data in items:
-            # Lock the product row to prevent race conditions
-            product = db.query(Product).filter(Product.id == item_data.product_id).with_for_update().first()
-            
-            if not product:
+            product_id = parse_product_id(item_data.product_id)
+            row = prices.get(product_id)
+            if row is None:
                 raise HTTPException(status_code=404, detail=f"Product {item_data.product_id} not found")
-            
-            if product.stock_quantity < item_data.quantity:
-                raise HTTPException(status_code=400, detail=f"Not enough stock for {product.name}. Available: {product.stock_quantity}")
-            
+
             # Determine price based on the item's sale type (Single vs Pack)
             if item_data.sale_type == SaleType.WHOLESALE:
-                price = product.wholesale_price
+                price = row.wholesale_price
             else:
-                price = product.retail_price
-            
-            item_total = price * item_data.quantity
-            total_amount += item_total
-            
-            # Deduct stock
-            product.stock_quantity -= item_data.quantity
-            
-            # Create transaction item record
-            db_item = TransactionItem(
-                product_id=product.id,
+                price = row.retail_price
+            total_amount += price * item_data.quantity
+
+            db_items.append(TransactionItem(
+                product_id=product_id,
                 quantity=item_data.quantity,
                 price_at_sale=price,
                 sale_type=item_data.sale_type
-            )
-            db_items.append(db_item)
-            
-        # Create the main transaction record
+            ))
+
+        # Create the main transaction record; id and timestamp are set up front
+        # so the commit notifications can carry them without an extra flush
         transaction = Transaction(
+            id=uuid.uuid4(),
+            created_at=datetime.utcnow(),
+            depot_id=user.depot_id,
             user_id=user.id,
             total_amount=total_amount,
             sale_type=sale_type,
             items=db_items
         )
-        
-        db.add(transaction)
-        db.commit()
-        db.refresh(transaction)
-        
-        return transaction
\ No newline at end of file
+        return transaction, quantities, prices
+
+    @staticmethod
+    def apply_sale(
+        db: Session,
+        user: User,
+        transaction: Transaction,
+        quantities: Dict[uuid.UUID, int],
+        prices: Dict,
+        cart_id: Optional[uuid.UUID] = None,
+    ) -> List:
+        """
+        Release the cart's holds, take the stock and queue the sale's
+        notifications, in the caller's transaction. Returns the rows it made
+        (stock alerts, the sale's outbox event), for the caller to add once
+        the transaction row is in.
+        """
+        # Units this cart reserved become available to this sale; checkout
+        # releases the whole cart, whatever it ends up buying. Hold rows are
+        # taken first, their units released once the products are locked.
+        held = HoldService.take_cart(db, cart_id, user) if cart_id is not None else []
+
+        # Sharded products take their units from one shard each and leave the
+        # products row alone; the rest are locked as a group below
+        sharded = {pid for pid in quantities if prices[pid].stock_shards}
+        locked_ids = [pid for pid in quantities if not prices[pid].stock_shards]
+
+        # One statement locks every product this sale writes (bought or held)
+        # in id order, so two carts with overlapping products can't deadlock.
+        # NO KEY UPDATE, because the item inserts above already hold KEY SHARE
+        # locks on the same rows.
+        lock_ids = set(locked_ids).union(product_id for product_id, _ in held)
+        lock_start = time.perf_counter()
+        with tracing.span("sale.lock_products", products=len(lock_ids)):
+            locked = (
+                db.query(Product)
+                .filter(Product.id.in_(lock_ids))
+                .order_by(Product.id)
+                .with_for_update(key_share=True)
+                .populate_existing()
+                .all()
+            ) if lock_ids else []
+        metrics.SALE_LOCK_WAIT.observe(time.perf_counter() - lock_start)
+
+        released = HoldService.release(db, held)
+
+        # (product, stock before, stock after) for threshold checks
+        stock_changes = []
+        swept: Optional[Dict[uuid.UUID, int]] = None
+        for product in locked:
+            quantity = quantities.get(product.id)
+            if quantity is None:  # only held
+                continue
+            # Locked rows say how the stock is kept now; a sharded product
+            # is only locked here when the cart held it
+            if product.stock_shards:
+                sharded.add(product.id)
+                continue
+            sharded.discard(product.id)
+            # reserved_quantity was read before the release (and any sweep)
+            reserved = product.reserved_quantity - released.get(product.id, 0)
+            if product.stock_quantity - reserved < quantity and swept is None:
+                # Lapsed holds no sweep has reached yet may be all that's in
+                # the way; free them under the locks already held
+                swept = HoldService.sweep_expired(db, locked_ids)
+            available = product.stock_quantity - reserved + (swept or {}).get(product.id, 0)
+            if available < quantity:
+                raise HTTPException(status_code=400, detail=f"Not enough stock for {product.name}. Available: {available}")
+            stock_changes.append((prices[product.id], product.stock_quantity, product.stock_quantity - quantity))
+            product.stock_quantity -= quantity
+
+        for product_id in sorted(sharded):
+            row = prices[product_id]
+            quantity = quantities[product_id]
+            with tracing.span("sale.take_shard"):
+                taken, before = StockShardService.take(db, product_id, quantity)
+            # Other carts' holds count as of the price read, not under a lock
+            available = before - (row.reserved_quantity - released.get(product_id, 0))
+            if not taken or available < quantity:
+                raise HTTPException(status_code=400, detail=f"Not enough stock for {row.name}. Available: {max(available, 0)}")
+            stock_changes.append((row, before, before - quantity))
+
+        alerts = SaleService._raise_stock_alerts(db, transaction, stock_changes)
+        SaleService._announce_sale(db, transaction, prices)
+        return [*alerts, SaleService._sale_event(transaction)]
+
+    @staticmethod
+    def _raise_stock_alerts(db: Session, transaction: Transaction, stock_changes) -> List[StockAlert]:
+        """Record and announce products whose stock this sale pushed over a threshold."""
+        alerts = []
+        for product, before, after in stock_changes:
+            kind = InventoryService.threshold_crossing(before, after, product.low_stock_threshold)
+            if kind is None:
+                continue
+            alert = StockAlert(
+                id=uuid.uuid4(),
+                product_id=product.id,
+                transaction=transaction,
+                kind=kind,
+                stock_quantity=after,
+                low_stock_threshold=product.low_stock_threshold,
+                created_at=datetime.utcnow(),
+            )
+            alerts.append((alert, product))
+            metrics.STOCK_ALERTS.labels(kind.value).inc()
+        for alert, product in alerts:
+            publish_on_commit(db, STOCK_ALERTS_CHANNEL, {
+                "id": alert.id,
+                "depot_id": transaction.depot_id,
+                "product_id": product.id,
+                "product_name": product.name,
+                "transaction_id": transaction.id,
+                "kind": alert.kind.value,
+                "stock_quantity": alert.stock_quantity,
+                "low_stock_threshold": alert.low_stock_threshold,
+                "created_at": alert.created_at.isoformat(),
+            })
+        return [alert for alert, _ in alerts]
+
+    @staticmethod
+    def _sale_event(transaction: Transaction):
+        return record_event(SALE_EVENT, {
+            "transaction_id": str(transaction.id),
+            "user_id": str(transaction.user_id),
+            "sale_type": transaction.sale_type.value,
+            "total_amount": transaction.total_amount,
+            "created_at": transaction.created_at.isoformat(),
+            "items": [
+                [str(item.product_id), item.quantity, item.quantity * item.price_at_sale]
+                for item in transaction.items
+            ],
+        }, transaction.depot_id)
+
+    @staticmethod
+    def _announce_sale(db: Session, transaction: Transaction, products) -> None:
+        sale = {
+            "transaction_id": transaction.id,
+            "depot_id": transaction.depot_id,
+            "user_id": transaction.user_id,
+            "sale_type": transaction.sale_type.value,
+            "total_amount": transaction.total_amount,
+            "created_at": transaction.created_at.isoformat(),
+        }
+        items = [
+            [item.product_id, products[item.product_id].name, item.quantity, item.quantity * item.price_at_sale]
+            for item in transaction.items
+        ]
+        # Huge carts don't fit in a NOTIFY; listeners reload instead
+        publish_on_commit(db, SALES_CHANNEL, {**sale, "items": items}, fallback={**sale, "items": None})
@@ -0,0 +1,383 @@
+"""
+Parquet snapshots of sales, and long-range analytics over them in DuckDB.
+
+Year-long product and employee reports aggregate hundreds of thousands of
+item rows. With ``ANALYTICS_SNAPSHOT_DIR`` set (and ``duckdb`` and
+``pyarrow`` installed), a periodic exporter copies each depot's sales there
+incrementally, partitioned by depot and month::
+
+    <dir>/<depot_id>/state.json
+    <dir>/<depot_id>/products-<stamp>.parquet
+    <dir>/<depot_id>/transactions/month=2025-01/part-<stamp>.parquet
+    <dir>/<depot_id>/transaction_items/month=2025-01/part-<stamp>.parquet
+
+Each run appends the transactions created since the last run's horizon, up
+to ``ANALYTICS_SNAPSHOT_LAG_SECONDS`` ago (older sales have committed by
+then), with their items (which carry the sale's ``created_at``, so no join
+is needed). It also rewrites the products, folds the parts of closed months
+into one file, and then records the files and the new horizon in
+``state.json``. Readers only open files listed there. Files replaced by
+compaction are deleted one run later, once no reader can still be using
+them.
+
+``SnapshotService.split`` routes ranges of ``ANALYTICS_COLUMNAR_MIN_DAYS``
+or more that the snapshot covers. It returns a filter for the sales after
+the horizon, which the caller still reads from Postgres, and a
+``ColumnarSales`` frame. The frame answers ``totals``/``by_product``/``by_user``
+like an archive frame, with DuckDB scans of that month's Parquet files.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from app.core import metrics, tracing
+from app.core.config import settings
+from app.db.depot_routing import DEPOT_KEY
+from app.models.archive import TransactionArchive
+from app.models.depot import Depot
+from app.models.product import Product
+from app.models.transaction import SaleType, Transaction, TransactionItem
+from app.services.archive_service import ArchiveService, add_months, month_start
+
+try:
+    import duckdb
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: long ranges stay on Postgres
+    duckdb = pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+STAMP_FORMAT = "%Y%m%dT%H%M%S%f"
+
+
+def enabled() -> bool:
+    return bool(settings.ANALYTICS_SNAPSHOT_DIR) and duckdb is not None
+
+
+def _depot_dir(depot_id: UUID) -> str:
+    return os.path.join(settings.ANALYTICS_SNAPSHOT_DIR, str(depot_id))
+
+
+def _write_json(path: str, content: Dict) -> None:
+    partial = f"{path}.partial"
+    with open(partial, "w", encoding="utf-8") as f:
+        json.dump(content, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(partial, path)
+
+
+def _write_parquet(table, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table, f"{path}.partial", compression="zstd")
+    os.replace(f"{path}.partial", path)
+
+
+def _uuid_column(values) -> "pa.Array":
+    return pa.array([value.bytes for value in values], pa.binary(16))
+
+
+class SnapshotService:
+    @staticmethod
+    def export_all(db: Session, now: Optional[datetime] = None) -> int:
+        """
+        Periodic job: snapshot the depots whose sales live on this session's
+        database (the scoped depot, or every depot not placed elsewhere).
+        Returns how many transactions were exported.
+        """
+        if not enabled():
+            return 0
+        from app.db.session import depot_router
+
+        scope = db.info.get(DEPOT_KEY)
+        if scope is not None:
+            depot_ids = [scope]
+        else:
+            placed = set(depot_router.placed_depots())
+            depot_ids = [depot_id for depot_id, in db.query(Depot.id).order_by(Depot.id) if depot_id not in placed]
+        return sum(SnapshotService.export_depot(db, depot_id, now) for depot_id in depot_ids)
+
+    @staticmethod
+    @tracing.traced("SnapshotService.export_depot")
+    def export_depot(db: Session, depot_id: UUID, now: Optional[datetime] = None) -> int:
+        """Append one depot's sales up to the new horizon to its snapshot."""
+        # One exporter per depot across workers; the lock ends with the commit
+        lock = int.from_bytes(hashlib.sha256(b"snapshots:" + depot_id.bytes).digest()[:8], "big", signed=True)
+        if not db.execute(select(func.pg_try_advisory_xact_lock(lock))).scalar():
+            return 0
+        try:
+            return SnapshotService._export(db, depot_id, now or datetime.utcnow())
+        finally:
+            db.commit()
+
+    @staticmethod
+    def _export(db: Session, depot_id: UUID, now: datetime) -> int:
+        directory = _depot_dir(depot_id)
+        os.makedirs(directory, exist_ok=True)
+        state_path = os.path.join(directory, "state.json")
+        state = _load_state(state_path) or {"files": {"transactions": {}, "transaction_items": {}}, "retired": []}
+        horizon = now - timedelta(seconds=settings.ANALYTICS_SNAPSHOT_LAG_SECONDS)
+        if "horizon" in state:
+            start = datetime.fromisoformat(state["horizon"])
+        else:
+            oldest = db.query(func.min(Transaction.created_at)).filter(Transaction.depot_id == depot_id).scalar()
+            start = min(oldest or horizon, horizon)
+            # Sales before the archive cutoff may be gone from the tables, so
+            # ranges reaching back past it aren't routed to the snapshot
+            cutoff = db.query(func.max(TransactionArchive.month_end)).filter(
+                TransactionArchive.depot_id == depot_id
+            ).scalar()
+            state["covers_from"] = (cutoff or datetime.min).isoformat()
+        if start >= horizon:
+            return 0
+
+        # Whatever the previous run replaced is no longer read by anyone
+        for path in state["retired"]:
+            try:
+                os.remove(os.path.join(directory, path))
+            except FileNotFoundError:
+                pass
+        state["retired"] = []
+
+        stamp = horizon.strftime(STAMP_FORMAT)
+        exported = 0
+        month = month_start(start)
+        while month < horizon:
+            end = add_months(month, 1)
+            exported += SnapshotService._export_range(
+                db, depot_id, directory, state, max(start, month), min(end, horizon), stamp
+            )
+            month = end
+        SnapshotService._export_products(db, depot_id, directory, state, stamp)
+        SnapshotService._compact(directory, state, month_start(horizon), stamp)
+
+        state["horizon"] = horizon.isoformat()
+        _write_json(state_path, state)
+        metrics.SNAPSHOT_TRANSACTIONS.inc(exported)
+        return exported
+
+    @staticmethod
+    def _export_range(
+        db: Session, depot_id: UUID, directory: str, state: Dict, start: datetime, end: datetime, stamp: str
+    ) -> int:
+        in_range = and_(
+            Transaction.depot_id == depot_id, Transaction.created_at >= start, Transaction.created_at < end
+        )
+        transactions = db.query(
+            Transaction.id, Transaction.user_id, Transaction.created_at, Transaction.total_amount, Transaction.sale_type
+        ).filter(in_range).all()
+        if not transactions:
+            return 0
+        items = db.query(
+            TransactionItem.transaction_id,
+            TransactionItem.product_id,
+            TransactionItem.quantity,
+            TransactionItem.price_at_sale,
+            TransactionItem.sale_type,
+            Transaction.created_at,
+        ).join(Transaction, TransactionItem.transaction_id == Transaction.id).filter(in_range).all()
+
+        partition = f"month={start:%Y-%m}"
+        tables = {
+            "transactions": pa.table({
+                "id": _uuid_column(row.id for row in transactions),
+                "user_id": _uuid_column(row.user_id for row in transactions),
+                "created_at": pa.array([row.created_at for row in transactions], pa.timestamp("us")),
+                "total_amount": pa.array([row.total_amount for row in transactions], pa.float64()),
+                "sale_type": pa.array([SaleType(row.sale_type).value for row in transactions], pa.string()).dictionary_encode(),
+            }),
+            "transaction_items": pa.table({
+                "transaction_id": _uuid_column(row.transaction_id for row in items),
+                "product_id": _uuid_column(row.product_id for row in items),
+                "quantity": pa.array([row.quantity for row in items], pa.int32()),
+                "price_at_sale": pa.array([row.price_at_sale for row in items], pa.float64()),
+                "sale_type": pa.array([SaleType(row.sale_type).value for row in items], pa.string()).dictionary_encode(),
+                "created_at": pa.array([row.created_at for row in items], pa.timestamp("us")),
+            }),
+        }
+        for name, table in tables.items():
+            path = f"{name}/{partition}/part-{stamp}.parquet"
+            _write_parquet(table, os.path.join(directory, path))
+            state["files"][name].setdefault(partition, []).append(path)
+        return len(transactions)
+
+    @staticmethod
+    def _export_products(db: Session, depot_id: UUID, directory: str, state: Dict, stamp: str) -> None:
+        products = db.query(
+            Product.id, Product.name, Product.sku, Product.category,
+            Product.wholesale_price, Product.retail_price, Product.is_active,
+        ).filter(Product.depot_id == depot_id).all()
+        path = f"products-{stamp}.parquet"
+        _write_parquet(pa.table({
+            "id": _uuid_column(row.id for row in products),
+            "name": pa.array([row.name for row in products], pa.string()),
+            "sku": pa.array([row.sku for row in products], pa.string()),
+            "category": pa.array([row.category for row in products], pa.string()),
+            "wholesale_price": pa.array([row.wholesale_price for row in products], pa.float64()),
+            "retail_price": pa.array([row.retail_price for row in products], pa.float64()),
+            "is_active": pa.array([row.is_active for row in products], pa.bool_()),
+        }), os.path.join(directory, path))
+        if state.get("products"):
+            state["retired"].append(state["products"])
+        state["products"] = path
+
+    @staticmethod
+    def _compact(directory: str, state: Dict, open_month: datetime, stamp: str) -> None:
+        """Fold each closed month's parts into one file."""
+        for name, partitions in state["files"].items():
+            for partition, paths in partitions.items():
+                if len(paths) < 2 or partition >= f"month={open_month:%Y-%m}":
+                    continue
+                path = f"{name}/{partition}/compacted-{stamp}.parquet"
+                _write_parquet(
+                    pa.concat_tables([pq.read_table(os.path.join(directory, part)) for part in paths]),
+                    os.path.join(directory, path),
+                )
+                state["retired"].extend(paths)
+                partitions[partition] = [path]
+
+    @staticmethod
+    def split(
+        db: Session, start: Optional[datetime], end: Optional[datetime], depot_id: Optional[UUID]
+    ) -> Optional[Tuple[object, "ColumnarSales"]]:
+        """
+        Route a long range to the snapshot: a filter for the live
+        transactions after the snapshot horizon and the snapshot's part of
+        the range. None when the range is short or not covered.
+        """
+        if not enabled() or depot_id is None or start is None:
+            return None
+        end = end or datetime.utcnow()
+        if end - start < timedelta(days=settings.ANALYTICS_COLUMNAR_MIN_DAYS):
+            return None
+        state = _cached_state(depot_id)
+        if not state or "horizon" not in state:
+            return None
+        horizon = datetime.fromisoformat(state["horizon"])
+        if not datetime.fromisoformat(state["covers_from"]) <= start < horizon:
+            return None
+        live, archived = ArchiveService.split(db, horizon, end, depot_id)
+        if archived is not None:
+            # The archive reaches past the horizon (the exporter has stalled)
+            return None
+        metrics.COLUMNAR_QUERIES.inc()
+        return (
+            and_(Transaction.created_at >= horizon, live),
+            ColumnarSales(_depot_dir(depot_id), state, start, min(end, horizon)),
+        )
+
+
+class ColumnarSales:
+    """
+    Sales of one depot between ``start`` and ``end`` (inclusive, before the
+    horizon) in a Parquet snapshot, aggregated by DuckDB on demand.
+    """
+
+    def __init__(self, directory: str, state: Dict, start: datetime, end: datetime) -> None:
+        self.start = start
+        self.end = end
+        self.horizon = datetime.fromisoformat(state["horizon"])
+        first, last = f"month={start:%Y-%m}", f"month={end:%Y-%m}"
+        self.files = {
+            name: [
+                os.path.join(directory, path)
+                for partition, paths in partitions.items() if first <= partition <= last
+                for path in paths
+            ]
+            for name, partitions in state["files"].items()
+        }
+
+    def _query(self, table: str, columns: str, group_by: Optional[str] = None) -> List[tuple]:
+        sql = (
+            f"SELECT {columns} FROM read_parquet(?) "
+            "WHERE created_at >= ? AND created_at <= ? AND created_at < ?"
+        )
+        if group_by:
+            sql += f" GROUP BY {group_by}"
+        with tracing.span(f"duckdb.{table}"):
+            cursor = _connection().cursor()
+            try:
+                return cursor.execute(sql, [self.files[table], self.start, self.end, self.horizon]).fetchall()
+            finally:
+                cursor.close()
+
+    def totals(self) -> Tuple[float, int, float, float]:
+        if not self.files["transactions"]:
+            return 0.0, 0, 0.0, 0.0
+        total, count, wholesale, retail = self._query(
+            "transactions",
+            "coalesce(sum(total_amount), 0), count(*), "
+            "coalesce(sum(total_amount) FILTER (WHERE sale_type = 'wholesale'), 0), "
+            "coalesce(sum(total_amount) FILTER (WHERE sale_type = 'retail'), 0)",
+        )[0]
+        return float(total), int(count), float(wholesale), float(retail)
+
+    def by_product(self) -> Dict[UUID, Tuple[float, ...]]:
+        if not self.files["transaction_items"]:
+            return {}
+        rows = self._query(
+            "transaction_items",
+            "product_id, sum(quantity), sum(quantity * price_at_sale), sum(price_at_sale), count(*)",
+            "product_id",
+        )
+        return {UUID(bytes=bytes(row[0])): tuple(float(value) for value in row[1:]) for row in rows}
+
+    def by_user(self) -> Dict[UUID, Tuple[float, ...]]:
+        if not self.files["transactions"]:
+            return {}
+        rows = self._query(
+            "transactions",
+            "user_id, sum(total_amount), count(*), "
+            "coalesce(sum(total_amount) FILTER (WHERE sale_type = 'wholesale'), 0), "
+            "coalesce(sum(total_amount) FILTER (WHERE sale_type = 'retail'), 0)",
+            "user_id",
+        )
+        return {UUID(bytes=bytes(row[0])): tuple(float(value) for value in row[1:]) for row in rows}
+
+
+# One in-process DuckDB database per worker; each query takes its own cursor
+_lock = threading.Lock()
+_duckdb = None
+_states: Dict[UUID, Tuple[float, Dict]] = {}
+
+
+def _connection():
+    global _duckdb
+    with _lock:
+        if _duckdb is None:
+            _duckdb = duckdb.connect(":memory:", config={"threads": settings.ANALYTICS_DUCKDB_THREADS})
+        return _duckdb
+
+
+def _load_state(path: str) -> Optional[Dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _cached_state(depot_id: UUID) -> Optional[Dict]:
+    """The depot's ``state.json``, re-read when the exporter replaces it."""
+    path = os.path.join(_depot_dir(depot_id), "state.json")
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+    with _lock:
+        cached = _states.get(depot_id)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    state = _load_state(path)
+    with _lock:
+        _states[depot_id] = (mtime, state)
+    return state
@@ -0,0 +1,144 @@
+import random
+import uuid
+from typing import List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import bindparam, delete, select, text, update
+from sqlalchemy.orm import Session
+from app.core import metrics
+from app.models.product import Product, ProductStockShard
+
+# Take from a shard nobody else holds, starting at a random one. The RETURNING
+# subquery sums the shards as of the statement's snapshot (without this
+# decrement), which is close enough for low-stock alerts.
+_TAKE_ANY_FREE = text("""
+UPDATE product_stock_shards SET quantity = quantity - :quantity
+WHERE product_id = :product_id AND shard = (
+    SELECT shard FROM product_stock_shards
+    WHERE product_id = :product_id AND quantity >= :quantity
+    ORDER BY random() LIMIT 1
+    FOR NO KEY UPDATE SKIP LOCKED
+)
+RETURNING (SELECT sum(quantity) FROM product_stock_shards WHERE product_id = :product_id) AS total
+""")
+# Every shard with enough stock is busy: queue on the fullest one
+_TAKE_FULLEST = text("""
+UPDATE product_stock_shards SET quantity = quantity - :quantity
+WHERE product_id = :product_id AND shard = (
+    SELECT shard FROM product_stock_shards
+    WHERE product_id = :product_id AND quantity >= :quantity
+    ORDER BY quantity DESC LIMIT 1
+    FOR NO KEY UPDATE
+)
+RETURNING (SELECT sum(quantity) FROM product_stock_shards WHERE product_id = :product_id) AS total
+""")
+
+def even_split(total: int, shards: int) -> List[int]:
+    return [total // shards + (1 if i < total % shards else 0) for i in range(shards)]
+
+class StockShardService:
+    """
+    Sharded stock for hot products. Lock order: the products row (when it is
+    locked at all), then shards by shard number. Sales only lock one shard.
+    """
+
+    @staticmethod
+    def take(db: Session, product_id: uuid.UUID, quantity: int) -> Tuple[bool, int]:
+        """
+        Take ``quantity`` units from the product's shards. Returns whether it
+        succeeded and the product's total stock before the sale.
+        """
+        params = {"product_id": product_id, "quantity": quantity}
+        row = db.execute(_TAKE_ANY_FREE, params).first()
+        if row is not None:
+            metrics.STOCK_SHARD_TAKES.labels("free").inc()
+            return True, row.total
+        row = db.execute(_TAKE_FULLEST, params).first()
+        if row is not None:
+            metrics.STOCK_SHARD_TAKES.labels("wait").inc()
+            return True, row.total
+        # No single shard has enough: pool them (rare, only near the bottom)
+        shards = StockShardService._lock_shards(db, product_id)
+        total = sum(shards)
+        if total < quantity:
+            metrics.STOCK_SHARD_TAKES.labels("out_of_stock").inc()
+            return False, total
+        metrics.STOCK_SHARD_TAKES.labels("consolidate").inc()
+        StockShardService._write(db, product_id, even_split(total - quantity, len(shards)))
+        return True, total
+
+    @staticmethod
+    def _lock_shards(db: Session, product_id: uuid.UUID) -> List[int]:
+        return list(db.execute(
+            select(ProductStockShard.quantity)
+            .where(ProductStockShard.product_id == product_id)
+            .order_by(ProductStockShard.shard)
+            .with_for_update(key_share=True)
+        ).scalars())
+
+    @staticmethod
+    def _write(db: Session, product_id: uuid.UUID, quantities: List[int]) -> None:
+        db.connection().execute(
+            update(ProductStockShard)
+            .where(ProductStockShard.product_id == product_id, ProductStockShard.shard == bindparam("b_shard"))
+            .values(quantity=bindparam("b_quantity")),
+            [{"b_shard": shard, "b_quantity": quantity} for shard, quantity in enumerate(quantities)],
+        )
+
+    @staticmethod
+    def _lock_product(db: Session, product_id: uuid.UUID, depot_id: Optional[uuid.UUID] = None) -> Product:
+        query = db.query(Product).filter(Product.id == product_id)
+        if depot_id is not None:
+            query = query.filter(Product.depot_id == depot_id)
+        product = query.with_for_update(key_share=True).populate_existing().first()
+        if product is None:
+            raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+        return product
+
+    @staticmethod
+    def configure(db: Session, product_id: uuid.UUID, shards: int, depot_id: Optional[uuid.UUID] = None) -> Product:
+        """Spread the product's stock over ``shards`` rows (0 folds it back into the product row)."""
+        product = StockShardService._lock_product(db, product_id, depot_id)
+        total = sum(StockShardService._lock_shards(db, product_id)) if product.stock_shards else product.stock_quantity
+        db.execute(delete(ProductStockShard).where(ProductStockShard.product_id == product_id))
+        if shards:
+            db.add_all([
+                ProductStockShard(product_id=product_id, shard=shard, quantity=quantity)
+                for shard, quantity in enumerate(even_split(total, shards))
+            ])
+        product.stock_shards = shards
+        product.stock_quantity = total
+        db.commit()
+        return product
+
+    @staticmethod
+    def rebalance(db: Session, product_id: uuid.UUID) -> bool:
+        """
+        Copy the shard total to ``stock_quantity`` and even out the shards once
+        one has drained below half its share. Returns whether anything changed.
+        """
+        product = StockShardService._lock_product(db, product_id)
+        if not product.stock_shards:
+            return False
+        shards = StockShardService._lock_shards(db, product_id)
+        total = sum(shards)
+        changed = product.stock_quantity != total
+        product.stock_quantity = total
+        if min(shards) * 2 * len(shards) < total:
+            StockShardService._write(db, product_id, even_split(total, len(shards)))
+            metrics.STOCK_SHARD_REBALANCES.inc()
+            changed = True
+        return changed
+
+    @staticmethod
+    def rebalance_all(db: Session) -> int:
+        """Rebalance every sharded product, one short transaction each."""
+        product_ids = [row.id for row in db.query(Product.id).filter(Product.stock_shards > 0).all()]
+        db.commit()
+        # Random order, so workers rebalancing at the same moment don't queue behind each other
+        random.shuffle(product_ids)
+        changed = 0
+        for product_id in product_ids:
+            changed += StockShardService.rebalance(db, product_id)
+            db.commit()
+        return changed
+
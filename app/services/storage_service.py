@@ -1,7 +1,11 @@
 import logging
+import os
+import shutil
+import time
 import boto3
 from botocore.exceptions import ClientError
 from fastapi import UploadFile
+from app.core import metrics, tracing
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -31,17 +35,20 @@ class StorageService:
             region_name=self.region_name,
         )
 
+    @tracing.traced("storage.upload_image")
     def upload_image(self, file: UploadFile, file_name: str) -> str:
         """
         Uploads an image to S3/R2 Storage and returns the public URL.
         """
         try:
+            start = time.perf_counter()
             self.s3_client.upload_fileobj(
                 file.file,
                 self.bucket_name,
                 file_name,
                 ExtraArgs={"ContentType": file.content_type},
             )
+            metrics.STORAGE_UPLOAD_DURATION.observe(time.perf_counter() - start)
 
             # Construct the public URL.
             # For R2, this is typically https://<public_domain>/<file_name>
@@ -55,9 +62,11 @@ class StorageService:
             return public_url
 
         except ClientError as e:
+            metrics.STORAGE_UPLOAD_FAILURES.inc()
             logger.error(f"Failed to upload image to S3/R2: {e}")
             raise e
 
+    @tracing.traced("storage.delete_image")
     def delete_image(self, file_url: str) -> None:
         """
         Deletes an image from S3/R2 Storage given its public URL.
@@ -77,6 +86,20 @@ class StorageService:
             logger.error(f"Failed to delete image from S3/R2: {e}")
             # We log the error but do not raise it, so the product deletion can proceed
 
+    @tracing.traced("storage.put_object")
+    def put_object(self, key: str, data: bytes, content_type: str = "application/octet-stream") -> None:
+        """
+        Stores private (non-image) data, e.g. transaction archives, under ``key``.
+        """
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=key, Body=data, ContentType=content_type)
+
+    @tracing.traced("storage.get_object")
+    def get_object(self, key: str) -> bytes:
+        """
+        Reads back data stored with ``put_object``.
+        """
+        return self.s3_client.get_object(Bucket=self.bucket_name, Key=key)["Body"].read()
+
     def check_connection(self):
         """
         Verifies connection to the storage bucket.
@@ -99,4 +122,48 @@ class StorageService:
             else:
                 logger.error(f"❌ Storage connection failed: {e}")
         except Exception as e:
-            logger.error(f"❌ Storage connection failed with unexpected error: {e}")
\ No newline at end of file
+            logger.error(f"❌ Storage connection failed with unexpected error: {e}")
+
+
+class LocalStorageService:
+    """
+    Stores images on local disk under ``LOCAL_STORAGE_DIR`` (served from
+    ``/static``). Used in development and load tests so uploads don't depend
+    on S3/R2.
+    """
+
+    def __init__(self):
+        self.directory = settings.LOCAL_STORAGE_DIR
+        os.makedirs(self.directory, exist_ok=True)
+
+    @tracing.traced("storage.upload_image")
+    def upload_image(self, file: UploadFile, file_name: str) -> str:
+        start = time.perf_counter()
+        try:
+            with open(os.path.join(self.directory, os.path.basename(file_name)), "wb") as out:
+                shutil.copyfileobj(file.file, out)
+        except OSError as e:
+            metrics.STORAGE_UPLOAD_FAILURES.inc()
+            logger.error("Failed to write image to local storage: %s", e)
+            raise
+        metrics.STORAGE_UPLOAD_DURATION.observe(time.perf_counter() - start)
+        return f"{settings.LOCAL_STORAGE_URL_PREFIX.rstrip('/')}/{file_name}"
+
+    @tracing.traced("storage.delete_image")
+    def delete_image(self, file_url: str) -> None:
+        if not file_url:
+            return
+        try:
+            os.remove(os.path.join(self.directory, file_url.split("/")[-1]))
+        except OSError as e:
+            logger.error("Failed to delete image from local storage: %s", e)
+
+    def check_connection(self):
+        logger.info("Using local storage in '%s'.", self.directory)
+
+
+def get_storage_service():
+    """Storage backend selected by ``STORAGE_BACKEND``."""
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorageService()
+    return StorageService()
@@ -0,0 +1,82 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, selectinload
+from app.core import tracing
+from app.models.transaction import SaleType, Transaction, TransactionItem
+
+def encode_cursor(transaction: Transaction) -> str:
+    raw = f"{transaction.created_at.isoformat()}|{transaction.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        created_at, transaction_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), UUID(transaction_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+class TransactionService:
+    @staticmethod
+    @tracing.traced("TransactionService.history")
+    def history(
+        db: Session,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        user_id: Optional[UUID] = None,
+        sale_type: Optional[SaleType] = None,
+        product_id: Optional[UUID] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        depot_id: Optional[UUID] = None,
+    ) -> Tuple[List[Transaction], Optional[str]]:
+        """
+        Transactions newest first, with their items, one page at a time.
+        Pages are keyed on (created_at, id), so a page costs the same however
+        deep it is and rows committed meanwhile don't shift later pages.
+        Returns the page and the cursor of the next one.
+        """
+        query = db.query(Transaction).options(selectinload(Transaction.items))
+        if depot_id is not None:
+            query = query.filter(Transaction.depot_id == depot_id)
+        if start_date is not None:
+            query = query.filter(Transaction.created_at >= start_date)
+        if end_date is not None:
+            query = query.filter(Transaction.created_at <= end_date)
+        if user_id is not None:
+            query = query.filter(Transaction.user_id == user_id)
+        if sale_type is not None:
+            query = query.filter(Transaction.sale_type == sale_type)
+        if product_id is not None:
+            query = query.filter(
+                db.query(TransactionItem.id)
+                .filter(TransactionItem.transaction_id == Transaction.id, TransactionItem.product_id == product_id)
+                .exists()
+            )
+        if cursor is not None:
+            query = query.filter(tuple_(Transaction.created_at, Transaction.id) < decode_cursor(cursor))
+
+        # One extra row tells whether there is a next page
+        rows = query.order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(limit + 1).all()
+        page = rows[:limit]
+        next_cursor = encode_cursor(page[-1]) if len(rows) > limit else None
+        return page, next_cursor
+
+    @staticmethod
+    def get(
+        db: Session, transaction_id: UUID, depot_id: Optional[UUID] = None, user_id: Optional[UUID] = None
+    ) -> Transaction:
+        """One transaction with its items; 404 if it isn't in ``depot_id`` or by ``user_id``."""
+        query = db.query(Transaction).options(selectinload(Transaction.items)).filter(Transaction.id == transaction_id)
+        if depot_id is not None:
+            query = query.filter(Transaction.depot_id == depot_id)
+        if user_id is not None:
+            query = query.filter(Transaction.user_id == user_id)
+        transaction = query.first()
+        if transaction is None:
+            raise HTTPException(status_code=404, detail=f"Transaction {transaction_id} not found")
+        return transaction
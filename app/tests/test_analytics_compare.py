@@ -0,0 +1,41 @@
+import pytest
+from datetime import datetime, timedelta
+from app.db.instrumentation import query_budget
+from app.models.transaction import SaleType, Transaction
+from app.schemas.transaction import TransactionItemCreate
+from app.services.analytics_service import AnalyticsService
+from app.services.sale_service import SaleService
+from app.tests.test_sale_service import create_test_product, create_test_user
+
+def test_compare_splits_one_scan_into_periods(db):
+    user = create_test_user(db)
+    product = create_test_product(db, stock=20)
+    for quantity, age in ((2, timedelta(days=10)), (3, timedelta(days=1))):
+        items = [TransactionItemCreate(product_id=str(product.id), quantity=quantity)]
+        transaction = SaleService.process_sale(db, user, items, SaleType.RETAIL)
+        db.query(Transaction).filter(Transaction.id == transaction.id).update(
+            {Transaction.created_at: datetime.utcnow() - age}
+        )
+    db.commit()
+    end = datetime.utcnow()
+    start = end - timedelta(days=7)
+
+    # One scan, plus the archive manifest when this worker's copy is stale
+    with query_budget(2):
+        products = AnalyticsService.compare_product_sales(db, start, end)
+    row = next(p for p in products.products if p.product_id == str(product.id))
+    assert (row.quantity_sold, row.previous_quantity_sold) == (3, 2)
+    assert (row.revenue_change.absolute, row.revenue_change.percent) == (15.0, 50.0)
+
+    # Every figure matches two separate single-period calls
+    with query_budget(1):
+        sales = AnalyticsService.compare_sales_metrics(db, start, end)
+    assert sales.current.model_dump() == pytest.approx(AnalyticsService.get_sales_metrics(db, start, end).model_dump())
+    previous = AnalyticsService.get_sales_metrics(db, start - (end - start), start - timedelta(microseconds=1))
+    assert sales.previous.total_transactions == previous.total_transactions
+    assert sales.previous.total_sales == pytest.approx(previous.total_sales)
+
+    with query_budget(1):
+        employees = AnalyticsService.compare_employee_sales(db, start, end)
+    cashier = next(e for e in employees.employees if e.user_id == str(user.id))
+    assert cashier.transaction_count >= 1 and cashier.previous_transaction_count >= 1
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+import numpy as np
+from app.core.config import settings
+from app.models.archive import TransactionArchive
+from app.models.product import Product
+from app.models.stock_alert import StockAlert, StockAlertKind
+from app.models.transaction import SaleType, Transaction, TransactionItem
+from app.models.user import User, UserRole
+from app.services.analytics_service import AnalyticsService
+from app.services.archive_service import ArchiveService, ArchivedSales, add_months, month_start
+from app.tests.test_depots import create_other_depot
+
+def add_sale(db, user, product, created_at, quantity, sale_type=SaleType.RETAIL):
+    price = product.wholesale_price if sale_type == SaleType.WHOLESALE else product.retail_price
+    transaction = Transaction(
+        depot_id=user.depot_id, user_id=user.id, total_amount=quantity * price, sale_type=sale_type, created_at=created_at
+    )
+    transaction.items = [
+        TransactionItem(product_id=product.id, quantity=quantity, price_at_sale=price, sale_type=sale_type)
+    ]
+    db.add(transaction)
+    db.commit()
+    return transaction
+
+def test_closed_months_move_to_the_archive_and_stay_in_analytics(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ARCHIVE_BACKEND", "local")
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "ARCHIVE_DELETE_BATCH", 2)
+    depot = create_other_depot(db)
+    user = User(username=f"cashier-{depot.code}", hashed_password="x", role=UserRole.STAFF, depot_id=depot.id)
+    product = Product(name="Archived Water", wholesale_price=10.0, retail_price=15.0, stock_quantity=50,
+                      low_stock_threshold=2, depot_id=depot.id)
+    db.add_all([user, product])
+    db.commit()
+
+    now = datetime.utcnow()
+    old_month = add_months(month_start(now), -15)
+    old = [
+        add_sale(db, user, product, old_month + timedelta(days=2), 2),
+        add_sale(db, user, product, old_month + timedelta(days=9), 4, SaleType.WHOLESALE),
+        add_sale(db, user, product, old_month + timedelta(days=20), 1),
+    ]
+    add_sale(db, user, product, now - timedelta(days=3), 3)
+    alert = StockAlert(product_id=product.id, transaction_id=old[0].id, kind=StockAlertKind.LOW_STOCK,
+                       stock_quantity=1, low_stock_threshold=2)
+    db.add(alert)
+    db.commit()
+
+    start = old_month - timedelta(days=1)
+
+    def figures():
+        return (
+            AnalyticsService.get_sales_metrics(db, start, now, depot.id).model_dump(),
+            AnalyticsService.get_daily_sales(db, (now - start).days, depot.id),
+            AnalyticsService.get_product_sales(db, start, now, depot.id).model_dump(),
+            AnalyticsService.get_employee_sales(db, start, now, depot.id).model_dump(),
+            AnalyticsService.compare_sales_metrics(db, old_month + timedelta(days=5), now, depot.id).model_dump(),
+            AnalyticsService.compare_product_sales(db, old_month + timedelta(days=5), now, depot.id).model_dump(),
+            AnalyticsService.get_dashboard_analytics(db, start, now, depot.id).model_dump(),
+        )
+
+    expected = figures()
+    assert expected[0]["total_transactions"] == 4
+    assert expected[0]["wholesale_sales"] == 40.0
+
+    try:
+        archived = ArchiveService.archive_closed_months(db, now=now, depot_ids=[depot.id])
+        assert [(entry.month, entry.transaction_count, entry.item_count) for entry in archived] == [
+            (old_month.date(), 3, 3)
+        ]
+        assert (tmp_path / archived[0].key).exists()
+        # Still in the tables, but analytics read the month from the file only
+        assert figures() == expected
+        assert ArchiveService.archive_closed_months(db, now=now, depot_ids=[depot.id]) == []
+
+        # Rows stay until every worker's cached manifest has caught up
+        assert ArchiveService.purge_archived(db, now=now) == 0
+        assert ArchiveService.purge_archived(db, now=now + timedelta(hours=1)) == 3
+        assert db.query(Transaction).filter(Transaction.depot_id == depot.id).count() == 1
+        db.refresh(alert)
+        assert alert.transaction_id is None
+        ArchiveService.clear_caches()
+        assert figures() == expected
+    finally:
+        db.query(TransactionArchive).filter(TransactionArchive.depot_id == depot.id).delete()
+        db.commit()
+        ArchiveService.clear_caches()
+
+def test_archived_sales_filters_keep_items_with_their_transactions():
+    ids = [bytes([n]) * 16 for n in range(1, 4)]
+    frame = ArchivedSales(
+        {
+            "id": np.frombuffer(b"".join(ids), dtype=np.uint8).reshape(-1, 16),
+            "user_id": np.zeros((3, 16), dtype=np.uint8),
+            "created_at": np.array(["2025-01-01", "2025-01-02", "2025-01-03"], dtype="datetime64[us]"),
+            "total_amount": np.array([10.0, 20.0, 30.0]),
+            "sale_type": np.array([0, 1, 1], dtype=np.int8),
+        },
+        {
+            "transaction": np.array([0, 1, 1, 2]),
+            "product_id": np.array([[1] * 16, [1] * 16, [2] * 16, [2] * 16], dtype=np.uint8),
+            "quantity": np.array([1, 2, 3, 4]),
+            "price_at_sale": np.array([10.0, 5.0, 10.0 / 3, 7.5]),
+            "sale_type": np.array([0, 1, 1, 1], dtype=np.int8),
+        },
+    )
+    later = ArchivedSales.from_bytes(frame.to_bytes()).since(datetime(2025, 1, 2))
+    assert later.totals() == (50.0, 2, 0.0, 50.0)
+    assert list(later.items["transaction"]) == [0, 0, 1]
+    assert sorted(q for q, *_ in later.by_product().values()) == [2.0, 7.0]
+
+    both = ArchivedSales.concat([frame.before(datetime(2025, 1, 2)), later])
+    assert both.totals() == frame.totals()
+    assert sorted(both.daily().values()) == [(10.0, 1), (20.0, 1), (30.0, 1)]
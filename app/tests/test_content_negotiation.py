@@ -0,0 +1,73 @@
+import asyncio
+import gzip
+import json
+import zlib
+import pytest
+from starlette.responses import StreamingResponse
+from app.core.content_negotiation import ContentNegotiationMiddleware, choose_encoding
+from app.core.serialization import JSONBytesResponse, model_response
+from app.schemas.product import ProductResponse
+
+ROWS = [
+    {"id": f"{n:032x}", "name": f"Water {n}", "wholesale_price": 10.0, "retail_price": 15.0, "stock_quantity": n}
+    for n in range(200)
+]
+
+def _request(app, **headers):
+    """Run ``app`` behind the middleware; returns (response headers, body messages)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1", "method": "GET",
+        "path": "/", "raw_path": b"/", "query_string": b"", "root_path": "",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(ContentNegotiationMiddleware(app)(scope, receive, send))
+    start, *bodies = messages
+    return {name.decode(): value.decode() for name, value in start["headers"]}, [m["body"] for m in bodies]
+
+def test_large_bodies_are_compressed_and_small_ones_left_alone():
+    body = json.dumps(ROWS).encode()
+    headers, chunks = _request(JSONBytesResponse(body), accept_encoding="gzip, deflate")
+    assert headers["content-encoding"] == "gzip" and "Accept-Encoding" in headers["vary"]
+    assert int(headers["content-length"]) == len(chunks[0]) < len(body) / 4
+    assert gzip.decompress(chunks[0]) == body
+
+    headers, chunks = _request(JSONBytesResponse(b'{"ok": true}'), accept_encoding="gzip")
+    assert "content-encoding" not in headers and chunks == [b'{"ok": true}']
+    headers, _ = _request(JSONBytesResponse(body), accept_encoding="gzip;q=0, identity")
+    assert "content-encoding" not in headers
+    assert choose_encoding("br;q=0, gzip;q=0.5") == "gzip"
+
+def test_streamed_bodies_are_compressed_chunk_by_chunk():
+    lines = [b"product,quantity\n", *(f"Water {n},{n}\n".encode() for n in range(300))]
+    parts = [lines[0], b"".join(lines[1:150]), b"".join(lines[150:])]
+    headers, chunks = _request(StreamingResponse(iter(parts), media_type="text/csv"), accept_encoding="gzip")
+    assert headers["content-encoding"] == "gzip" and "content-length" not in headers
+
+    # The short header line waits for more; after that every chunk decodes on arrival
+    decoder = zlib.decompressobj(31)
+    assert decoder.decompress(chunks[0]) == parts[0] + parts[1]
+    assert decoder.decompress(b"".join(chunks[1:])) == parts[2]
+
+    # Server-sent events are never held back
+    events = [b"event: snapshot\ndata: {}\n\n"]
+    headers, chunks = _request(StreamingResponse(iter(events), media_type="text/event-stream"), accept_encoding="gzip")
+    assert "content-encoding" not in headers and chunks[0] == events[0]
+
+def test_msgpack_is_served_when_asked_for():
+    msgpack = pytest.importorskip("msgpack")
+
+    async def app(scope, receive, send):
+        await model_response(ProductResponse, ROWS)(scope, receive, send)
+
+    headers, chunks = _request(app, accept="application/msgpack")
+    assert headers["content-type"] == "application/msgpack" and headers["vary"] == "Accept"
+    as_json = json.loads(b"".join(_request(app, accept="application/json")[1]))
+    assert msgpack.unpackb(b"".join(chunks)) == as_json
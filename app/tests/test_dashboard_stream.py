@@ -0,0 +1,56 @@
+import json
+from datetime import datetime
+from app.services.dashboard_stream import DashboardFeed
+
+def _feed():
+    feed = DashboardFeed(30)
+    feed.as_of = datetime(2026, 3, 1, 12, 0)
+    feed.products = {"a": ["Refill", 10, 100.0], "b": ["Gallon", 1, 40.0]}
+    # Small sellers filling the rest of the top five, and one below it
+    feed.products.update({f"s{i}": [f"Cap {i}", 1, 5.0 - i] for i in range(4)})
+    feed.state = {
+        "total_revenue": 140.0,
+        "total_transactions": 4,
+        "average_transaction_value": 35.0,
+        "revenue_breakdown": {
+            "wholesale_revenue": 40.0, "retail_revenue": 100.0, "total_revenue": 140.0,
+            "wholesale_percentage": 40 / 140 * 100, "retail_percentage": 100 / 140 * 100,
+        },
+        "top_products": feed._top_products(),
+        "date_range_end": "2026-03-01T12:00:00",
+    }
+    return feed
+
+def _sale(created_at, items, sale_type="wholesale"):
+    return {
+        "transaction_id": "t1", "sale_type": sale_type, "created_at": created_at,
+        "total_amount": sum(line[3] for line in items) if items else 50.0, "items": items,
+    }
+
+def _data(event):
+    return json.loads(event.split("data: ", 1)[1])
+
+def test_apply_folds_sale_into_totals_and_top_products():
+    feed = _feed()
+    event = feed.apply(_sale("2026-03-01T12:00:05", [["b", "Gallon", 2, 80.0]]))
+
+    assert event.startswith("event: delta\n")
+    delta = _data(event)
+    assert delta["total_revenue"] == 220.0
+    assert delta["total_transactions"] == 5
+    assert delta["revenue_breakdown"]["wholesale_revenue"] == 120.0
+    assert [p["product_id"] for p in delta["top_products"]][:2] == ["b", "a"]
+    assert feed.state["top_products"] == delta["top_products"]
+
+    # A sale outside the top five: the delta leaves top_products out
+    delta = _data(feed.apply(_sale("2026-03-01T12:00:06", [["s3", "Cap 3", 1, 0.5]], "retail")))
+    assert "top_products" not in delta
+    assert delta["revenue_breakdown"]["retail_revenue"] == 100.5
+
+def test_apply_skips_snapshotted_sales_and_flags_unannounced_items():
+    feed = _feed()
+    assert feed.apply(_sale("2026-03-01T11:59:59", [["a", "Refill", 1, 10.0]])) is None
+    assert feed.state["total_transactions"] == 4
+
+    assert feed.apply(_sale("2026-03-01T12:00:05", None)) is None
+    assert feed.stale
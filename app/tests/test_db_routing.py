@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import InternalError, ProgrammingError
+from app.db.session import AnalyticsSessionLocal, RecentWrites
+
+def test_recent_writes_expire_after_window(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.db.session.time.monotonic", lambda: now[0])
+    writes = RecentWrites(window=5.0)
+
+    writes.mark("cashier@waterdepot.com")
+    assert writes.recent("cashier@waterdepot.com")
+    assert not writes.recent("owner@waterdepot.com")
+    assert not writes.recent(None)
+    now[0] += 5.0
+    assert not writes.recent("cashier@waterdepot.com")
+
+def test_analytics_sessions_are_read_only():
+    db = AnalyticsSessionLocal()
+    try:
+        assert db.execute(text("SHOW transaction_read_only")).scalar() == "on"
+        with pytest.raises((InternalError, ProgrammingError)):
+            db.execute(text("CREATE TEMP TABLE analytics_write_probe (id int)"))
+    finally:
+        db.close()
+
+def _dependency_calls(dependant):
+    for sub in dependant.dependencies:
+        yield sub.call
+        yield from _dependency_calls(sub)
+
+def test_replica_routes_never_check_out_a_primary_session():
+    from app.api.v1 import deps
+    from app.api.v1.endpoints import analytics, products, transactions, users
+
+    replica_routes = 0
+    for module in (analytics, products, transactions, users):
+        for route in module.router.routes:
+            calls = set(_dependency_calls(route.dependant))
+            if calls & {deps.get_read_db, deps.get_analytics_db}:
+                replica_routes += 1
+                assert deps.get_db not in calls, route.path
+    assert replica_routes > 10
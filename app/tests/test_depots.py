@@ -0,0 +1,81 @@
+import uuid
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from app.db.depot_routing import DepotRouter
+from app.models.depot import DEFAULT_DEPOT_ID, Depot
+from app.models.product import Product
+from app.models.transaction import SaleType
+from app.models.user import User
+from app.schemas.transaction import StockHoldItem, TransactionItemCreate
+from app.services.analytics_service import AnalyticsService
+from app.services.hold_service import HoldService
+from app.services.sale_service import SaleService
+from app.tests.test_sale_service import create_test_product, create_test_user
+
+def create_other_depot(db):
+    depot = Depot(name="Test depot", code=f"test-{uuid.uuid4().hex[:8]}")
+    db.add(depot)
+    db.commit()
+    return depot
+
+def test_products_of_other_depots_cannot_be_sold_or_seen(db):
+    user = create_test_user(db)
+    assert user.depot_id == DEFAULT_DEPOT_ID
+    depot = create_other_depot(db)
+    product = create_test_product(db, stock=10)
+    product.depot_id = depot.id
+    db.commit()
+
+    items = [TransactionItemCreate(product_id=str(product.id), quantity=1)]
+    with pytest.raises(HTTPException) as exc:
+        SaleService.process_sale(db, user, items, SaleType.RETAIL)
+    assert exc.value.status_code == 404
+    db.rollback()
+    with pytest.raises(HTTPException) as exc:
+        HoldService.place_holds(db, user, [StockHoldItem(product_id=str(product.id), quantity=1)])
+    assert exc.value.status_code == 404
+    db.rollback()
+
+    ours = {item.product_id for item in AnalyticsService.get_inventory_analytics(db, user.depot_id).products}
+    theirs = {item.product_id for item in AnalyticsService.get_inventory_analytics(db, depot.id).products}
+    assert str(product.id) not in ours
+    assert theirs == {str(product.id)}
+    db.refresh(product)
+    assert product.stock_quantity == 10
+
+def test_sales_are_recorded_against_the_cashier_depot(db):
+    user = create_test_user(db)
+    product = create_test_product(db, stock=10)
+    items = [TransactionItemCreate(product_id=str(product.id), quantity=3)]
+    transaction = SaleService.process_sale(db, user, items, SaleType.RETAIL)
+    assert transaction.depot_id == user.depot_id
+    assert product.depot_id == user.depot_id
+
+def test_router_places_depots_on_their_engines():
+    schema_depot, url_depot = uuid.uuid4(), uuid.uuid4()
+    created = []
+
+    def factory(url, name):
+        created.append((url, name))
+        return create_engine(url)
+
+    router = DepotRouter({str(schema_depot): "#depot_b", str(url_depot): "sqlite://#depot_c"}, factory)
+    default = create_engine("sqlite://").execution_options(postgresql_readonly=True)
+    products, users = Product.__mapper__, User.__mapper__
+
+    assert router.route(None, products, None, default) is default
+    assert router.route(uuid.uuid4(), products, None, default) is default
+    # Users and depots stay on the default database
+    assert router.route(schema_depot, users, None, default) is default
+
+    in_schema = router.route(schema_depot, products, None, default)
+    assert in_schema.get_execution_options()["schema_translate_map"] == {None: "depot_b"}
+    assert in_schema.get_execution_options()["postgresql_readonly"] is True
+    assert in_schema.url == default.url
+
+    elsewhere = router.route(url_depot, products, None, default)
+    assert router.route(url_depot, users, Product.__table__.select(), default) is elsewhere
+    assert elsewhere.get_execution_options()["schema_translate_map"] == {None: "depot_c"}
+    assert created == [("sqlite://", f"depot-{url_depot}")]
+    assert sorted(router.placed_depots()) == sorted([schema_depot, url_depot])
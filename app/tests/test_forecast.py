@@ -0,0 +1,40 @@
+import numpy as np
+from app.models.transaction import SaleType
+from app.schemas.transaction import TransactionItemCreate
+from app.services.forecast_service import ForecastService, compute_reorder
+from app.services.sale_service import SaleService
+from app.tests.test_outbox import make_dispatcher
+from app.tests.test_sale_service import create_test_product, create_test_user
+
+def test_compute_reorder_figures():
+    sales = np.array([
+        [2.0, 2.0, 2.0, 2.0],  # steady
+        [0.0, 1.0, 2.0, 3.0],  # rising
+        [0.0, 0.0, 0.0, 0.0],  # not selling
+    ])
+    available = np.array([20.0, 20.0, 5.0])
+    figures = compute_reorder(sales, available, lead_time_days=2, cover_days=5)
+
+    np.testing.assert_allclose(figures["velocity"], [2.0, 1.5, 0.0])
+    np.testing.assert_allclose(figures["trend"], [0.0, 1.0, 0.0])
+    # The rising product's trend line reaches 3/day today
+    np.testing.assert_allclose(figures["demand"], [2.0, 3.0, 0.0])
+    assert figures["days_of_cover"][0] == 10.0 and np.isinf(figures["days_of_cover"][2])
+    assert figures["suggested"][0] == 0  # 20 on hand covers 2 days of lead time + 5 days at 2/day
+    assert figures["reorder"].tolist() == [False, False, False]
+    figures = compute_reorder(sales, np.array([3.0, 3.0, 0.0]), lead_time_days=2, cover_days=5)
+    assert figures["reorder"].tolist() == [True, True, False]
+
+def test_reorder_forecast_ranks_products_running_out(db):
+    user = create_test_user(db)
+    product = create_test_product(db, stock=12)
+    SaleService.process_sale(db, user, [TransactionItemCreate(product_id=str(product.id), quantity=10)], SaleType.RETAIL)
+    # The forecast reads the sales rollup, which the outbox feeds
+    make_dispatcher().dispatch_pending(db)
+
+    forecast = ForecastService.reorder_forecast(db, days=7, lead_time_days=7, cover_days=7, limit=1000)
+    suggestion = next(s for s in forecast.suggestions if s.product_id == str(product.id))
+    assert suggestion.available_stock == 2
+    assert suggestion.suggested_quantity > 0
+    covers = [s.days_of_cover for s in forecast.suggestions]
+    assert covers == sorted(covers)
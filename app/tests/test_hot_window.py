@@ -0,0 +1,77 @@
+from datetime import date, datetime, timedelta
+from app.core.config import settings
+from app.models.product import Product
+from app.models.transaction import SaleType
+from app.models.user import User, UserRole
+from app.services.analytics_service import AnalyticsService
+from app.services.hot_window import LINE_BYTES, hot_window
+from app.tests.test_archive import add_sale
+from app.tests.test_depots import create_other_depot
+
+def _announced(depot, user, product, created_at, quantity, transaction_id="t1"):
+    return {
+        "transaction_id": transaction_id, "depot_id": str(depot.id), "user_id": str(user.id), "sale_type": "retail",
+        "total_amount": quantity * product.retail_price, "created_at": created_at.isoformat(),
+        "items": [[str(product.id), product.name, quantity, quantity * product.retail_price]],
+    }
+
+def test_recent_ranges_are_answered_from_the_in_memory_window(db, monkeypatch):
+    depot = create_other_depot(db)
+    user = User(username=f"cashier-{depot.code}", hashed_password="x", role=UserRole.STAFF, depot_id=depot.id)
+    water = Product(name="Hot Water", wholesale_price=10.0, retail_price=15.0, stock_quantity=50,
+                    low_stock_threshold=2, depot_id=depot.id)
+    ice = Product(name="Hot Ice", wholesale_price=4.0, retail_price=5.0, stock_quantity=50,
+                  low_stock_threshold=2, depot_id=depot.id)
+    db.add_all([user, water, ice])
+    db.commit()
+
+    # Ahead of every other test's sales, so a short window holds only these
+    now = datetime.utcnow() + timedelta(days=30)
+    add_sale(db, user, water, now - timedelta(days=2), 2)
+    add_sale(db, user, ice, now - timedelta(days=1), 3, SaleType.WHOLESALE)
+    last = add_sale(db, user, water, now - timedelta(hours=1), 1)
+    start, end = now - timedelta(days=3), now + timedelta(hours=1)
+
+    def figures():
+        return (
+            AnalyticsService.get_sales_metrics(db, start, end, depot.id).model_dump(),
+            AnalyticsService.get_product_sales(db, start, end, depot.id).model_dump(),
+            AnalyticsService.get_employee_sales(db, start, end, depot.id).model_dump(),
+            AnalyticsService.get_dashboard_analytics(db, start, end, depot.id).model_dump(),
+        )
+
+    hot_window.clear()
+    expected = figures()
+    assert expected[0]["total_transactions"] == 3
+    monkeypatch.setattr(settings, "HOT_WINDOW_OVERLAP_SECONDS", 7200.0)
+    try:
+        hot_window.load(db, days=5, now=now)
+        assert hot_window.split(db, start, end, depot.id) is not None
+        assert hot_window.split(db, now - timedelta(days=6), end, depot.id) is None  # older than the window
+        assert figures() == expected
+        assert hot_window.nbytes == hot_window.lines * LINE_BYTES
+
+        # Announced sales are appended, even if stamped before the load
+        # (committed after it read); ones the load did read are skipped
+        assert not hot_window.apply(_announced(depot, user, water, now - timedelta(hours=1), 1, str(last.id)))
+        assert not hot_window.apply(_announced(depot, user, water, now - timedelta(hours=3), 1, "t0"))
+        assert hot_window.apply(_announced(depot, user, ice, now - timedelta(minutes=1), 2))
+        assert not hot_window.apply(_announced(depot, user, ice, now - timedelta(minutes=1), 2))
+        _, frame = hot_window.split(db, start, end, depot.id)
+        assert frame.totals() == (67.0, 4, 12.0, 55.0)
+        assert frame.daily()[(now - timedelta(days=1)).date()] == (12.0, 1)
+        assert AnalyticsService.get_product_sales(db, start, end, depot.id).sales[1].quantity_sold == 5
+
+        # Past the line budget the oldest sales go and the window covers less
+        monkeypatch.setattr(settings, "HOT_WINDOW_MAX_LINES", 2)
+        assert hot_window.apply(_announced(depot, user, water, now + timedelta(minutes=2), 1, "t2"))
+        assert hot_window.lines == 2
+        assert hot_window.covers_from > now - timedelta(days=2)
+        assert hot_window.split(db, start, end, depot.id) is None
+        assert isinstance(next(iter(hot_window.frame(now, end, depot.id).daily())), date)
+
+        # A sale too large to announce leaves the window stale until reloaded
+        hot_window.apply({**_announced(depot, user, water, now + timedelta(minutes=3), 1, "t3"), "items": None})
+        assert hot_window.frame(now, end, depot.id) is None
+    finally:
+        hot_window.clear()
@@ -0,0 +1,28 @@
+import io
+import logging
+from app.core.logging_config import RequestLogSampler, StructuredFormatter, configure_logging, flush_logging
+
+def test_sampler_skips_pings_but_keeps_errors():
+    sampler = RequestLogSampler({"/": 0.0}, default_rate=1.0)
+
+    assert sampler.should_log("/api/v1/products/", 200)
+    assert not sampler.should_log("/", 200)
+    assert sampler.should_log("/", 500)
+
+def test_request_fields_are_rendered_by_writer():
+    stream = io.StringIO()
+    configure_logging(stream=stream)
+    try:
+        logging.getLogger("water_depot_pos").info(
+            "request", extra={"fields": {"request_id": "abc", "status": 201, "latency_ms": 1.5}}
+        )
+    finally:
+        flush_logging()
+        configure_logging()
+
+    line = stream.getvalue().strip()
+    assert line.endswith("| request | request_id=abc status=201 latency_ms=1.5")
+
+def test_structured_formatter_without_fields():
+    record = logging.LogRecord("water_depot_pos", logging.INFO, "", 0, "hello %s", ("world",), None)
+    assert StructuredFormatter().format(record).endswith("| INFO | water_depot_pos | hello world")
@@ -0,0 +1,42 @@
+import pytest
+
+from app.core.metrics import Registry
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.histogram("req_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    latency.labels("/api/v1/products/").observe(0.05)
+    latency.labels("/api/v1/products/").observe(0.5)
+    latency.labels("/api/v1/products/").observe(3.0)
+
+    text = registry.render()
+
+    assert 'req_seconds_bucket{route="/api/v1/products/",le="0.1"} 1' in text
+    assert 'req_seconds_bucket{route="/api/v1/products/",le="1.0"} 2' in text
+    assert 'req_seconds_bucket{route="/api/v1/products/",le="+Inf"} 3' in text
+    assert 'req_seconds_count{route="/api/v1/products/"} 3' in text
+
+def test_counters_and_gauges():
+    registry = Registry()
+    failures = registry.counter("sale_failures_total", "Failures.", ("reason",))
+    sales = registry.counter("sales_total", "Sales.")
+    registry.gauge("pool_checked_out", "Checked out.", lambda: 3)
+    failures.labels("out_of_stock").inc()
+    failures.labels("out_of_stock").inc()
+
+    text = registry.render()
+
+    assert 'sale_failures_total{reason="out_of_stock"} 2.0' in text
+    assert "sales_total 0.0" in text
+    assert "pool_checked_out 3.0" in text
+    sales.inc()
+    assert "sales_total 1.0" in registry.render()
+
+def test_gauge_labels_is_a_type_error():
+    registry = Registry()
+    pool = registry.gauge("pool_checked_out", "Checked out.", lambda: {("primary",): 3}, ("engine",))
+
+    with pytest.raises(TypeError, match="pool_checked_out"):
+        pool.labels("primary")
+
+    assert 'pool_checked_out{engine="primary"} 3.0' in registry.render()
@@ -0,0 +1,79 @@
+import pytest
+from app.core.config import settings
+from app.models.outbox import OutboxEvent
+from app.models.sales_rollup import ProductDailySales
+from app.models.transaction import SaleType
+from app.schemas.transaction import TransactionItemCreate
+from app.services.outbox import OutboxDispatcher, record_event
+from app.services.rollup_service import RollupService
+from app.services.sale_service import SALE_EVENT, SaleService
+from app.tests.test_sale_service import create_test_product, create_test_user
+
+def make_dispatcher():
+    dispatcher = OutboxDispatcher()
+    dispatcher.register(SALE_EVENT, "sales-rollup", RollupService.apply_sales)
+    return dispatcher
+
+def rollup(db, product):
+    return db.query(ProductDailySales.quantity, ProductDailySales.revenue).filter(
+        ProductDailySales.product_id == product.id
+    ).one()
+
+def test_sales_feed_the_rollup_through_the_outbox(db):
+    user = create_test_user(db)
+    product = create_test_product(db, stock=10)
+    dispatcher = make_dispatcher()
+    seen = []
+    dispatcher.register(SALE_EVENT, "spy", lambda db, events: seen.extend(e.payload["transaction_id"] for e in events))
+
+    sales = [
+        SaleService.process_sale(db, user, [TransactionItemCreate(product_id=str(product.id), quantity=q)], SaleType.RETAIL)
+        for q in (2, 3)
+    ]
+    # Written with the sale, delivered later
+    assert db.query(ProductDailySales).filter(ProductDailySales.product_id == product.id).count() == 0
+    assert dispatcher.dispatch_pending(db) >= 2
+    assert {str(t.id) for t in sales} <= set(seen)
+    assert tuple(rollup(db, product)) == (5, 75.0)
+    # Delivered events are gone, so a second run doesn't count them again
+    dispatcher.dispatch_pending(db)
+    assert tuple(rollup(db, product)) == (5, 75.0)
+
+def test_failing_consumer_is_retried_without_blocking_others(db, monkeypatch):
+    monkeypatch.setattr(settings, "OUTBOX_MAX_ATTEMPTS", 2)
+    user = create_test_user(db)
+    dispatcher = make_dispatcher()
+    delivered = []
+
+    def flaky(db, events):
+        if any(e.payload.get("fail") for e in events):
+            raise RuntimeError("webhook down")
+        delivered.extend(e.payload["n"] for e in events)
+
+    dispatcher.register("test-event", "flaky", flaky)
+    good = record_event("test-event", {"n": 1}, user.depot_id)
+    bad = record_event("test-event", {"n": 2, "fail": True}, user.depot_id)
+    db.add_all([good, bad])
+    db.commit()
+    good_id, bad_id = good.id, bad.id
+
+    dispatcher.dispatch_pending(db)
+    assert 1 in delivered and 2 not in delivered
+    assert db.get(OutboxEvent, good_id) is None
+    failed = db.get(OutboxEvent, bad_id)
+    assert failed.attempts == 1 and "webhook down" in failed.last_error
+    assert failed.available_at > failed.created_at
+
+    # Due again: fails for good and is left in the table, no longer taken
+    failed.available_at = failed.created_at
+    db.commit()
+    dispatcher.dispatch_pending(db)
+    db.refresh(failed)
+    assert failed.attempts == 2
+    failed.available_at = failed.created_at
+    db.commit()
+    dispatcher.dispatch_pending(db)
+    db.refresh(failed)
+    assert failed.attempts == 2
+    db.delete(failed)
+    db.commit()
@@ -0,0 +1,52 @@
+import json
+from sqlalchemy import update
+from app.api.v1.endpoints.products import read_product_changes
+from app.models.product import Product
+from app.models.user import User, UserRole
+from app.tests.test_depots import create_other_depot
+
+def _changes(db, user, since):
+    body = json.loads(read_product_changes(db=db, since=since, current_user=user).body)
+    db.commit()  # end the read's snapshot, like a request would
+    return body["version"], {p["name"]: p for p in body["products"]}, body["deactivated"]
+
+def test_changes_return_only_rows_written_since_the_last_version(db):
+    depot = create_other_depot(db)
+    user = User(username=f"terminal-{depot.code}", hashed_password="x", role=UserRole.STAFF, depot_id=depot.id)
+    products = [
+        Product(name=name, wholesale_price=10.0, retail_price=15.0, stock_quantity=20, depot_id=depot.id)
+        for name in ("Refill", "Gallon", "Cap")
+    ]
+    db.add(user)
+    db.add_all(products)
+    db.commit()
+    refill, gallon, cap = products
+
+    version, changed, deactivated = _changes(db, user, 0)
+    assert set(changed) == {"Refill", "Gallon", "Cap"} and deactivated == []
+    assert _changes(db, user, version)[1:] == ({}, [])
+
+    # A price change, a stock change and a soft delete
+    refill.retail_price = 16.0
+    gallon.stock_quantity -= 1
+    cap.is_active = False
+    db.commit()
+    version, changed, deactivated = _changes(db, user, version)
+    assert set(changed) == {"Refill", "Gallon"} and changed["Gallon"]["stock_quantity"] == 19
+    assert deactivated == [str(cap.id)] and "reserved_quantity" not in changed["Refill"]
+
+    # Holds only move reserved_quantity, which terminals don't sync
+    db.execute(update(Product).where(Product.id == refill.id).values(reserved_quantity=Product.reserved_quantity + 2))
+    db.commit()
+    assert _changes(db, user, version)[1:] == ({}, [])
+
+    # A write that started earlier but commits after a sync still reaches the next one
+    with db.get_bind().connect() as other:
+        other.execute(update(Product).where(Product.id == gallon.id).values(stock_quantity=5))
+        refill.retail_price = 17.0
+        db.commit()
+        version, changed, _ = _changes(db, user, version)
+        assert set(changed) == {"Refill"}
+        other.commit()
+    version, changed, _ = _changes(db, user, version)
+    assert changed["Gallon"]["stock_quantity"] == 5
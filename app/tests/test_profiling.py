@@ -0,0 +1,107 @@
+import asyncio
+import time
+from fastapi.testclient import TestClient
+from app.core import profiling
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.main import app
+from app.models.user import User, UserRole
+
+OWNER = User(username="profiled-owner", role=UserRole.OWNER)
+STAFF = User(username="profiled-staff", role=UserRole.STAFF)
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def _profiled_call(endpoint, user, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILER_INTERVAL_MS", 1.0)
+    request = profiling.ProfileRequest("GET", "/test")
+    token = profiling.profile_request_ctx.set(request)
+    try:
+        result = profiling.wrap_endpoint(endpoint)(current_user=user)
+        if asyncio.iscoroutine(result):
+            asyncio.run(result)
+    finally:
+        profiling.profile_request_ctx.reset(token)
+    return request.profile
+
+def test_only_owner_requests_are_profiled(monkeypatch):
+    def report(current_user):
+        _busy(0.05)
+
+    assert _profiled_call(report, STAFF, monkeypatch) is None
+    profile = _profiled_call(report, OWNER, monkeypatch)
+    assert profile.username == "profiled-owner" and profile.sample_count > 0
+    # Stacks start at the endpoint: nothing from the caller's side is kept
+    assert any(stack.startswith("report ") for stack in profile.stacks)
+    assert not any("_profiled_call" in stack for stack in profile.stacks)
+
+def test_async_profiles_leave_out_other_work_on_the_loop(monkeypatch):
+    def unrelated_request():
+        _busy(0.05)
+
+    async def report(current_user):
+        await asyncio.sleep(0.01)
+        _busy(0.03)
+
+    async def both(current_user):
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.005, unrelated_request)  # runs while the report sleeps
+        await report(current_user)
+
+    profile = _profiled_call(report, OWNER, monkeypatch)
+    assert profile.sample_count > 0
+    profile = _profiled_call(both, OWNER, monkeypatch)
+    stacks = ";".join(profile.stacks)
+    assert "report " in stacks and "unrelated_request" not in stacks
+
+def test_profile_flag_must_match_exactly():
+    def scope(query, headers=()):
+        return {"query_string": query, "headers": list(headers)}
+
+    assert profiling.requested(scope(b"profile=1"))
+    assert profiling.requested(scope(b"days=30&profile=1"))
+    assert not profiling.requested(scope(b"noprofile=1"))
+    assert not profiling.requested(scope(b"profile=10"))
+    assert not profiling.requested(scope(b""))
+    assert profiling.requested(scope(b"", [(b"x-profile", b"1")]))
+    assert not profiling.requested(scope(b"", [(b"x-profile", b"0")]))
+
+def test_ring_keeps_the_latest_profiles():
+    stored = []
+    for n in range(settings.PROFILER_RING_SIZE + 3):
+        request = profiling.ProfileRequest("GET", f"/ring/{n}")
+        request.profile = profiling.StoredProfile("GET", f"/ring/{n}", None, "owner")
+        stored.append(profiling.store(request, "/ring/{n}"))
+    recent = profiling.recent_profiles()
+    assert len(recent) == settings.PROFILER_RING_SIZE
+    assert recent[0] is stored[-1]
+    assert profiling.get_profile(stored[2].id) is None
+    assert profiling.get_profile(stored[-1].id) is stored[-1]
+
+def test_profile_id_header_for_owners_only(db):
+    users = {}
+    for role in (UserRole.OWNER, UserRole.STAFF):
+        username = f"profiling-{role.value}"
+        user = db.query(User).filter_by(username=username).first()
+        if user is None:
+            user = User(username=username, hashed_password="x", role=role)
+            db.add(user)
+            db.commit()
+        users[role] = username
+
+    client = TestClient(app)
+    def get(role, **kwargs):
+        token = create_access_token(users[role])
+        return client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token}", **kwargs.pop("headers", {})},
+                          **kwargs)
+
+    response = get(UserRole.OWNER, params={"profile": "1"})
+    assert response.status_code == 200
+    profile = profiling.get_profile(response.headers["X-Profile-ID"])
+    assert profile.route == "/api/v1/users/me" and profile.username == users[UserRole.OWNER]
+    assert "X-Profile-ID" in get(UserRole.OWNER, headers={"X-Profile": "1"}).headers
+    assert "X-Profile-ID" not in get(UserRole.OWNER).headers
+    assert "X-Profile-ID" not in get(UserRole.STAFF, params={"profile": "1"}).headers
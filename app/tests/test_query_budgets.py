@@ -0,0 +1,30 @@
+"""
+Round-trip budgets for the hot paths. If a change adds queries, either
+justify the new budget here or fix the regression.
+"""
+from app.db.instrumentation import query_budget
+from app.models.transaction import SaleType
+from app.schemas.transaction import TransactionItemCreate
+from app.services.analytics_service import AnalyticsService
+from app.services.sale_service import SaleService
+from app.tests.test_sale_service import create_test_product, create_test_user
+
+def test_process_sale_query_budget(db):
+    user = create_test_user(db)
+    product_ids = [str(create_test_product(db, stock=30).id) for _ in range(3)]
+    items = [TransactionItemCreate(product_id=product_id, quantity=1) for product_id in product_ids]
+    user_id = user.id  # load before counting
+
+    # price SELECT, two INSERTs, one locking SELECT for every product, stock
+    # UPDATE, the outbox event INSERT, the sale NOTIFY, refresh and the items
+    # load; flat in cart size
+    with query_budget(9):
+        transaction = SaleService.process_sale(db, user, items, SaleType.RETAIL)
+        assert len(transaction.items) == 3
+    assert transaction.user_id == user_id
+
+def test_dashboard_query_budget(db):
+    # Seven aggregate/listing queries plus the archive manifest, which is
+    # read once per ARCHIVE_MANIFEST_CACHE_SECONDS
+    with query_budget(8):
+        AnalyticsService.get_dashboard_analytics(db)
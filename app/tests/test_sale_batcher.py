@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from app.core.config import settings
+from app.models.transaction import SaleType, Transaction
+from app.schemas.transaction import TransactionItemCreate
+from app.services.sale_batcher import SaleBatcher
+from app.db.session import SessionLocal
+from app.tests.test_sale_service import create_test_product, create_test_user
+
+def test_batched_sales_commit_together_and_fail_alone(db, monkeypatch):
+    # A long window so every sale lands in the same batch
+    monkeypatch.setattr(settings, "SALE_BATCH_WINDOW_MS", 500.0)
+    user = create_test_user(db)
+    product = create_test_product(db, stock=10)
+    batcher = SaleBatcher(SessionLocal)
+    batches = []
+    write = batcher._write
+    batcher._write = lambda batch: (batches.append(len(batch)), write(batch))
+
+    def sell(quantity):
+        items = [TransactionItemCreate(product_id=str(product.id), quantity=quantity)]
+        try:
+            return batcher.submit(user, items, SaleType.RETAIL)
+        except HTTPException as exc:
+            return exc.status_code
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(sell, (4, 4, 4, 1)))
+
+    assert batches == [4]
+    # Only one of the 4-unit sales can't be covered, whatever the order
+    assert [r for r in results if isinstance(r, int)] == [400]
+    sold = [r for r in results if not isinstance(r, int)]
+    assert sorted(t.items[0].quantity for t in sold) == [1, 4, 4]
+    assert all(t.total_amount == t.items[0].quantity * 15.0 for t in sold)
+    db.refresh(product)
+    assert product.stock_quantity == 1
+    assert db.query(Transaction).filter(Transaction.id.in_([t.id for t in sold])).count() == 3
@@ -37,7 +37,7 @@ def test_process_sale_deducts_stock(db):
     user = create_test_user(db)
     product = create_test_product(db, stock=20)
     
-    items = [TransactionItemCreate(product_id=product.id, quantity=5)]
+    items = [TransactionItemCreate(product_id=str(product.id), quantity=5)]
     
     # Process Sale
     transaction = SaleService.process_sale(db, user, items, SaleType.RETAIL)
@@ -59,7 +59,8 @@ def test_process_sale_concurrency_locking(db):
     """
     user = create_test_user(db)
     product = create_test_product(db, stock=10)
-    product_id = product.id
+    product_id = str(product.id)
+    errors = []
     
     def sell_item():
         # Each thread needs its own session
@@ -68,8 +69,9 @@ def test_process_sale_concurrency_locking(db):
         try:
             items = [TransactionItemCreate(product_id=product_id, quantity=1)]
             SaleService.process_sale(thread_db, user, items, SaleType.RETAIL)
-        except Exception:
-            pass # Ignore errors (like out of stock if we went over)
+        except Exception as e:
+            # Exactly enough stock for every sale, so any failure is a bug
+            errors.append(e)
         finally:
             thread_db.close()
 
@@ -82,5 +84,6 @@ def test_process_sale_concurrency_locking(db):
     for t in threads:
         t.join()
         
+    assert errors == []
     db.refresh(product)
     assert product.stock_quantity == 0
@@ -0,0 +1,30 @@
+import random
+from datetime import date, timedelta
+from app.seed_data import generate_chunk, random_uuid
+
+def _chunk(seed):
+    rng = random.Random(0)
+    products = [(random_uuid(rng), 35.0, 25.0) for _ in range(20)]
+    staff_ids = [random_uuid(rng) for _ in range(3)]
+    start = date(2025, 1, 6)
+    days = [start + timedelta(days=i) for i in range(7)]
+    return generate_chunk(seed, 0, days, start, 7, 50, products, staff_ids)
+
+def test_chunks_are_deterministic_per_seed():
+    first, second, other = _chunk(1), _chunk(1), _chunk(2)
+
+    assert first[0].getvalue() == second[0].getvalue()
+    assert first[1].getvalue() == second[1].getvalue()
+    assert first[0].getvalue() != other[0].getvalue()
+
+def test_transaction_totals_match_their_items():
+    transactions, items, n_transactions, n_items = _chunk(1)
+
+    totals = {}
+    for line in items.getvalue().splitlines():
+        _, transaction_id, _, quantity, price, _ = line.split("\t")
+        totals[transaction_id] = totals.get(transaction_id, 0.0) + int(quantity) * float(price)
+    rows = [line.split("\t") for line in transactions.getvalue().splitlines()]
+    assert len(rows) == n_transactions and sum(1 for _ in items.getvalue().splitlines()) == n_items
+    assert all(abs(float(total) - round(totals[tid], 2)) < 0.01 for tid, _, total, _, _ in rows)
+    assert {sale_type for *_, sale_type, _ in rows} <= {"retail", "wholesale", "mixed"}
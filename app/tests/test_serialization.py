@@ -0,0 +1,20 @@
+import json
+import uuid
+from datetime import datetime
+from app.core.serialization import dump_models, model_response
+from app.models.product import Product
+from app.schemas.product import ProductResponse
+
+def test_orm_objects_serialize_without_hand_mapping():
+    product = Product(
+        id=uuid.UUID(int=1), name="5-Gallon Refill", sku="REFILL-5", category="Water",
+        wholesale_price=25.0, retail_price=35.0, stock_quantity=40, low_stock_threshold=2, reserved_quantity=0,
+        is_active=True, created_at=datetime(2026, 1, 1, 8, 30),
+    )
+
+    [item] = json.loads(dump_models(ProductResponse, [product]))
+    assert item["id"] == "00000000-0000-0000-0000-000000000001"
+    assert item["created_at"] == "2026-01-01T08:30:00"
+    response = model_response(ProductResponse, product)
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == item
@@ -0,0 +1,37 @@
+import logging
+from sqlalchemy import text
+from app.core.config import settings
+from app.db import instrumentation
+from app.db.instrumentation import track_queries
+from app.tests.test_sale_service import create_test_product
+
+def _plans(caplog):
+    """Plan (or None) per statement logged as slow."""
+    return {
+        record.fields["statement"]: record.fields.get("plan") for record in caplog.records
+        if record.name == "water_depot_pos.sql" and record.getMessage() == "slow query"
+    }
+
+def test_slow_reads_are_explained_without_touching_the_transaction(db, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SQL_SLOW_QUERY_MS", 0.0)
+    monkeypatch.setattr(settings, "SQL_EXPLAIN_SLOW_QUERIES", True)
+    product = create_test_product(db, stock=5)
+    caplog.set_level(logging.WARNING, logger="water_depot_pos.sql")
+
+    with track_queries():
+        assert db.execute(text("SELECT 1")).scalar() == 1
+        # Locking reads are logged but not re-run
+        db.execute(text("SELECT id FROM products WHERE id = :id FOR NO KEY UPDATE"), {"id": product.id})
+    plans = _plans(caplog)
+    assert "Result" in plans["SELECT 1"]
+    assert plans["SELECT id FROM products WHERE id = %(id)s FOR NO KEY UPDATE"] is None
+
+    # A failing EXPLAIN leaves the request's transaction usable
+    monkeypatch.setattr(instrumentation, "EXPLAIN_PREFIX", "EXPLAIN (NOT_AN_OPTION)")
+    with track_queries():
+        db.execute(text("UPDATE products SET stock_quantity = 4 WHERE id = :id"), {"id": product.id})
+        assert db.execute(text("SELECT 2")).scalar() == 2
+        db.commit()
+    assert _plans(caplog)["SELECT 2"].startswith("<explain failed")
+    db.refresh(product)
+    assert product.stock_quantity == 4
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+import pytest
+from app.core.config import settings
+from app.models.product import Product
+from app.models.transaction import SaleType
+from app.models.user import User, UserRole
+from app.services.analytics_service import AnalyticsService
+from app.services.archive_service import add_months, month_start
+from app.services.snapshot_service import ColumnarSales, SnapshotService
+from app.tests.test_archive import add_sale
+from app.tests.test_depots import create_other_depot
+
+pytest.importorskip("duckdb")
+pytest.importorskip("pyarrow")
+
+def test_long_ranges_are_answered_from_the_parquet_snapshot(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ANALYTICS_SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "ANALYTICS_SNAPSHOT_LAG_SECONDS", 0)
+    depot = create_other_depot(db)
+    user = User(username=f"cashier-{depot.code}", hashed_password="x", role=UserRole.STAFF, depot_id=depot.id)
+    product = Product(name="Snapshot Water", wholesale_price=10.0, retail_price=15.0, stock_quantity=50,
+                      low_stock_threshold=2, depot_id=depot.id)
+    db.add_all([user, product])
+    db.commit()
+
+    now = datetime.utcnow()
+    month = add_months(month_start(now), -5)
+    add_sale(db, user, product, month + timedelta(days=2), 2)
+    add_sale(db, user, product, month + timedelta(days=9), 4, SaleType.WHOLESALE)
+    start = now - timedelta(days=365)
+
+    def figures(end):
+        return (
+            AnalyticsService.get_sales_metrics(db, start, end, depot.id).model_dump(),
+            AnalyticsService.get_product_sales(db, start, end, depot.id).model_dump(),
+            AnalyticsService.get_employee_sales(db, start, end, depot.id).model_dump(),
+        )
+
+    # Each run appends what's new; the second one compacts the closed month's two parts
+    assert SnapshotService.export_depot(db, depot.id, month + timedelta(days=5)) == 1
+    assert SnapshotService.export_depot(db, depot.id, now) == 1
+    add_sale(db, user, product, now + timedelta(seconds=1), 1)  # after the horizon: still read from Postgres
+    end = now + timedelta(minutes=1)
+
+    routed = SnapshotService.split(db, start, end, depot.id)
+    assert routed is not None and isinstance(routed[1], ColumnarSales)
+    assert routed[1].totals() == (70.0, 2, 40.0, 30.0)
+    columnar = figures(end)
+    monkeypatch.setattr(settings, "ANALYTICS_SNAPSHOT_DIR", None)
+    assert figures(end) == columnar
+    assert columnar[0]["total_transactions"] == 3
+    assert columnar[1]["sales"][0]["quantity_sold"] == 7
+
+    # Short ranges stay on Postgres
+    monkeypatch.setattr(settings, "ANALYTICS_SNAPSHOT_DIR", str(tmp_path))
+    assert SnapshotService.split(db, now - timedelta(days=7), end, depot.id) is None
+
+    # The compacted parts are deleted by the next run
+    assert len(list(tmp_path.glob(f"{depot.id}/transactions/*/*.parquet"))) == 3
+    assert SnapshotService.export_depot(db, depot.id, end) == 1
+    assert sorted(path.name.split("-")[0] for path in tmp_path.glob(f"{depot.id}/transactions/*/*.parquet")) == [
+        "compacted", "part"
+    ]
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import pytest
+from app.core import broadcast
+from app.core.config import settings
+from app.models.stock_alert import StockAlert, StockAlertKind
+from app.models.transaction import SaleType
+from app.schemas.transaction import TransactionItemCreate
+from app.services.inventory_service import STOCK_ALERTS_CHANNEL, InventoryService
+from app.services.sale_service import SaleService
+from app.tests.test_sale_service import create_test_product, create_test_user
+
+@pytest.mark.parametrize("before, after, expected", [
+    (10, 5, None),
+    (5, 2, StockAlertKind.LOW_STOCK),
+    (2, 1, None),  # already low
+    (3, 0, StockAlertKind.OUT_OF_STOCK),
+    (1, 0, StockAlertKind.OUT_OF_STOCK),
+    (0, 0, None),
+])
+def test_threshold_crossing(before, after, expected):
+    assert InventoryService.threshold_crossing(before, after, threshold=2) == expected
+
+def test_sale_records_and_publishes_crossings(db, monkeypatch):
+    monkeypatch.setattr(settings, "BROADCAST_BACKEND", "memory")
+    user = create_test_user(db)
+    product = create_test_product(db, stock=4)
+    untouched = create_test_product(db, stock=50)
+
+    async def sell():
+        async with broadcast.broadcaster.subscribe(STOCK_ALERTS_CHANNEL) as subscription:
+            items = [
+                TransactionItemCreate(product_id=str(product.id), quantity=1),
+                TransactionItemCreate(product_id=str(untouched.id), quantity=1),
+                TransactionItemCreate(product_id=str(product.id), quantity=1),
+            ]
+            loop = asyncio.get_running_loop()
+            transaction = await loop.run_in_executor(
+                None, SaleService.process_sale, db, user, items, SaleType.RETAIL
+            )
+            return transaction, json.loads(await subscription.get(5)), subscription.queue.empty()
+
+    transaction, message, drained = asyncio.run(sell())
+
+    alerts = db.query(StockAlert).filter(StockAlert.transaction_id == transaction.id).all()
+    assert [(a.product_id, a.kind, a.stock_quantity) for a in alerts] == [
+        (product.id, StockAlertKind.LOW_STOCK, 2)
+    ]
+    assert message["id"] == str(alerts[0].id)
+    assert message["transaction_id"] == str(transaction.id)
+    assert message["kind"] == "low_stock"
+    assert drained
@@ -0,0 +1,69 @@
+import pytest
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from app.models.stock_hold import StockHold
+from app.models.transaction import SaleType
+from app.schemas.transaction import StockHoldItem, TransactionItemCreate
+from app.services.hold_service import HoldService
+from app.services.sale_service import SaleService
+from app.tests.test_sale_service import create_test_product, create_test_user
+
+def test_holds_reserve_stock_until_checkout(db):
+    user = create_test_user(db)
+    product = create_test_product(db, stock=10)
+
+    cart_id, _, holds = HoldService.place_holds(db, user, [StockHoldItem(product_id=str(product.id), quantity=6)])
+    assert [(h.product_id, h.quantity) for h in holds] == [(product.id, 6)]
+
+    # Another terminal finds out now, not at checkout
+    with pytest.raises(HTTPException) as exc:
+        HoldService.place_holds(db, user, [StockHoldItem(product_id=str(product.id), quantity=5)])
+    assert exc.value.status_code == 409
+    db.rollback()
+    with pytest.raises(HTTPException):
+        SaleService.process_sale(db, user, [TransactionItemCreate(product_id=str(product.id), quantity=5)], SaleType.RETAIL)
+    db.rollback()
+
+    # The cart sells part of its hold; the rest goes back to availability
+    items = [TransactionItemCreate(product_id=str(product.id), quantity=4)]
+    SaleService.process_sale(db, user, items, SaleType.RETAIL, cart_id=cart_id)
+    db.refresh(product)
+    assert (product.stock_quantity, product.reserved_quantity) == (6, 0)
+    assert db.query(StockHold).filter(StockHold.cart_id == cart_id).count() == 0
+
+def test_sweep_releases_expired_holds(db):
+    user = create_test_user(db)
+    product = create_test_product(db, stock=5)
+    cart_id, _, _ = HoldService.place_holds(db, user, [StockHoldItem(product_id=str(product.id), quantity=5)])
+    db.query(StockHold).filter(StockHold.cart_id == cart_id).update(
+        {StockHold.expires_at: datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+
+    # A new hold sweeps the lapsed one on its product instead of failing
+    HoldService.place_holds(db, user, [StockHoldItem(product_id=str(product.id), quantity=2)])
+    db.refresh(product)
+    assert product.reserved_quantity == 2
+    assert db.query(StockHold).filter(StockHold.cart_id == cart_id).count() == 0
+
+def test_sale_sweeps_lapsed_holds_in_its_way(db):
+    user = create_test_user(db)
+    product = create_test_product(db, stock=5)
+    other = create_test_product(db, stock=5)
+    cart_id, _, _ = HoldService.place_holds(db, user, [StockHoldItem(product_id=str(product.id), quantity=4)])
+    db.query(StockHold).filter(StockHold.cart_id == cart_id).update(
+        {StockHold.expires_at: datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+
+    # A walk-in sale doesn't wait for the sweeper to free the lapsed units
+    SaleService.process_sale(db, user, [TransactionItemCreate(product_id=str(product.id), quantity=3)], SaleType.RETAIL)
+    db.refresh(product)
+    assert (product.stock_quantity, product.reserved_quantity) == (2, 0)
+
+    # A cart releases holds on products it doesn't buy too
+    cart_id, _, _ = HoldService.place_holds(db, user, [StockHoldItem(product_id=str(other.id), quantity=2)])
+    items = [TransactionItemCreate(product_id=str(product.id), quantity=1)]
+    SaleService.process_sale(db, user, items, SaleType.RETAIL, cart_id=cart_id)
+    db.refresh(other)
+    assert (other.stock_quantity, other.reserved_quantity) == (5, 0)
@@ -0,0 +1,88 @@
+import pytest
+from fastapi import HTTPException
+from app.models.product import Product, ProductStockShard
+from app.models.transaction import SaleType
+from app.schemas.transaction import StockHoldItem, TransactionItemCreate
+from app.services.analytics_service import AnalyticsService
+from app.services.hold_service import HoldService
+from app.services.sale_service import SaleService
+from app.services.stock_shard_service import StockShardService
+from app.tests.test_sale_service import create_test_product, create_test_user
+
+def shard_quantities(db, product):
+    return [
+        row.quantity
+        for row in db.query(ProductStockShard.quantity)
+        .filter(ProductStockShard.product_id == product.id)
+        .order_by(ProductStockShard.shard)
+    ]
+
+def current_stock(db, product):
+    return db.query(Product.current_stock).filter(Product.id == product.id).scalar()
+
+def test_sharded_sales_drain_shards_and_rebalance(db):
+    user = create_test_user(db)
+    product = create_test_product(db, stock=10)
+    StockShardService.configure(db, product.id, 4)
+    assert shard_quantities(db, product) == [3, 3, 2, 2]
+
+    for _ in range(3):
+        items = [TransactionItemCreate(product_id=str(product.id), quantity=2)]
+        SaleService.process_sale(db, user, items, SaleType.RETAIL)
+    assert sum(shard_quantities(db, product)) == current_stock(db, product) == 4
+    # No shard can cover 4 units on its own, so the last sale pools them
+    SaleService.process_sale(db, user, [TransactionItemCreate(product_id=str(product.id), quantity=4)], SaleType.RETAIL)
+    assert shard_quantities(db, product) == [0, 0, 0, 0]
+    with pytest.raises(HTTPException) as exc:
+        SaleService.process_sale(db, user, [TransactionItemCreate(product_id=str(product.id), quantity=1)], SaleType.RETAIL)
+    assert exc.value.status_code == 400
+    db.rollback()
+
+    # The rebalancer brings the products row back in line for everything that reads it
+    StockShardService.rebalance(db, product.id)
+    db.commit()
+    db.refresh(product)
+    assert product.stock_quantity == 0
+    inventory = {item.product_id: item for item in AnalyticsService.get_inventory_analytics(db).products}
+    assert inventory[str(product.id)].current_stock == 0
+
+def test_rebalance_and_unshard_keep_the_total(db):
+    user = create_test_user(db)
+    product = create_test_product(db, stock=40)
+    StockShardService.configure(db, product.id, 4)
+    db.query(ProductStockShard).filter(ProductStockShard.product_id == product.id).update(
+        {ProductStockShard.quantity: 0}
+    )
+    db.query(ProductStockShard).filter(
+        ProductStockShard.product_id == product.id, ProductStockShard.shard == 0
+    ).update({ProductStockShard.quantity: 37})
+    db.commit()
+
+    assert StockShardService.rebalance(db, product.id)
+    db.commit()
+    assert shard_quantities(db, product) == [10, 9, 9, 9]
+
+    # Holds count against the shard total
+    HoldService.place_holds(db, user, [StockHoldItem(product_id=str(product.id), quantity=30)])
+    with pytest.raises(HTTPException) as exc:
+        SaleService.process_sale(db, user, [TransactionItemCreate(product_id=str(product.id), quantity=8)], SaleType.RETAIL)
+    assert exc.value.status_code == 400
+    db.rollback()
+
+    StockShardService.configure(db, product.id, 0)
+    db.refresh(product)
+    assert (product.stock_shards, product.stock_quantity) == (0, 37)
+    assert shard_quantities(db, product) == []
+
+def test_checkout_of_a_held_sharded_product_takes_its_stock_once(db):
+    user = create_test_user(db)
+    product = create_test_product(db, stock=40)
+    StockShardService.configure(db, product.id, 4)
+    db.commit()
+
+    cart_id, _, _ = HoldService.place_holds(db, user, [StockHoldItem(product_id=str(product.id), quantity=3)])
+    items = [TransactionItemCreate(product_id=str(product.id), quantity=3)]
+    transaction = SaleService.process_sale(db, user, items, SaleType.RETAIL, cart_id=cart_id)
+    db.refresh(product)
+    assert current_stock(db, product) == 37 and product.reserved_quantity == 0
+    assert [item.quantity for item in transaction.items] == [3]
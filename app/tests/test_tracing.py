@@ -0,0 +1,80 @@
+import json
+from fastapi.testclient import TestClient
+from app.core import tracing
+from app.core.config import settings
+from app.main import app
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+def test_traceparent_parsing():
+    assert tracing.parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID, True)
+    assert tracing.parse_traceparent(f" 00-{TRACE_ID}-{PARENT_ID}-00 ") == (TRACE_ID, PARENT_ID, False)
+    for header in (
+        None, "", "garbage", f"00-{TRACE_ID}-{PARENT_ID}", f"00-{TRACE_ID[:-1]}-{PARENT_ID}-01",
+        f"00-{TRACE_ID}-{PARENT_ID}-zz", f"00-{'0' * 32}-{PARENT_ID}-01", f"00-{TRACE_ID}-{'0' * 16}-01",
+    ):
+        assert tracing.parse_traceparent(header) is None, header
+
+def test_sampling_follows_the_rate_and_the_callers_flag(monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 0.0)
+    assert tracing.start_trace("request") is None
+    assert tracing.start_trace("request", f"00-{TRACE_ID}-{PARENT_ID}-00") is None
+    # A caller that sampled the trace wins over a zero rate, and the trace continues
+    root = tracing.start_trace("request", f"00-{TRACE_ID}-{PARENT_ID}-01")
+    assert (root.trace_id, root.parent_id) == (TRACE_ID, PARENT_ID)
+
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 1.0)
+    root = tracing.start_trace("request", "malformed")
+    assert root.parent_id is None and len(root.trace_id) == 32
+    monkeypatch.setattr("app.core.tracing.random.random", lambda: 0.7)
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 0.5)
+    assert tracing.start_trace("request") is None
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 0.8)
+    assert tracing.start_trace("request") is not None
+
+def test_spans_nest_under_the_current_span(monkeypatch):
+    @tracing.traced("service.call")
+    def call():
+        with tracing.span("db.query", statement="SELECT 1") as child:
+            return child
+
+    assert call() is None  # no trace: nothing is recorded
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 1.0)
+    root = tracing.start_trace("request")
+    token = tracing.current_span_ctx.set(root)
+    try:
+        query = call()
+    finally:
+        tracing.current_span_ctx.reset(token)
+    root.end()
+    spans = {span.name: span for span in root.trace.spans}
+    assert spans["db.query"] is query and query.attributes == {"statement": "SELECT 1"}
+    assert query.parent_id == spans["service.call"].span_id
+    assert spans["service.call"].parent_id == root.span_id
+    assert {span.trace_id for span in spans.values()} == {root.trace_id}
+
+def test_traceresponse_header_continues_the_callers_trace():
+    client = TestClient(app)
+    response = client.get("/", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+    version, trace_id, span_id, flags = response.headers["traceresponse"].split("-")
+    assert (version, trace_id, flags) == ("00", TRACE_ID, "01") and span_id != PARENT_ID
+    assert "traceresponse" not in client.get("/").headers
+
+def test_file_exporter_writes_a_json_line_per_span(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_SAMPLE_RATE", 1.0)
+    root = tracing.start_trace("request", request_id="abc")
+    token = tracing.current_span_ctx.set(root)
+    try:
+        with tracing.span("work"):
+            pass
+    finally:
+        tracing.current_span_ctx.reset(token)
+    root.end()
+
+    path = tmp_path / "traces.jsonl"
+    tracing.FileExporter(str(path)).export([span.to_dict() for span in root.trace.spans])
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["name"] for line in lines] == ["work", "request"]
+    assert lines[1]["attributes"] == {"request_id": "abc"} and lines[0]["parent_id"] == lines[1]["span_id"]
+    assert {line["trace_id"] for line in lines} == {root.trace_id} and lines[0]["duration_ms"] >= 0
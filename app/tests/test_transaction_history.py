@@ -0,0 +1,63 @@
+import pytest
+from fastapi import HTTPException
+from app.api.v1.endpoints.transactions import read_transaction
+from app.db.instrumentation import query_budget
+from app.models.user import User, UserRole
+from app.models.transaction import SaleType
+from app.schemas.transaction import TransactionItemCreate
+from app.services.sale_service import SaleService
+from app.services.transaction_service import TransactionService
+from app.tests.test_sale_service import create_test_product, create_test_user
+
+def test_history_pages_by_cursor_with_items(db):
+    user = create_test_user(db)
+    product = create_test_product(db, stock=20)
+    other = create_test_product(db, stock=20)
+    sold = [
+        SaleService.process_sale(db, user, [
+            TransactionItemCreate(product_id=str(product.id), quantity=1),
+            TransactionItemCreate(product_id=str(other.id), quantity=quantity),
+        ], SaleType.RETAIL).id
+        for quantity in (1, 2, 3)
+    ]
+    product_id, user_id = product.id, user.id
+    db.expunge_all()
+
+    # The page and its items: two queries, whatever the page size
+    with query_budget(2):
+        page, cursor = TransactionService.history(db, product_id=product_id, limit=2)
+        assert [len(t.items) for t in page] == [2, 2]
+    assert [t.id for t in page] == sold[:0:-1]
+    assert cursor is not None
+
+    page, cursor = TransactionService.history(db, product_id=product_id, cursor=cursor, limit=2)
+    assert [t.id for t in page] == sold[:1]
+    assert cursor is None
+
+    page, _ = TransactionService.history(db, product_id=product_id, user_id=user_id, sale_type=SaleType.WHOLESALE)
+    assert page == []
+
+def test_history_rejects_bad_cursor_and_unknown_id(db):
+    with pytest.raises(HTTPException) as exc:
+        TransactionService.history(db, cursor="not-a-cursor")
+    assert exc.value.status_code == 400
+    with pytest.raises(HTTPException) as exc:
+        TransactionService.get(db, "00000000-0000-0000-0000-000000000000")
+    assert exc.value.status_code == 404
+
+def test_staff_only_read_their_own_receipts(db):
+    user = create_test_user(db)
+    product = create_test_product(db, stock=5)
+    sold = SaleService.process_sale(db, user, [TransactionItemCreate(product_id=str(product.id), quantity=1)], SaleType.RETAIL)
+    colleague = db.query(User).filter_by(username="test_staff_2").first()
+    if colleague is None:
+        colleague = User(username="test_staff_2", hashed_password="x", role=UserRole.STAFF)
+        db.add(colleague)
+        db.commit()
+    owner = User(role=UserRole.OWNER, depot_id=user.depot_id)
+
+    assert read_transaction(db=db, transaction_id=sold.id, current_user=user).status_code == 200
+    assert read_transaction(db=db, transaction_id=sold.id, current_user=owner).status_code == 200
+    with pytest.raises(HTTPException) as exc:
+        read_transaction(db=db, transaction_id=sold.id, current_user=colleague)
+    assert exc.value.status_code == 404